@@ -0,0 +1,110 @@
+"""
+Microbenchmark of SessionDataModel, the object built and walked on every request.
+
+Compares the dict-backed model with a copy of the previous setattr-based
+storage, for the work a typical request does: build the model from a loaded
+item, read a few keys, access the session key and walk all items.
+
+    python benchmarks/bench_model.py [--keys 20] [--number 20000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(INSTALLED_APPS=["dysession"])
+    django.setup()
+
+from dysession.backends.model import SessionDataModel  # noqa: E402
+from dysession.settings import get_config  # noqa: E402
+
+
+class LegacySessionDataModel:
+    """Storage part of SessionDataModel before it was backed by a dict"""
+
+    def __init__(self, session_key=None) -> None:
+        self.__variables_names = set([])
+        self[get_config()["PARTITION_KEY_NAME"]] = session_key
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __get_session_key(self):
+        return self[get_config()["PARTITION_KEY_NAME"]]
+
+    session_key = property(__get_session_key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+        self.__variables_names.add(key)
+
+    def __iter__(self):
+        return iter(self.__variables_names)
+
+    def items(self):
+        for key in self.__variables_names:
+            yield (key, self[key])
+
+
+def request(model_class, data):
+    model = model_class("benchmarksessionkey")
+    for key, value in data.items():
+        model[key] = value
+    model["_auth_user_id"]
+    model["_auth_user_backend"]
+    model.session_key
+    model.session_key
+    for _ in model.items():
+        pass
+    return model
+
+
+def measure(model_class, data, number):
+    seconds = min(
+        timeit.repeat(lambda: request(model_class, data), number=number, repeat=5)
+    )
+
+    tracemalloc.start()
+    request(model_class, data)
+    tracemalloc.reset_peak()
+    models = [request(model_class, data) for _ in range(100)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+
+    return seconds / number * 1e6, peak / 100
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=20)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    data = {f"key{i}": i for i in range(args.keys)}
+    data.update({"_auth_user_id": "1", "_auth_user_backend": "backend"})
+
+    print(f"{'model':<26}{'us/request':>12}{'bytes/model':>14}")
+    results = {}
+    for model_class in (LegacySessionDataModel, SessionDataModel):
+        results[model_class] = measure(model_class, data, args.number)
+        us, size = results[model_class]
+        print(f"{model_class.__name__:<26}{us:>12.2f}{size:>14.0f}")
+
+    legacy, current = results[LegacySessionDataModel], results[SessionDataModel]
+    print(
+        f"{'change':<26}{(current[0] / legacy[0] - 1):>12.1%}"
+        f"{(current[1] / legacy[1] - 1):>14.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Benchmark of the whole session request lifecycle.
+
+Every request goes through `SessionMiddleware.process_request`, a view reading
+and writing the session, and `process_response` which saves it. Requests run
+in-process against moto and against an in-memory stand-in of the DynamoDB
+client, for an empty, a typical and a large session.
+
+Reported per request: wall time, bytes allocated, DynamoDB calls and bytes
+sent to DynamoDB. Results are written as JSON to compare releases:
+
+    python benchmarks/lifecycle.py --requests 200 --output lifecycle.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# moto refuses to run without credentials
+for name, value in (
+    ("AWS_ACCESS_KEY_ID", "testing"),
+    ("AWS_SECRET_ACCESS_KEY", "testing"),
+    ("AWS_DEFAULT_REGION", "ap-northeast-1"),
+):
+    os.environ.setdefault(name, value)
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=["django.contrib.sessions", "dysession"],
+        SESSION_ENGINE="dysession.backends.db",
+        SECRET_KEY="not-secret",
+        ALLOWED_HOSTS=["*"],
+    )
+    django.setup()
+
+import boto3  # noqa: E402
+from django.http import HttpRequest, HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from dysession.aws.dynamodb import create_dynamodb_table  # noqa: E402
+from dysession.middleware import SessionMiddleware  # noqa: E402
+from dysession.settings import get_settings  # noqa: E402
+
+OPERATIONS = ("get_item", "put_item", "update_item", "delete_item")
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    return str(value)
+
+
+class CountingClient:
+    """Proxy of a DynamoDB client counting calls and request bytes per operation
+
+    Bytes are the size of the request parameters encoded as JSON, which is
+    how botocore sends them to DynamoDB.
+    """
+
+    def __init__(self, client) -> None:
+        self._client = client
+        self.exceptions = client.exceptions
+        self.calls: Counter = Counter()
+        self.bytes_sent = 0
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._client, name)
+        if name not in OPERATIONS:
+            return method
+
+        def call(**kwargs: Any) -> Any:
+            self.calls[name] += 1
+            self.bytes_sent += len(json.dumps(kwargs, default=_json_default))
+            return method(**kwargs)
+
+        return call
+
+    def reset(self) -> None:
+        self.calls = Counter()
+        self.bytes_sent = 0
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class InMemoryDynamoDBClient:
+    """In-memory stand-in of the low-level client operations the backend uses
+
+    It understands exactly the requests built by `dysession.aws.codec`, so
+    the cost of moto's request parsing does not hide the backend's own.
+    """
+
+    exceptions = SimpleNamespace(
+        ConditionalCheckFailedException=ConditionalCheckFailedException
+    )
+
+    def __init__(self) -> None:
+        self.tables: Dict[str, Dict[str, Dict]] = {}
+
+    def _key(self, key: Dict[str, Dict[str, str]]) -> str:
+        ((_, value),) = key.items()
+        return value["S"]
+
+    def _check(self, request: Dict, exists: bool) -> None:
+        condition = request.get("ConditionExpression")
+        if condition is None:
+            return
+        if condition.startswith("attribute_not_exists") and exists:
+            raise ConditionalCheckFailedException()
+        if condition.startswith("attribute_exists") and not exists:
+            raise ConditionalCheckFailedException()
+
+    def get_item(self, **request: Any) -> Dict:
+        table = self.tables.setdefault(request["TableName"], {})
+        item = table.get(self._key(request["Key"]))
+        if item is None:
+            return {}
+        if "ProjectionExpression" in request:
+            names = request["ExpressionAttributeNames"]
+            item = {names[name]: item[names[name]] for name in names}
+        return {"Item": dict(item)}
+
+    def put_item(self, **request: Any) -> Dict:
+        table = self.tables.setdefault(request["TableName"], {})
+        pk = get_settings().partition_key_name
+        key = request["Item"][pk]["S"]
+        self._check(request, key in table)
+        table[key] = dict(request["Item"])
+        return {}
+
+    def update_item(self, **request: Any) -> Dict:
+        table = self.tables.setdefault(request["TableName"], {})
+        key = self._key(request["Key"])
+        self._check(request, key in table)
+
+        item = table.setdefault(key, dict(request["Key"]))
+        names = request["ExpressionAttributeNames"]
+        values = request.get("ExpressionAttributeValues", {})
+        expression = request["UpdateExpression"]
+        set_part, _, remove_part = expression.partition("REMOVE ")
+        if set_part.startswith("SET "):
+            for clause in set_part[4:].split(","):
+                name, value = (part.strip() for part in clause.split("="))
+                item[names[name]] = values[value]
+        for name in filter(None, (part.strip() for part in remove_part.split(","))):
+            item.pop(names[name], None)
+        return {}
+
+    def delete_item(self, **request: Any) -> Dict:
+        self.tables.setdefault(request["TableName"], {}).pop(
+            self._key(request["Key"]), None
+        )
+        return {}
+
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # Anonymous visitor, the session is never loaded nor saved
+    "empty": {},
+    # Authenticated user with a handful of small keys
+    "typical": {
+        "_auth_user_id": "42",
+        "_auth_user_backend": "django.contrib.auth.backends.ModelBackend",
+        "_auth_user_hash": "0" * 64,
+        "cart": [{"sku": f"SKU-{i}", "quantity": i} for i in range(5)],
+        "preferences": {"language": "en", "theme": "dark", "timezone": "UTC"},
+        "csrf": "x" * 32,
+    },
+    # Session carrying a large payload, e.g. a multi-step form
+    "large": {
+        "_auth_user_id": "42",
+        "form": {f"field{i}": "value " * 50 for i in range(200)},
+    },
+}
+
+
+def make_view(scenario: str) -> Callable[[HttpRequest], HttpResponse]:
+    def view(request: HttpRequest) -> HttpResponse:
+        session = request.session
+        if scenario == "empty":
+            session.get("_auth_user_id")
+        else:
+            session.get("_auth_user_id")
+            session.get("preferences")
+            session["counter"] = session.get("counter", 0) + 1
+        return HttpResponse("ok")
+
+    return view
+
+
+def create_session(middleware: SessionMiddleware, data: Dict[str, Any]) -> Optional[str]:
+    """Save a session holding data through the middleware and return its key"""
+    if not data:
+        return None
+
+    def view(request: HttpRequest) -> HttpResponse:
+        for key, value in data.items():
+            request.session[key] = value
+        return HttpResponse("ok")
+
+    request = RequestFactory().get("/")
+    middleware.get_response = view
+    response = middleware(request)
+    return response.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def run_request(middleware: SessionMiddleware, session_key: Optional[str]) -> None:
+    factory = RequestFactory()
+    if session_key is not None:
+        factory.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    middleware(factory.get("/"))
+
+
+def measure(
+    client: CountingClient, scenario: str, requests: int, alloc_requests: int
+) -> Dict[str, Any]:
+    middleware = SessionMiddleware(lambda request: HttpResponse("ok"))
+    session_key = create_session(middleware, SCENARIOS[scenario])
+    middleware.get_response = make_view(scenario)
+
+    # warm up imports, clients and caches
+    for _ in range(3):
+        run_request(middleware, session_key)
+
+    client.reset()
+    durations: List[float] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        run_request(middleware, session_key)
+        durations.append(time.perf_counter() - start)
+    calls, bytes_sent = Counter(client.calls), client.bytes_sent
+
+    tracemalloc.start()
+    allocated = []
+    for _ in range(alloc_requests):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run_request(middleware, session_key)
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    durations.sort()
+    return {
+        "scenario": scenario,
+        "requests": requests,
+        "wall_ms_mean": statistics.mean(durations) * 1000,
+        "wall_ms_p50": durations[len(durations) // 2] * 1000,
+        "wall_ms_p95": durations[int(len(durations) * 0.95) - 1] * 1000,
+        "peak_alloc_bytes_per_request": statistics.mean(allocated),
+        "dynamodb_calls_per_request": {
+            op: calls[op] / requests for op in OPERATIONS if calls[op]
+        },
+        "dynamodb_bytes_sent_per_request": bytes_sent / requests,
+    }
+
+
+def run_backend(
+    backend: str, scenarios: List[str], requests: int, alloc_requests: int
+) -> List[Dict[str, Any]]:
+    config = get_settings()
+    mocker = None
+    if backend == "moto":
+        from moto import mock_dynamodb
+
+        mocker = mock_dynamodb()
+        mocker.start()
+        raw_client = boto3.client("dynamodb", region_name=config.region)
+        create_dynamodb_table(
+            options={
+                "pk": config.partition_key_name,
+                "table": config.table_name,
+            },
+            client=raw_client,
+        )
+    else:
+        raw_client = InMemoryDynamoDBClient()
+
+    client = CountingClient(raw_client)
+    try:
+        with mock.patch("dysession.backends.db.get_client", return_value=client):
+            results = []
+            for scenario in scenarios:
+                result = measure(client, scenario, requests, alloc_requests)
+                results.append({"backend": backend, **result})
+            return results
+    finally:
+        if mocker is not None:
+            mocker.stop()
+
+
+def _version(package: str) -> str:
+    try:
+        from importlib.metadata import version
+
+        return version(package)
+    except Exception:
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--alloc-requests",
+        type=int,
+        default=20,
+        help="requests measured under tracemalloc, which slows them down",
+    )
+    parser.add_argument(
+        "--backends", nargs="+", choices=("moto", "memory"), default=["moto", "memory"]
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=tuple(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=("ATTRIBUTES", "BINARY"),
+        default="ATTRIBUTES",
+        help="DYSESSION['ENCODING']['FORMAT'] to benchmark",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with override_settings(DYSESSION={"ENCODING": {"FORMAT": args.encoding}}):
+        results = []
+        for backend in args.backends:
+            results.extend(
+                run_backend(backend, args.scenarios, args.requests, args.alloc_requests)
+            )
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "django-dysession": _version("django-dysession"),
+            "boto3": boto3.__version__,
+            "encoding": args.encoding,
+        },
+        "results": results,
+    }
+
+    print(
+        f"{'backend':<8}{'scenario':<10}{'ms mean':>9}{'ms p95':>9}"
+        f"{'alloc B':>10}{'calls':>7}{'sent B':>9}"
+    )
+    for result in results:
+        print(
+            f"{result['backend']:<8}{result['scenario']:<10}"
+            f"{result['wall_ms_mean']:>9.3f}{result['wall_ms_p95']:>9.3f}"
+            f"{result['peak_alloc_bytes_per_request']:>10.0f}"
+            f"{sum(result['dynamodb_calls_per_request'].values()):>7.2f}"
+            f"{result['dynamodb_bytes_sent_per_request']:>9.0f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,10 @@ from django.apps import AppConfig
 
 class DjangoDysessionConfig(AppConfig):
     name = "dysession"
-    verbose_name = 'Django DynamoDB Session Backend'
\ No newline at end of file
+    verbose_name = 'Django DynamoDB Session Backend'
+
+    def ready(self) -> None:
+        from dysession.settings import get_settings
+
+        # Fail at startup instead of on the first request if DYSESSION is invalid
+        get_settings()
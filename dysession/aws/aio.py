@@ -0,0 +1,473 @@
+"""
+asyncio counterpart of `dysession.aws.dynamodb` built on aiobotocore.
+
+Requests are built and items decoded by `dysession.aws.codec`, the same code
+the blocking helpers use, so both paths store and read identical items.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from datetime import datetime
+from typing import Callable, Dict, Literal, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+
+from dysession.aws.capacity import record_consumed_capacity
+from dysession.aws.client import client_config_kwargs
+from dysession.aws.codec import (
+    delete_item_request,
+    get_item_request,
+    is_session_expired,
+    item_to_model,
+    put_item_request,
+    update_item_request,
+)
+from dysession.aws.dynamodb import _count_skipped_write
+from dysession.aws.error import DynamodbItemNotFound
+from dysession.backends.error import (
+    SessionExpired,
+    SessionKeyDoesNotExist,
+    SessionKeyDuplicated,
+)
+from dysession.backends.local_cache import LocalSessionCache, get_local_cache
+from dysession.backends.model import Changes, SessionDataModel
+from dysession.logger import get_logger
+from dysession.logger.sampling import get_miss_log
+from dysession.metrics import track
+
+from ..settings import DysessionSettings, get_settings
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import AioSession
+except ImportError:  # pragma: no cover
+    AioConfig = AioSession = None
+
+
+class AsyncClientRegistry:
+    """Registry of aiobotocore DynamoDB clients
+
+    An aiobotocore client owns an aiohttp connection pool bound to the event
+    loop which created it, so clients are shared per (event loop, region,
+    credentials profile). They are closed when `asyncio.run()` (also used by
+    `async_to_sync`) shuts their loop down. Clients of a loop closed another
+    way are forgotten, unclosed, the next time a client is looked up.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # keyed by id(loop), a client holds its loop so it cannot be weakly keyed
+        self._clients: Dict[int, Dict] = {}
+        self._pid = os.getpid()
+
+    def _loop_clients(self, loop: asyncio.AbstractEventLoop) -> Dict:
+        with self._lock:
+            if self._pid != os.getpid():
+                # never reuse the parent's connections in a forked child
+                self._clients = {}
+                self._pid = os.getpid()
+            for loop_id, entry in list(self._clients.items()):
+                if entry["loop"]().is_closed():
+                    del self._clients[loop_id]
+            entry = self._clients.get(id(loop))
+            if entry is None:
+                entry = self._clients[id(loop)] = {
+                    "loop": weakref.ref(loop),
+                    "lock": asyncio.Lock(),
+                    "clients": {},
+                    "watcher": loop.create_task(self._close_on_shutdown()),
+                }
+            return entry
+
+    async def _close_on_shutdown(self) -> None:
+        try:
+            await asyncio.get_running_loop().create_future()
+        except asyncio.CancelledError:
+            # asyncio.run() cancels the remaining tasks before closing the loop
+            await self.close()
+            raise
+
+    async def get(
+        self, region_name: Optional[str] = None, profile_name: Optional[str] = None
+    ):
+        if AioSession is None:
+            raise ImproperlyConfigured(
+                "dysession's async session store requires aiobotocore, "
+                "install it with `pip install django-dysession[async]`."
+            )
+
+        if region_name is None:
+            region_name = get_settings().region
+        if profile_name is None:
+            profile_name = get_settings().profile
+
+        key = (region_name, profile_name)
+        entry = self._loop_clients(asyncio.get_running_loop())
+        client = entry["clients"].get(key)
+        if client is not None:
+            return client
+
+        async with entry["lock"]:
+            client = entry["clients"].get(key)
+            if client is None:
+                session = AioSession(profile=profile_name)
+                config = get_settings()
+                context = session.create_client(
+                    "dynamodb",
+                    region_name=region_name,
+                    endpoint_url=config.client["ENDPOINT_URL"],
+                    config=AioConfig(**client_config_kwargs(config)),
+                )
+                client = await context.__aenter__()
+                entry["clients"][key] = client
+            return client
+
+    async def close(self) -> None:
+        """Close the clients of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._clients.pop(id(loop), None)
+        if entry is None:
+            return
+        if entry["watcher"] is not asyncio.current_task():
+            entry["watcher"].cancel()
+        async with entry["lock"]:
+            for client in entry["clients"].values():
+                await client.__aexit__(None, None, None)
+
+
+_registry = AsyncClientRegistry()
+
+
+async def get_async_client(
+    region_name: Optional[str] = None, profile_name: Optional[str] = None
+):
+    """Return the shared aiobotocore DynamoDB client of the running event loop"""
+    return await _registry.get(region_name=region_name, profile_name=profile_name)
+
+
+async def close_async_clients() -> None:
+    """Close the pooled clients of the running event loop, e.g. on ASGI shutdown"""
+    await _registry.close()
+
+
+async def akey_exists(
+    session_key: str,
+    table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+) -> bool:
+
+    if client is None:
+        client = await get_async_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    assert type(session_key) is str, "session_key should be string type"
+
+    with track("GetItem", table_name) as timer:
+        response = await client.get_item(
+            **get_item_request(session_key, table_name, key_only=True, config=config)
+        )
+        timer.outcome = "hit" if "Item" in response else "miss"
+    record_consumed_capacity("GetItem", response)
+    return "Item" in response
+
+
+async def aget_item(
+    session_key: str,
+    table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+) -> SessionDataModel:
+
+    if client is None:
+        client = await get_async_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    assert type(session_key) is str, "session_key should be string type"
+
+    logging.info("Get Item from DynamoDB")
+
+    with track("GetItem", table_name) as timer:
+        response = await client.get_item(
+            **get_item_request(session_key, table_name, config=config)
+        )
+        record_consumed_capacity("GetItem", response)
+        if "Item" not in response:
+            raise DynamodbItemNotFound()
+        timer.outcome = "hit"
+
+    return item_to_model(session_key, response["Item"], config)
+
+
+async def ainsert_session_item(
+    data: SessionDataModel,
+    table_name: Optional[str] = None,
+    return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"] = "TOTAL",
+    ignore_duplicated: bool = True,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+) -> Dict:
+    """Insert a session key"""
+
+    assert type(data.session_key) is str, "session_key should be string type"
+
+    if client is None:
+        client = await get_async_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    try:
+        with track("PutItem", table_name):
+            response = await client.put_item(
+                **put_item_request(
+                    data,
+                    table_name,
+                    return_consumed_capacity,
+                    must_create=not ignore_duplicated,
+                    config=config,
+                )
+            )
+    except client.exceptions.ConditionalCheckFailedException:
+        logger = get_logger()
+        logger.error(f"'{data.session_key}' is already an item of table '{table_name}'.")
+        raise SessionKeyDuplicated
+
+    record_consumed_capacity("PutItem", response)
+    return response
+
+
+async def aupdate_session_item(
+    data: SessionDataModel,
+    table_name: Optional[str] = None,
+    return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"] = "TOTAL",
+    client=None,
+    config: Optional[DysessionSettings] = None,
+    changes: Optional[Changes] = None,
+) -> Optional[Dict]:
+    """Write only the keys which changed since the item was loaded, see `update_session_item`"""
+
+    assert type(data.session_key) is str, "session_key should be string type"
+
+    if client is None:
+        client = await get_async_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    request = update_item_request(
+        data, table_name, return_consumed_capacity, config=config, changes=changes
+    )
+    if request is None:
+        return None
+
+    try:
+        with track("UpdateItem", table_name):
+            response = await client.update_item(**request)
+    except client.exceptions.ConditionalCheckFailedException:
+        raise DynamodbItemNotFound()
+
+    record_consumed_capacity("UpdateItem", response)
+    return response
+
+
+async def adelete_session_item(
+    data: SessionDataModel,
+    table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+) -> Dict:
+    """Delete a session key"""
+
+    assert type(data.session_key) is str, "session_key should be string type"
+
+    if client is None:
+        client = await get_async_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    with track("DeleteItem", table_name):
+        response = await client.delete_item(
+            **delete_item_request(data.session_key, table_name, config)
+        )
+
+    record_consumed_capacity("DeleteItem", response)
+    return response
+
+
+class AsyncDynamoDB:
+    """asyncio twin of `dysession.aws.dynamodb.DynamoDB`"""
+
+    def __init__(
+        self,
+        client=None,
+        cache: Optional[LocalSessionCache] = None,
+        config: Optional[DysessionSettings] = None,
+    ) -> None:
+        self.client = client
+        self.config = config or get_settings()
+        self.cache = cache if cache is not None else get_local_cache()
+
+    async def get(
+        self,
+        session_key: Optional[str] = None,
+        table_name: Optional[str] = None,
+        expired_time_fn: Callable[[], datetime] = datetime.now,
+    ) -> SessionDataModel:
+        """Return session data if dynamodb partision key is matched with inputed session_key"""
+        if session_key is None:
+            raise ValueError("session_key should be str type")
+
+        if table_name is None:
+            table_name = self.config.table_name
+
+        now = expired_time_fn()
+
+        with track("load", table_name) as timer:
+            try:
+                model = None
+                if self.cache is not None:
+                    # taken before the fetch, which is not cached if it races
+                    # an invalidation
+                    generation = self.cache.generation(session_key, table_name)
+                    model = self.cache.get(session_key, table_name)
+                if model is None:
+                    model = await aget_item(
+                        session_key=session_key,
+                        table_name=table_name,
+                        client=self.client,
+                        config=self.config,
+                    )
+                    timer.outcome = "hit"
+                    # an item of the other encoding format is not cached until
+                    # its next save rewrites it
+                    if self.cache is not None and model.is_persisted:
+                        self.cache.set(model, table_name, generation)
+                else:
+                    timer.outcome = "cache_hit"
+                if is_session_expired(model, now, self.config):
+                    raise SessionExpired
+            except DynamodbItemNotFound:
+                get_miss_log().missing(session_key, table_name)
+                raise SessionKeyDoesNotExist
+            except SessionExpired:
+                get_miss_log().expired(session_key)
+                raise SessionExpired
+
+        return model
+
+    async def set(
+        self,
+        data: SessionDataModel,
+        table_name: Optional[str] = None,
+        return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"] = "TOTAL",
+        ignore_duplicated: bool = True,
+        changes: Optional[Changes] = None,
+    ) -> None:
+        """Write data, `changes` defaults to `data.changes()`"""
+        if table_name is None:
+            table_name = self.config.table_name
+        if changes is None:
+            changes = data.changes()
+
+        with track("save", table_name) as timer:
+            if ignore_duplicated and data.is_persisted and not changes.is_dirty:
+                _count_skipped_write()
+                timer.outcome = "skipped"
+                return
+
+            try:
+                if ignore_duplicated and data.is_persisted:
+                    try:
+                        await aupdate_session_item(
+                            data,
+                            table_name,
+                            return_consumed_capacity,
+                            client=self.client,
+                            config=self.config,
+                            changes=changes,
+                        )
+                    except DynamodbItemNotFound:
+                        await ainsert_session_item(
+                            data,
+                            table_name,
+                            return_consumed_capacity,
+                            client=self.client,
+                            config=self.config,
+                        )
+                else:
+                    await ainsert_session_item(
+                        data,
+                        table_name,
+                        return_consumed_capacity,
+                        ignore_duplicated=ignore_duplicated,
+                        client=self.client,
+                        config=self.config,
+                    )
+                data.mark_clean(changes=changes)
+            finally:
+                self._invalidate(data.session_key, table_name)
+
+    async def exists(self, session_key: str) -> bool:
+        if type(session_key) is not str:
+            raise TypeError(
+                f"session_key should be type of str instead of {type(session_key)}."
+            )
+
+        with track("exists", self.config.table_name) as timer:
+            exists = await akey_exists(
+                session_key=session_key, client=self.client, config=self.config
+            )
+            timer.outcome = "hit" if exists else "miss"
+        return exists
+
+    async def delete(
+        self, data: SessionDataModel, table_name: Optional[str] = None
+    ) -> None:
+        if data.session_key is None:
+            return
+
+        if table_name is None:
+            table_name = self.config.table_name
+
+        try:
+            with track("delete", table_name):
+                await adelete_session_item(
+                    data=data,
+                    table_name=table_name,
+                    client=self.client,
+                    config=self.config,
+                )
+        finally:
+            self._invalidate(data.session_key, table_name)
+
+    def _invalidate(self, session_key: Optional[str], table_name: str) -> None:
+        if self.cache is not None and isinstance(session_key, str):
+            self.cache.invalidate(session_key, table_name)
+
+
+__all__ = [
+    "AsyncClientRegistry",
+    "AsyncDynamoDB",
+    "get_async_client",
+    "close_async_clients",
+    "akey_exists",
+    "aget_item",
+    "ainsert_session_item",
+    "aupdate_session_item",
+    "adelete_session_item",
+]
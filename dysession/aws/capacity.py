@@ -0,0 +1,213 @@
+"""
+Ledger of the DynamoDB capacity consumed by the session backend.
+
+Every request the backend sends asks for `ReturnConsumedCapacity="TOTAL"` and
+the consumed units are recorded:
+
+* per process, by table and DynamoDB operation,
+* per HTTP request, in the `capacity_scope` the middleware opens,
+* per endpoint (view name), folded in when the request ends.
+
+When a request consumed capacity, `request_capacity_consumed` is sent with
+the request, its endpoint and its `ConsumedCapacity`. Connect a receiver to
+log it or to forward it to a metrics system.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.dispatch import Signal
+
+from dysession.metrics import _escape
+
+# DynamoDB operations billed in read capacity units, the others in write units
+READ_OPERATIONS = frozenset(("GetItem", "BatchGetItem", "Query", "Scan"))
+
+# Sent with `request`, `endpoint` and `capacity` at the end of every request
+# which consumed DynamoDB capacity
+request_capacity_consumed = Signal()
+
+
+class ConsumedCapacity:
+    """Read / write capacity units consumed by a number of DynamoDB calls"""
+
+    __slots__ = ("read_units", "write_units", "calls")
+
+    def __init__(
+        self, read_units: float = 0.0, write_units: float = 0.0, calls: int = 0
+    ) -> None:
+        self.read_units = read_units
+        self.write_units = write_units
+        self.calls = calls
+
+    def add(self, operation: str, units: float) -> None:
+        if operation in READ_OPERATIONS:
+            self.read_units += units
+        else:
+            self.write_units += units
+        self.calls += 1
+
+    def merge(self, other: "ConsumedCapacity") -> None:
+        self.read_units += other.read_units
+        self.write_units += other.write_units
+        self.calls += other.calls
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "read_units": self.read_units,
+            "write_units": self.write_units,
+            "calls": self.calls,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"ConsumedCapacity(read_units={self.read_units}, "
+            f"write_units={self.write_units}, calls={self.calls})"
+        )
+
+
+class CapacityLedger:
+    """Thread safe process-wide totals of the consumed capacity"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._operations: Dict[Tuple[str, str], ConsumedCapacity] = {}
+        self._endpoints: Dict[str, ConsumedCapacity] = {}
+
+    def record(self, operation: str, table_name: str, units: float) -> None:
+        with self._lock:
+            key = (table_name, operation)
+            if key not in self._operations:
+                self._operations[key] = ConsumedCapacity()
+            self._operations[key].add(operation, units)
+
+    def record_endpoint(self, endpoint: str, capacity: ConsumedCapacity) -> None:
+        with self._lock:
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = ConsumedCapacity()
+            self._endpoints[endpoint].merge(capacity)
+
+    def total(self) -> ConsumedCapacity:
+        total = ConsumedCapacity()
+        with self._lock:
+            for capacity in self._operations.values():
+                total.merge(capacity)
+        return total
+
+    def top_endpoints(self, n: int = 10) -> List[Tuple[str, ConsumedCapacity]]:
+        """Return the n endpoints which consumed the most capacity units"""
+        with self._lock:
+            endpoints = list(self._endpoints.items())
+        endpoints.sort(key=lambda item: item[1].read_units + item[1].write_units)
+        return endpoints[::-1][:n]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the totals as a JSON serializable dictionary"""
+        with self._lock:
+            return {
+                "operations": [
+                    {"table": table, "operation": operation, **capacity.as_dict()}
+                    for (table, operation), capacity in sorted(self._operations.items())
+                ],
+                "endpoints": {
+                    endpoint: capacity.as_dict()
+                    for endpoint, capacity in sorted(self._endpoints.items())
+                },
+            }
+
+    def render_text(self) -> str:
+        """Render the totals in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP dysession_consumed_capacity_units_total DynamoDB capacity units "
+            "consumed by operation.",
+            "# TYPE dysession_consumed_capacity_units_total counter",
+        ]
+        for row in snapshot["operations"]:
+            kind = "read" if row["operation"] in READ_OPERATIONS else "write"
+            lines.append(
+                "dysession_consumed_capacity_units_total{"
+                f'table="{_escape(row["table"])}",operation="{row["operation"]}",'
+                f'kind="{kind}"}} {row[kind + "_units"]}'
+            )
+        lines.extend(
+            [
+                "# HELP dysession_endpoint_consumed_capacity_units_total DynamoDB "
+                "capacity units consumed by endpoint.",
+                "# TYPE dysession_endpoint_consumed_capacity_units_total counter",
+            ]
+        )
+        for endpoint, capacity in snapshot["endpoints"].items():
+            for kind in ("read", "write"):
+                lines.append(
+                    "dysession_endpoint_consumed_capacity_units_total{"
+                    f'endpoint="{_escape(endpoint)}",kind="{kind}"}} '
+                    f'{capacity[kind + "_units"]}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations = {}
+            self._endpoints = {}
+
+
+_ledger = CapacityLedger()
+_scope: ContextVar[Optional[ConsumedCapacity]] = ContextVar(
+    "dysession_capacity_scope", default=None
+)
+
+
+def get_ledger() -> CapacityLedger:
+    """Return the process-wide capacity ledger"""
+    return _ledger
+
+
+@contextmanager
+def capacity_scope() -> Iterator[ConsumedCapacity]:
+    """Collect the capacity consumed within the block, e.g. by one HTTP request
+
+    Scopes nest: the capacity is charged to the innermost one only.
+    """
+    capacity = ConsumedCapacity()
+    token = _scope.set(capacity)
+    try:
+        yield capacity
+    finally:
+        _scope.reset(token)
+
+
+def record_consumed_capacity(operation: str, response: Dict[str, Any]) -> None:
+    """Record the `ConsumedCapacity` of a DynamoDB response
+
+    The response holds a single entry, or a list of entries for batch
+    operations.
+    """
+    consumed = response.get("ConsumedCapacity")
+    if not consumed:
+        return
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+
+    total = 0.0
+    for entry in consumed:
+        units = float(entry.get("CapacityUnits", 0))
+        _ledger.record(operation, entry.get("TableName", ""), units)
+        total += units
+
+    scope = _scope.get()
+    if scope is not None:
+        scope.add(operation, total)
+
+
+__all__ = [
+    "CapacityLedger",
+    "ConsumedCapacity",
+    "READ_OPERATIONS",
+    "capacity_scope",
+    "get_ledger",
+    "record_consumed_capacity",
+    "request_capacity_consumed",
+]
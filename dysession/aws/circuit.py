@@ -0,0 +1,145 @@
+"""
+Circuit breaker of the DynamoDB session calls.
+
+With `CIRCUIT_BREAKER["ENABLED"]`, `DynamoDB.get`, `set` and `delete` go
+through a process-wide breaker. A call fails the breaker when DynamoDB throttles
+it, times out or cannot be reached, or when it answers slower than its
+deadline (`READ_DEADLINE` / `WRITE_DEADLINE`). A blocking botocore call cannot
+be interrupted, `DYSESSION["CLIENT"]` timeouts bound how long it waits.
+
+After `FAILURE_THRESHOLD` failures in a row the breaker opens and sessions are
+degraded instead of waiting on DynamoDB:
+
+* reads are served by the local cache, or the session is anonymous for the
+  request and its stored data is left untouched,
+* writes are queued for write-behind or dropped, see `WRITE_POLICY`, except
+  the creation of a session which raises `SessionUnavailable`.
+
+After `RESET_TIMEOUT` seconds a single call is let through (half-open): it
+closes the breaker if it succeeds and opens it again if it fails. Every state
+change is counted by the ``circuit`` series of `dysession.metrics`.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterator, Optional, Tuple
+
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from dysession.aws.routing import is_failover_error
+from dysession.logger import get_logger
+from dysession.metrics import get_registry
+
+from ..settings import get_settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe three-state circuit breaker"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Return True if a call may be sent, False if it should be degraded"""
+        change = None
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                change = self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                allowed = True
+            elif self._probing:
+                # half-open, let a single probe through
+                allowed = False
+            else:
+                self._probing = allowed = True
+        self._report(change)
+        return allowed
+
+    def record(self, success: bool) -> None:
+        change = None
+        with self._lock:
+            self._probing = False
+            if success:
+                self._failures = 0
+                if self.state != CLOSED:
+                    change = self._transition(CLOSED)
+            else:
+                self._failures += 1
+                if self.state == HALF_OPEN or (
+                    self.state == CLOSED and self._failures >= self.failure_threshold
+                ):
+                    self._opened_at = self.clock()
+                    change = self._transition(OPEN)
+        self._report(change)
+
+    @contextmanager
+    def guard(self, deadline: Optional[float] = None) -> Iterator[None]:
+        """Record the outcome of the call made in the block
+
+        Errors telling DynamoDB is unavailable and calls slower than deadline
+        are failures. Other errors (a missing item, a failed condition) mean
+        DynamoDB answered and are successes.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(not is_failover_error(e))
+            raise
+        elapsed = time.perf_counter() - start
+        self.record(deadline is None or elapsed <= deadline)
+
+    def _transition(self, state: str) -> Tuple[str, str]:
+        # called with the lock held, reported by _report once it is released
+        previous, self.state = self.state, state
+        return previous, state
+
+    def _report(self, change: Optional[Tuple[str, str]]) -> None:
+        if change is None:
+            return
+        previous, state = change
+        get_registry().observe("circuit", "", state, 0.0)
+        get_logger().warning(f"DynamoDB circuit breaker {previous} -> {state}")
+
+
+@lru_cache
+def get_breaker() -> Optional[CircuitBreaker]:
+    """Return the process-wide breaker, or None if `CIRCUIT_BREAKER` is disabled"""
+    options = get_settings().circuit_breaker
+    if not options["ENABLED"]:
+        return None
+    return CircuitBreaker(
+        failure_threshold=options["FAILURE_THRESHOLD"],
+        reset_timeout=options["RESET_TIMEOUT"],
+    )
+
+
+@receiver(setting_changed)
+def update_breaker(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        get_breaker.cache_clear()  # pragma: no cover
+
+
+__all__ = ["CircuitBreaker", "get_breaker", "CLOSED", "OPEN", "HALF_OPEN"]
@@ -0,0 +1,142 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from ..settings import DysessionSettings, get_settings
+
+ClientKey = Tuple[Optional[str], Optional[str], bool]
+
+
+def client_config_kwargs(config: Optional[DysessionSettings] = None) -> Dict[str, Any]:
+    """Keyword arguments of the botocore `Config` described by `DYSESSION["CLIENT"]`"""
+    options = (config or get_settings()).client
+    return {
+        "max_pool_connections": options["MAX_POOL_CONNECTIONS"],
+        "connect_timeout": options["CONNECT_TIMEOUT"],
+        "read_timeout": options["READ_TIMEOUT"],
+        "tcp_keepalive": options["TCP_KEEPALIVE"],
+        "retries": {
+            "mode": options["RETRY_MODE"],
+            "total_max_attempts": options["MAX_ATTEMPTS"],
+        },
+    }
+
+
+class ClientRegistry:
+    """Process-wide registry of boto3 DynamoDB clients
+
+    botocore clients are thread-safe and own their HTTP connection pool,
+    so one client per (region, credentials profile) is shared by every
+    request and thread of a worker process. Clients are configured by
+    `DYSESSION["CLIENT"]`, except the maintenance clients of the management
+    commands: their long Scans and table operations keep botocore's default
+    timeouts and retries.
+
+    Clients of the same profile are built from one boto3 session, so they
+    share their exception classes whatever their region.
+
+    The registry remembers the pid which built its clients. A forked child
+    (e.g. a gunicorn worker forked from a preloaded master) must not share
+    the parent's sockets, so clients are dropped and rebuilt lazily on the
+    first call after a fork.
+    """
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def get(
+        self,
+        region_name: Optional[str] = None,
+        profile_name: Optional[str] = None,
+        maintenance: bool = False,
+    ):
+        if region_name is None:
+            region_name = get_settings().region
+        if profile_name is None:
+            profile_name = get_settings().profile
+
+        if self._pid != os.getpid():
+            self._reset()
+
+        key = (region_name, profile_name, maintenance)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            # another thread may have built it while we were waiting
+            client = self._clients.get(key)
+            if client is None:
+                session = self._sessions.get(profile_name)
+                if session is None:
+                    session = boto3.session.Session(profile_name=profile_name)
+                    self._sessions[profile_name] = session
+                config = get_settings()
+                client = session.client(
+                    "dynamodb",
+                    region_name=region_name,
+                    endpoint_url=config.client["ENDPOINT_URL"],
+                    config=Config(
+                        **({} if maintenance else client_config_kwargs(config))
+                    ),
+                )
+                self._clients[key] = client
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients = {}
+            self._sessions = {}
+
+    def _reset(self) -> None:
+        # Also run in a forked child, where the old lock may have been held by
+        # a thread of the parent at fork time: it is replaced, never acquired.
+        self._lock = threading.Lock()
+        self._clients: Dict[ClientKey, object] = {}
+        self._sessions: Dict[Optional[str], boto3.session.Session] = {}
+        self._pid = os.getpid()
+
+
+_registry = ClientRegistry()
+
+if hasattr(os, "register_at_fork"):  # pragma: no cover
+    os.register_at_fork(after_in_child=_registry._reset)
+
+
+@receiver(setting_changed)
+def update_clients(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        _registry.clear()  # pragma: no cover
+
+
+def get_client(region_name: Optional[str] = None, profile_name: Optional[str] = None):
+    """Return the shared DynamoDB client of given region and credentials profile"""
+    return _registry.get(region_name=region_name, profile_name=profile_name)
+
+
+def get_maintenance_client(
+    region_name: Optional[str] = None, profile_name: Optional[str] = None
+):
+    """Return the shared client of the maintenance tasks, on botocore's defaults"""
+    return _registry.get(
+        region_name=region_name, profile_name=profile_name, maintenance=True
+    )
+
+
+def clear_clients() -> None:
+    """Drop every pooled client, they will be rebuilt on demand"""
+    _registry.clear()
+
+
+__all__ = [
+    "ClientRegistry",
+    "client_config_kwargs",
+    "get_client",
+    "get_maintenance_client",
+    "clear_clients",
+]
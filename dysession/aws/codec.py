@@ -0,0 +1,303 @@
+"""
+Request building and item decoding shared by the blocking (`dysession.aws.dynamodb`)
+and the asyncio (`dysession.aws.aio`) DynamoDB layers.
+
+Sessions are stored in one of two formats, selected by `ENCODING["FORMAT"]`:
+
+* ``ATTRIBUTES``: every session key is a top-level attribute of the item.
+* ``BINARY``: the session is serialized with Django's `SESSION_SERIALIZER`,
+  optionally compressed, and stored in the single binary attribute
+  `SESSION_DATA_ATTRIBUTE`. Only the partition key and the TTL attribute stay
+  top-level, so DynamoDB's TTL keeps working.
+
+Items of both formats are always readable, an item read in the other format
+is rewritten in the configured one by its next save.
+
+Every function takes the `DysessionSettings` to use as `config`, defaulting
+to `get_settings()`.
+"""
+
+import lzma
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from dysession.backends.model import Changes, PartialSessionDataModel, SessionDataModel
+
+from ..settings import DysessionSettings, get_settings
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+SESSION_DATA_ATTRIBUTE = "session_data"
+
+# Header of a binary session: magic, format version, compression id
+FORMAT_MAGIC = b"dy"
+FORMAT_VERSION = 1
+_COMPRESSION_IDS = {None: 0, "zlib": 1, "lzma": 2}
+_COMPRESSORS = {1: zlib.compress, 2: lzma.compress}
+_DECOMPRESSORS = {1: zlib.decompress, 2: lzma.decompress}
+
+
+def is_binary_format(config: Optional[DysessionSettings] = None) -> bool:
+    return (config or get_settings()).is_binary_format
+
+
+def _plain(value: Any) -> Any:
+    # Items read from the ATTRIBUTES format hold Decimal numbers, which
+    # Django's JSONSerializer cannot encode
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def encode_session(
+    data: SessionDataModel, config: Optional[DysessionSettings] = None
+) -> bytes:
+    """Serialize the session keys of data, except the partition key and the TTL"""
+    config = config or get_settings()
+    skipped = (config.partition_key_name, config.ttl_attribute_name)
+
+    payload = import_string(settings.SESSION_SERIALIZER)().dumps(
+        {key: _plain(value) for key, value in data.items() if key not in skipped}
+    )
+
+    compression = config.encoding["COMPRESSION"]
+    compression_id = 0
+    if compression is not None and len(payload) >= config.encoding["COMPRESS_THRESHOLD"]:
+        compression_id = _COMPRESSION_IDS[compression]
+        payload = _COMPRESSORS[compression_id](payload)
+
+    return FORMAT_MAGIC + bytes((FORMAT_VERSION, compression_id)) + payload
+
+
+def decode_session(blob: bytes) -> Dict[str, Any]:
+    """Inverse of `encode_session`, raise ValueError for an unknown header"""
+    blob = bytes(blob)
+    if blob[:2] != FORMAT_MAGIC or len(blob) < 4:
+        raise ValueError("Not a dysession binary session.")
+    if blob[2] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary session format version {blob[2]}.")
+
+    compression_id, payload = blob[3], blob[4:]
+    if compression_id:
+        if compression_id not in _DECOMPRESSORS:
+            raise ValueError(f"Unsupported binary session compression {compression_id}.")
+        payload = _DECOMPRESSORS[compression_id](payload)
+
+    return import_string(settings.SESSION_SERIALIZER)().loads(payload)
+
+
+def build_key(
+    session_key: str, config: Optional[DysessionSettings] = None
+) -> Dict[str, Dict[str, str]]:
+    return (config or get_settings()).key(session_key)
+
+
+def get_item_request(
+    session_key: str,
+    table_name: str,
+    key_only: bool = False,
+    config: Optional[DysessionSettings] = None,
+    return_consumed_capacity: str = "TOTAL",
+    attributes: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """Return a GetItem request of the whole item, of its key only, or of `attributes`
+
+    `attributes` are projected along with the partition key, the TTL attribute
+    and `SESSION_DATA_ATTRIBUTE`, so an item of the BINARY format is always
+    read whole.
+    """
+    config = config or get_settings()
+    request = {
+        "TableName": table_name,
+        "Key": config.key(session_key),
+        "ReturnConsumedCapacity": return_consumed_capacity,
+    }
+    if key_only:
+        request["ProjectionExpression"] = config.key_only_projection
+        request["ExpressionAttributeNames"] = config.pk_names()
+    elif attributes is not None:
+        names = config.pk_names(ttl=True)
+        names["#sd"] = SESSION_DATA_ATTRIBUTE
+        for i, name in enumerate(sorted(set(attributes) - set(names.values()))):
+            names[f"#a{i}"] = name
+        request["ProjectionExpression"] = ", ".join(names)
+        request["ExpressionAttributeNames"] = names
+    return request
+
+
+def put_item_request(
+    data: SessionDataModel,
+    table_name: str,
+    return_consumed_capacity: str = "TOTAL",
+    must_create: bool = False,
+    config: Optional[DysessionSettings] = None,
+) -> Dict[str, Any]:
+    config = config or get_settings()
+    pk = config.partition_key_name
+
+    item = {pk: {"S": data.session_key}}
+    if config.is_binary_format:
+        item[SESSION_DATA_ATTRIBUTE] = {"B": encode_session(data, config)}
+        ttl_attribute_name = config.ttl_attribute_name
+        if ttl_attribute_name in data:
+            item[ttl_attribute_name] = _serializer.serialize(data[ttl_attribute_name])
+    else:
+        for key, value in data.items():
+            if key == pk:
+                continue
+            item[key] = _serializer.serialize(value)
+
+    request = {
+        "TableName": table_name,
+        "Item": item,
+        "ReturnConsumedCapacity": return_consumed_capacity,
+    }
+    if must_create:
+        # DynamoDB rejects the put atomically if the key is already taken
+        request["ConditionExpression"] = config.must_create_condition
+        request["ExpressionAttributeNames"] = config.pk_names()
+    return request
+
+
+def update_item_request(
+    data: SessionDataModel,
+    table_name: str,
+    return_consumed_capacity: str = "TOTAL",
+    config: Optional[DysessionSettings] = None,
+    changes: Optional[Changes] = None,
+) -> Optional[Dict[str, Any]]:
+    """Return an UpdateItem request for the dirty keys, or None if nothing changed
+
+    The update is conditional on the item still existing. In the BINARY
+    format the whole session attribute is rewritten, plus the TTL attribute
+    if it changed. `changes` defaults to `data.changes()`.
+    """
+    config = config or get_settings()
+    pk = config.partition_key_name
+    if changes is None:
+        changes = data.changes()
+
+    dirty_keys = changes.dirty_keys - {pk}
+    removed_keys = changes.removed_keys - {pk}
+    set_values = {key: data[key] for key in dirty_keys}
+    if config.is_binary_format:
+        if not dirty_keys and not removed_keys:
+            return None
+        ttl_attribute_name = config.ttl_attribute_name
+        set_values = {
+            key: value for key, value in set_values.items() if key == ttl_attribute_name
+        }
+        set_values[SESSION_DATA_ATTRIBUTE] = encode_session(data, config)
+        removed_keys = removed_keys & {ttl_attribute_name}
+
+    names = config.pk_names()
+    values = {}
+    set_clauses = []
+    remove_clauses = []
+    for i, key in enumerate(sorted(set_values)):
+        names[f"#s{i}"] = key
+        values[f":s{i}"] = _serializer.serialize(set_values[key])
+        set_clauses.append(f"#s{i} = :s{i}")
+    for i, key in enumerate(sorted(removed_keys)):
+        names[f"#r{i}"] = key
+        remove_clauses.append(f"#r{i}")
+
+    if not set_clauses and not remove_clauses:
+        return None
+
+    expression = []
+    if set_clauses:
+        expression.append("SET " + ", ".join(set_clauses))
+    if remove_clauses:
+        expression.append("REMOVE " + ", ".join(remove_clauses))
+
+    request = {
+        "TableName": table_name,
+        "Key": config.key(data.session_key),
+        "UpdateExpression": " ".join(expression),
+        "ConditionExpression": config.must_exist_condition,
+        "ExpressionAttributeNames": names,
+        "ReturnConsumedCapacity": return_consumed_capacity,
+    }
+    if values:
+        request["ExpressionAttributeValues"] = values
+    return request
+
+
+def delete_item_request(
+    session_key: str,
+    table_name: str,
+    config: Optional[DysessionSettings] = None,
+    return_consumed_capacity: str = "TOTAL",
+) -> Dict[str, Any]:
+    return {
+        "TableName": table_name,
+        "Key": build_key(session_key, config),
+        "ReturnConsumedCapacity": return_consumed_capacity,
+    }
+
+
+def item_to_model(
+    session_key: str,
+    item: Mapping[str, Any],
+    config: Optional[DysessionSettings] = None,
+    loaded_keys: Optional[Iterable[str]] = None,
+    loader: Optional[Callable[[], Optional[SessionDataModel]]] = None,
+) -> SessionDataModel:
+    """Decode a low-level DynamoDB item of either format into a clean SessionDataModel
+
+    A model read from an item of the other format than the configured one is
+    not marked as persisted, so its next save rewrites the whole item.
+    If the item was read with a projection of `loaded_keys`, return a
+    `PartialSessionDataModel` which calls `loader` for the other keys.
+    """
+    config = config or get_settings()
+    stored_binary = SESSION_DATA_ATTRIBUTE in item
+    if loaded_keys is not None and not stored_binary:
+        model = PartialSessionDataModel(
+            session_key,
+            partition_key_name=config.partition_key_name,
+            loaded_keys=set(loaded_keys) | {config.ttl_attribute_name},
+            loader=loader,
+        )
+    else:
+        model = SessionDataModel(
+            session_key, partition_key_name=config.partition_key_name
+        )
+    if stored_binary:
+        for k in (config.partition_key_name, config.ttl_attribute_name):
+            if k in item:
+                model[k] = _deserializer.deserialize(item[k])
+        for k, v in decode_session(item[SESSION_DATA_ATTRIBUTE]["B"]).items():
+            model[k] = v
+    else:
+        for k, v in item.items():
+            model[k] = _deserializer.deserialize(v)
+    model.mark_clean(persisted=stored_binary == config.is_binary_format)
+    return model
+
+
+def is_session_expired(
+    model: SessionDataModel,
+    now: Optional[datetime] = None,
+    config: Optional[DysessionSettings] = None,
+) -> bool:
+    """Return True if the model's TTL attribute is already in the past"""
+    ttl_attribute_name = (config or get_settings()).ttl_attribute_name
+    if ttl_attribute_name not in model:
+        return False
+
+    if now is None:
+        now = datetime.now()
+    return model[ttl_attribute_name] < int(now.timestamp())
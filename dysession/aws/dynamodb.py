@@ -1,27 +1,80 @@
 import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Callable, Dict, Literal, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-import boto3
 from botocore import client as botoClitent
 from django.utils import timezone
 
-from dysession.aws.error import DynamodbItemNotFound, DynamodbTableNotFound
+from dysession.aws.capacity import record_consumed_capacity
+from dysession.aws.client import get_client, get_maintenance_client
+from dysession.aws.codec import (
+    delete_item_request,
+    get_item_request,
+    is_session_expired,
+    item_to_model,
+    put_item_request,
+    update_item_request,
+)
+from dysession.aws.error import (
+    DynamodbItemNotFound,
+    DynamodbTableNotFound,
+    DynamodbUnprocessedItems,
+)
 from dysession.backends.error import (
     SessionExpired,
     SessionKeyDoesNotExist,
     SessionKeyDuplicated,
+    SessionUnavailable,
 )
-from dysession.backends.model import SessionDataModel
+from dysession.backends.local_cache import LocalSessionCache, get_local_cache
+from dysession.backends.model import Changes, SessionDataModel
 from dysession.logger import get_logger
+from dysession.logger.sampling import get_miss_log
+from dysession.metrics import track
+
+from ..settings import DysessionSettings, get_settings
+
+if TYPE_CHECKING:
+    from dysession.aws.circuit import CircuitBreaker
+    from dysession.aws.write_behind import WriteBehindQueue
+
+_skipped_writes_lock = threading.Lock()
+_skipped_writes = 0
+
 
-from ..settings import get_config
+def get_skipped_writes() -> int:
+    """Return how many saves were elided because the session content was unchanged"""
+    return _skipped_writes
+
+
+def _count_skipped_write() -> None:
+    global _skipped_writes
+    with _skipped_writes_lock:
+        _skipped_writes += 1
 
 
 def create_dynamodb_table(options: Dict[str, Union[str, int]], client=None) -> Dict:
 
     if client is None:
-        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        client = get_maintenance_client(region_name=options.get("region"))
 
     response = client.create_table(
         AttributeDefinitions=[
@@ -40,22 +93,44 @@ def create_dynamodb_table(options: Dict[str, Union[str, int]], client=None) -> D
     return response
 
 
+def enable_time_to_live(options: Dict[str, Union[str, int]], client=None) -> Dict:
+    """Make DynamoDB delete the items of options["table"] once options["ttl"] is past
+
+    Wait for the table to be active first, as a table being created rejects it.
+    """
+
+    if client is None:
+        client = get_maintenance_client(region_name=options.get("region"))
+
+    client.get_waiter("table_exists").wait(TableName=options["table"])
+    response = client.update_time_to_live(
+        TableName=options["table"],
+        TimeToLiveSpecification={"Enabled": True, "AttributeName": options["ttl"]},
+    )
+    return response
+
+
 def destory_dynamodb_table(options: Dict[str, Union[str, int]], client=None) -> Dict:
 
     if client is None:
-        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        client = get_maintenance_client(region_name=options.get("region"))
 
     response = client.delete_table(TableName=options["table"])
     return response
 
 
-def check_dynamodb_table_exists(table_name: Optional[str] = None, client=None) -> Dict:
+def check_dynamodb_table_exists(
+    table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+) -> Dict:
 
     if client is None:
-        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        client = get_client()
 
+    config = config or get_settings()
     if table_name is None:
-        table_name = get_config()["DYNAMODB_TABLENAME"]
+        table_name = config.table_name
 
     response = client.list_tables()
     if table_name not in response["TableNames"]:
@@ -64,153 +139,433 @@ def check_dynamodb_table_exists(table_name: Optional[str] = None, client=None) -
     return response
 
 
-def key_exists(session_key: str, table_name: Optional[str] = None, client=None) -> bool:
+def key_exists(
+    session_key: str,
+    table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+) -> bool:
 
     if client is None:
-        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        client = get_client()
 
+    config = config or get_settings()
     if table_name is None:
-        table_name = get_config()["DYNAMODB_TABLENAME"]
+        table_name = config.table_name
 
     assert type(session_key) is str, "session_key should be string type"
 
-    pk = get_config()["PARTITION_KEY_NAME"]
-
-    response = client.get_item(
-        TableName=table_name,
-        Key={
-            pk: {"S": session_key},
-        },
-        ProjectionExpression=f"{pk}",
-    )
+    with track("GetItem", table_name) as timer:
+        response = client.get_item(
+            **get_item_request(session_key, table_name, key_only=True, config=config)
+        )
+        timer.outcome = "hit" if "Item" in response else "miss"
+    record_consumed_capacity("GetItem", response)
     return "Item" in response
 
 
-def get_item(session_key: str, table_name: Optional[str] = None) -> SessionDataModel:
+def get_item(
+    session_key: str,
+    table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
+    attributes: Optional[Iterable[str]] = None,
+    loader: Optional[Callable[[], Optional[SessionDataModel]]] = None,
+) -> SessionDataModel:
+    """Return the session of session_key, raise `DynamodbItemNotFound` if missing
+
+    With `attributes`, only those keys are read and a `PartialSessionDataModel`
+    is returned, which calls `loader` once another key is needed.
+    """
+
+    if client is None:
+        client = get_client()
 
+    config = config or get_settings()
     if table_name is None:
-        table_name = get_config()["DYNAMODB_TABLENAME"]
+        table_name = config.table_name
 
     assert type(session_key) is str, "session_key should be string type"
 
     logging.info("Get Item from DynamoDB")
 
-    pk = get_config()["PARTITION_KEY_NAME"]
-
-    resource = boto3.resource("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
-    table = resource.Table(table_name)
-
-    response = table.get_item(
-        Key={
-            pk: session_key,
-        },
+    with track("GetItem", table_name) as timer:
+        response = client.get_item(
+            **get_item_request(
+                session_key, table_name, config=config, attributes=attributes
+            )
+        )
+        record_consumed_capacity("GetItem", response)
+        if "Item" not in response:
+            raise DynamodbItemNotFound()
+        timer.outcome = "hit"
+
+    return item_to_model(
+        session_key,
+        response["Item"],
+        config,
+        loaded_keys=attributes,
+        loader=loader,
     )
 
-    if "Item" not in response:
-        raise DynamodbItemNotFound()
-
-    model = SessionDataModel(session_key=session_key)
-    for k, v in response["Item"].items():
-        model[k] = v
-    return model
-
 
 def insert_session_item(
     data: SessionDataModel,
     table_name: Optional[str] = None,
     return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"] = "TOTAL",
     ignore_duplicated: bool = True,
+    client=None,
+    config: Optional[DysessionSettings] = None,
 ) -> bool:
     """Insert a session key"""
 
     assert type(data.session_key) is str, "session_key should be string type"
 
-    if table_name is None:
-        table_name = get_config()["DYNAMODB_TABLENAME"]
+    if client is None:
+        client = get_client()
 
-    if not ignore_duplicated and key_exists(data.session_key):
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    try:
+        with track("PutItem", table_name):
+            response = client.put_item(
+                **put_item_request(
+                    data,
+                    table_name,
+                    return_consumed_capacity,
+                    # Create in a single round trip instead of checking the key first
+                    must_create=not ignore_duplicated,
+                    config=config,
+                )
+            )
+    except client.exceptions.ConditionalCheckFailedException:
         logger = get_logger()
         logger.error(f"'{data.session_key}' is already an item of table '{table_name}'.")
         raise SessionKeyDuplicated
 
-    resource = boto3.resource("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
-    table = resource.Table(table_name)
-    pk = get_config()["PARTITION_KEY_NAME"]
+    record_consumed_capacity("PutItem", response)
+    return response
 
-    insert_item = {pk: data.session_key}
-    for key in data:
-        insert_item[key] = data[key]
 
-    response = table.put_item(
-        TableName=table_name,
-        Item=insert_item,
-        ReturnConsumedCapacity=return_consumed_capacity,
+def update_session_item(
+    data: SessionDataModel,
+    table_name: Optional[str] = None,
+    return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"] = "TOTAL",
+    client=None,
+    config: Optional[DysessionSettings] = None,
+    changes: Optional[Changes] = None,
+) -> Optional[Dict]:
+    """Write only the keys which were set or deleted since the item was loaded
+
+    Emit a single `UpdateItem` with SET/REMOVE clauses for the dirty keys.
+    The update is conditional on the item still existing, so a session deleted
+    meanwhile raises `DynamodbItemNotFound` instead of being resurrected
+    with a partial set of attributes.
+    Return None without calling DynamoDB if nothing changed.
+    """
+
+    assert type(data.session_key) is str, "session_key should be string type"
+
+    if client is None:
+        client = get_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    request = update_item_request(
+        data, table_name, return_consumed_capacity, config=config, changes=changes
     )
+    if request is None:
+        return None
 
+    try:
+        with track("UpdateItem", table_name):
+            response = client.update_item(**request)
+    except client.exceptions.ConditionalCheckFailedException:
+        raise DynamodbItemNotFound()
+
+    record_consumed_capacity("UpdateItem", response)
     return response
 
 
 def delete_session_item(
     data: SessionDataModel,
     table_name: Optional[str] = None,
+    client=None,
+    config: Optional[DysessionSettings] = None,
 ) -> bool:
     """Delete a session key"""
 
     assert type(data.session_key) is str, "session_key should be string type"
 
+    if client is None:
+        client = get_client()
+
+    config = config or get_settings()
     if table_name is None:
-        table_name = get_config()["DYNAMODB_TABLENAME"]
+        table_name = config.table_name
 
-    resource = boto3.resource("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
-    table = resource.Table(table_name)
-    pk = get_config()["PARTITION_KEY_NAME"]
+    with track("DeleteItem", table_name):
+        response = client.delete_item(
+            **delete_item_request(data.session_key, table_name, config)
+        )
 
-    insert_item = {pk: data.session_key}
-    for key in data:
-        insert_item[key] = data[key]
+    record_consumed_capacity("DeleteItem", response)
+    return response
 
-    response = table.delete_item(
-        Key={pk: data.session_key},
-    )
 
-    return response
+# Hard limits of a single BatchGetItem / BatchWriteItem request
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _backoff(attempt: int, base: float = 0.05, cap: float = 5.0) -> None:
+    """Sleep before retrying unprocessed items, exponential with full jitter"""
+    time.sleep(random.uniform(0, min(cap, base * 2**attempt)))
+
+
+def _run_chunks(
+    fn: Callable[[List[T]], R], chunks: Iterator[List[T]], max_workers: int
+) -> Iterator[R]:
+    """Run fn over chunks on a bounded thread pool and yield results as they complete
+
+    At most 2 * max_workers chunks are in flight, so a huge input is streamed
+    instead of being materialized at once.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(fn, chunk))
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def batch_get_sessions(
+    session_keys: Iterable[str],
+    table_name: Optional[str] = None,
+    client=None,
+    max_workers: int = 4,
+    max_retries: int = 8,
+    config: Optional[DysessionSettings] = None,
+) -> Iterator[SessionDataModel]:
+    """Yield the sessions of session_keys which exist, read through BatchGetItem
+
+    Keys are sent in chunks of 100 on up to `max_workers` threads and
+    `UnprocessedKeys` are retried with jittered exponential backoff.
+    Sessions are yielded in completion order, missing keys are skipped and
+    expired sessions are returned as they are.
+    Raise `DynamodbUnprocessedItems` if keys are still unprocessed after
+    `max_retries` retries.
+    """
+
+    if client is None:
+        client = get_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    pk = config.partition_key_name
+
+    def get_chunk(keys: List[str]) -> List[SessionDataModel]:
+        # BatchGetItem rejects duplicated keys within one request
+        request_items = {
+            table_name: {"Keys": [config.key(key) for key in dict.fromkeys(keys)]}
+        }
+        models = []
+        for attempt in range(max_retries + 1):
+            with track("BatchGetItem", table_name):
+                response = client.batch_get_item(
+                    RequestItems=request_items, ReturnConsumedCapacity="TOTAL"
+                )
+            record_consumed_capacity("BatchGetItem", response)
+            for item in response["Responses"].get(table_name, []):
+                models.append(item_to_model(item[pk]["S"], item, config))
+
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                return models
+            if attempt < max_retries:
+                _backoff(attempt)
+
+        raise DynamodbUnprocessedItems(request_items)
+
+    for models in _run_chunks(
+        get_chunk, _chunked(session_keys, BATCH_GET_LIMIT), max_workers
+    ):
+        yield from models
+
+
+def batch_write_sessions(
+    puts: Iterable[SessionDataModel] = (),
+    deletes: Iterable[str] = (),
+    table_name: Optional[str] = None,
+    client=None,
+    max_workers: int = 4,
+    max_retries: int = 8,
+    config: Optional[DysessionSettings] = None,
+) -> Iterator[str]:
+    """Put the `puts` sessions and delete the `deletes` keys through BatchWriteItem
+
+    Requests are sent in chunks of 25 on up to `max_workers` threads and
+    `UnprocessedItems` are retried with jittered exponential backoff.
+    Yield every session key once its write is acknowledged.
+    Raise `DynamodbUnprocessedItems` if items are still unprocessed after
+    `max_retries` retries.
+    """
+
+    if client is None:
+        client = get_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    def requests() -> Iterator[Tuple[str, Dict]]:
+        for data in puts:
+            assert type(data.session_key) is str, "session_key should be string type"
+            item = put_item_request(data, table_name, config=config)["Item"]
+            yield data.session_key, {"PutRequest": {"Item": item}}
+        for session_key in deletes:
+            yield session_key, {"DeleteRequest": {"Key": config.key(session_key)}}
+
+    def write_chunk(chunk: List[Tuple[str, Dict]]) -> List[str]:
+        # BatchWriteItem rejects two requests on the same key, the last one wins
+        unique = dict(chunk)
+        request_items = {table_name: list(unique.values())}
+        for attempt in range(max_retries + 1):
+            with track("BatchWriteItem", table_name):
+                response = client.batch_write_item(
+                    RequestItems=request_items, ReturnConsumedCapacity="TOTAL"
+                )
+            record_consumed_capacity("BatchWriteItem", response)
+
+            request_items = response.get("UnprocessedItems")
+            if not request_items:
+                return list(unique)
+            if attempt < max_retries:
+                _backoff(attempt)
+
+        raise DynamodbUnprocessedItems(request_items)
+
+    for session_keys in _run_chunks(
+        write_chunk, _chunked(requests(), BATCH_WRITE_LIMIT), max_workers
+    ):
+        yield from session_keys
 
 
 class DynamoDB:
-    def __init__(self, client=None) -> None:
+    def __init__(
+        self,
+        client=None,
+        cache: Optional[LocalSessionCache] = None,
+        config: Optional[DysessionSettings] = None,
+        write_behind: Optional["WriteBehindQueue"] = None,
+        breaker: Optional["CircuitBreaker"] = None,
+        fallback_queue: Optional["WriteBehindQueue"] = None,
+    ) -> None:
         self.client = client
+        self.config = config or get_settings()
+        # Read-through cache of decoded sessions, see `DYSESSION["LOCAL_CACHE"]`
+        self.cache = cache if cache is not None else get_local_cache()
+        # Queue of writes flushed in the background, see `DYSESSION["WRITE_BEHIND"]`
+        self.write_behind = write_behind
+        # See `DYSESSION["CIRCUIT_BREAKER"]`, writes it refuses go to fallback_queue
+        self.breaker = breaker
+        self.fallback_queue = fallback_queue
+        self._queues = tuple(
+            {id(q): q for q in (write_behind, fallback_queue) if q is not None}.values()
+        )
 
     def get(
         self,
         session_key: Optional[str] = None,
         table_name: Optional[str] = None,
         expired_time_fn: Callable[[], datetime] = datetime.now,
+        attributes: Optional[Iterable[str]] = None,
     ) -> Dict[str, Any]:
-        """Return session data if dynamodb partision key is matched with inputed session_key"""
+        """Return session data if dynamodb partision key is matched with inputed session_key
+
+        With `attributes`, only those keys are read unless the session is in
+        the local cache, the others are read on first use.
+        """
         if session_key is None:
             raise ValueError("session_key should be str type")
 
         if table_name is None:
-            table_name = get_config()["DYNAMODB_TABLENAME"]
+            table_name = self.config.table_name
 
         now = expired_time_fn()
 
-        try:
-            model = get_item(session_key=session_key, table_name=table_name)
-            if get_config()["TTL_ATTRIBUTE_NAME"] in model:
-                time = model[get_config()["TTL_ATTRIBUTE_NAME"]]
-                if time < int(now.timestamp()):
+        with track("load", table_name) as timer:
+            try:
+                # a write not flushed yet is newer than the stored item
+                queued, model = self._queued(session_key, table_name)
+                if queued and model is None:
+                    raise DynamodbItemNotFound
+                if model is None and self.cache is not None:
+                    # taken before the fetch, which is not cached if it races
+                    # an invalidation
+                    generation = self.cache.generation(session_key, table_name)
+                    model = self.cache.get(session_key, table_name)
+                if model is None:
+                    with self._guarded("READ_DEADLINE"):
+                        model = get_item(
+                            session_key=session_key,
+                            table_name=table_name,
+                            client=self.client,
+                            config=self.config,
+                            attributes=attributes,
+                            loader=(
+                                self._loader(session_key, table_name, expired_time_fn)
+                                if attributes is not None
+                                else None
+                            ),
+                        )
+                    timer.outcome = "hit"
+                    # an item of the other encoding format is not cached until
+                    # its next save rewrites it, nor is a partial one
+                    if (
+                        self.cache is not None
+                        and model.is_persisted
+                        and not model.is_partial
+                    ):
+                        self.cache.set(model, table_name, generation)
+                else:
+                    timer.outcome = "cache_hit"
+                if is_session_expired(model, now, self.config):
                     raise SessionExpired
-        # if not found then raise
-        except DynamodbItemNotFound:
-            logger = get_logger()
-            logger.error(f"'{session_key}' cannot be found on table '{table_name}'.")
-            raise SessionKeyDoesNotExist
-        # if key is expired
-        except SessionExpired:
-            logger = get_logger()
-            logger.error(f"'{session_key}' is expired .")
-            raise SessionExpired
+            # if not found then raise
+            except DynamodbItemNotFound:
+                get_miss_log().missing(session_key, table_name)
+                raise SessionKeyDoesNotExist
+            # if key is expired
+            except SessionExpired:
+                get_miss_log().expired(session_key)
+                raise SessionExpired
 
         return model
 
@@ -220,17 +575,65 @@ class DynamoDB:
         table_name: Optional[str] = None,
         return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"] = "TOTAL",
         ignore_duplicated: bool = True,
+        changes: Optional[Changes] = None,
     ) -> None:
-        try:
-            insert_session_item(
-                data,
-                table_name,
-                return_consumed_capacity,
-                ignore_duplicated=ignore_duplicated,
-            )
-        except SessionKeyDuplicated:
-            if not ignore_duplicated:
-                raise SessionKeyDuplicated
+        """Write data, `changes` defaults to `data.changes()`"""
+        if table_name is None:
+            table_name = self.config.table_name
+        if changes is None:
+            changes = data.changes()
+
+        with track("save", table_name) as timer:
+            if ignore_duplicated and data.is_persisted and not changes.is_dirty:
+                # content is exactly what was loaded, skip the network write
+                _count_skipped_write()
+                timer.outcome = "skipped"
+                return
+
+            # queued writes are whole puts, a new session is still created
+            # synchronously since BatchWriteItem takes no condition
+            queue_write = ignore_duplicated and self.write_behind is not None
+            if queue_write or not (ignore_duplicated and data.is_persisted):
+                # the item is written whole, read the keys a partial load skipped
+                partial = data.is_partial
+                try:
+                    data.complete()
+                except SessionUnavailable:
+                    self._degrade_write(data, table_name, ignore_duplicated, timer)
+                    return
+                if partial:
+                    changes = data.changes()
+
+            if queue_write:
+                if self.write_behind.put(data, table_name):
+                    data.mark_clean(changes=changes)
+                    if self.cache is not None:
+                        self.cache.set(data, table_name)
+                    timer.outcome = "queued"
+                    return
+                # the queue stayed full, write through. No older write of the
+                # session is queued, the queue never refuses those.
+                timer.outcome = "backpressure"
+                data.mark_clean(persisted=False, changes=changes)
+
+            try:
+                with self._guarded("WRITE_DEADLINE"):
+                    self._write(
+                        data,
+                        table_name,
+                        return_consumed_capacity,
+                        ignore_duplicated,
+                        changes,
+                    )
+                data.mark_clean(changes=changes)
+            except SessionKeyDuplicated:
+                timer.outcome = "conflict"
+                if not ignore_duplicated:
+                    raise SessionKeyDuplicated
+            except SessionUnavailable:
+                self._degrade_write(data, table_name, ignore_duplicated, timer)
+            finally:
+                self._invalidate(data.session_key, table_name)
 
     def exists(self, session_key: str) -> bool:
         if type(session_key) is not str:
@@ -238,13 +641,165 @@ class DynamoDB:
                 f"session_key should be type of str instead of {type(session_key)}."
             )
 
-        return key_exists(session_key=session_key)
+        with track("exists", self.config.table_name) as timer:
+            queued, model = self._queued(session_key, self.config.table_name)
+            if queued:
+                exists = model is not None
+            else:
+                exists = key_exists(
+                    session_key=session_key, client=self.client, config=self.config
+                )
+            timer.outcome = "hit" if exists else "miss"
+        return exists
 
     def delete(self, data: SessionDataModel, table_name: Optional[str] = None) -> bool:
         if data.session_key is None:
             return
 
+        if table_name is None:
+            table_name = self.config.table_name
+
+        if self.write_behind is not None:
+            with track("delete", table_name) as timer:
+                queued = self.write_behind.delete(data.session_key, table_name)
+                if queued:
+                    timer.outcome = "queued"
+            if queued:
+                self._invalidate(data.session_key, table_name)
+                return
+
         try:
-            delete_session_item(data=data, table_name=table_name)
+            with track("delete", table_name) as timer:
+                try:
+                    with self._guarded("WRITE_DEADLINE"):
+                        delete_session_item(
+                            data=data,
+                            table_name=table_name,
+                            client=self.client,
+                            config=self.config,
+                        )
+                except SessionUnavailable:
+                    timer.outcome = "degraded"
+                    if self.fallback_queue is None or not self.fallback_queue.delete(
+                        data.session_key, table_name
+                    ):
+                        get_logger().warning(
+                            f"Dropped the deletion of '{data.session_key}', "
+                            "DynamoDB is unavailable."
+                        )
         except AssertionError:
             raise
+        finally:
+            self._invalidate(data.session_key, table_name)
+
+    def _write(
+        self,
+        data: SessionDataModel,
+        table_name: str,
+        return_consumed_capacity: Literal["INDEXES", "TOTAL", "NONE"],
+        ignore_duplicated: bool,
+        changes: Optional[Changes] = None,
+    ) -> None:
+        if ignore_duplicated and data.is_persisted:
+            try:
+                update_session_item(
+                    data,
+                    table_name,
+                    return_consumed_capacity,
+                    client=self.client,
+                    config=self.config,
+                    changes=changes,
+                )
+            except DynamodbItemNotFound:
+                # the item vanished since it was loaded, write it back whole
+                insert_session_item(
+                    data,
+                    table_name,
+                    return_consumed_capacity,
+                    client=self.client,
+                    config=self.config,
+                )
+        else:
+            insert_session_item(
+                data,
+                table_name,
+                return_consumed_capacity,
+                ignore_duplicated=ignore_duplicated,
+                client=self.client,
+                config=self.config,
+            )
+
+    def _degrade_write(
+        self,
+        data: SessionDataModel,
+        table_name: str,
+        ignore_duplicated: bool,
+        timer,
+    ) -> None:
+        """Queue or drop a save refused by the open circuit breaker
+
+        A partial session cannot be queued, its other keys are out of reach.
+        Neither can a new session, BatchWriteItem takes no condition: it
+        raises SessionUnavailable rather than hand out the key of a session
+        which was never stored.
+        """
+        timer.outcome = "degraded"
+        if not ignore_duplicated:
+            raise SessionUnavailable
+        if (
+            self.fallback_queue is not None
+            and not data.is_partial
+            and self.fallback_queue.put(data, table_name)
+        ):
+            data.mark_clean()
+            return
+        get_logger().warning(
+            f"Dropped the save of '{data.session_key}', DynamoDB is unavailable."
+        )
+
+    @contextmanager
+    def _guarded(self, deadline: str) -> Iterator[None]:
+        """Send the calls of the block through the circuit breaker, if any
+
+        Raise SessionUnavailable if the breaker refuses them.
+        """
+        if self.breaker is None:
+            yield
+            return
+        if not self.breaker.allow():
+            raise SessionUnavailable
+        with self.breaker.guard(self.config.circuit_breaker[deadline]):
+            yield
+
+    def _queued(
+        self, session_key: str, table_name: str
+    ) -> Tuple[bool, Optional[SessionDataModel]]:
+        """Look session_key up in the queues of writes not flushed yet"""
+        for queue in self._queues:
+            queued, model = queue.get(session_key, table_name)
+            if queued:
+                return queued, model
+        return False, None
+
+    def _loader(
+        self,
+        session_key: str,
+        table_name: str,
+        expired_time_fn: Callable[[], datetime],
+    ) -> Callable[[], Optional[SessionDataModel]]:
+        """Return a function reading the whole session, for partial loads"""
+
+        def load() -> Optional[SessionDataModel]:
+            try:
+                return self.get(session_key, table_name, expired_time_fn)
+            except SessionUnavailable:
+                # not gone, only out of reach for now
+                raise
+            except (SessionKeyDoesNotExist, SessionExpired):
+                return None
+
+        return load
+
+    def _invalidate(self, session_key: Optional[str], table_name: str) -> None:
+        if self.cache is not None and isinstance(session_key, str):
+            self.cache.invalidate(session_key, table_name)
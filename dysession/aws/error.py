@@ -14,3 +14,11 @@ class DynamodbTableNotFound(Exception):
 
 class DynamodbItemNotFound(Exception):
     pass
+
+
+class DynamodbUnprocessedItems(Exception):
+    """Raised when a batch request still has unprocessed items after every retry"""
+
+    def __init__(self, unprocessed: Optional[dict] = None, *args: object) -> None:
+        super().__init__(*args)
+        self.unprocessed = unprocessed or {}
@@ -0,0 +1,286 @@
+"""
+Table wide maintenance jobs: parallel segmented Scan and expired sessions cleanup.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from dysession.aws.capacity import record_consumed_capacity
+from dysession.aws.client import get_maintenance_client
+from dysession.aws.dynamodb import batch_write_sessions
+
+from ..settings import DysessionSettings, get_settings
+
+
+class TokenBucket:
+    """Thread safe token bucket refilled with `rate` tokens per second
+
+    `acquire` lets the balance go negative so a request larger than the bucket
+    still passes, the debt is paid back by the following callers.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate should be a positive number")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= min(tokens, self.capacity):
+                    self._tokens -= tokens
+                    return
+                wait = (min(tokens, self.capacity) - self._tokens) / self.rate
+            # sleep without the lock, the other callers keep checking the balance
+            time.sleep(wait)
+
+
+class ScanCheckpoint:
+    """`LastEvaluatedKey` of every scan segment, persisted as JSON
+
+    A segment whose key is None has been scanned completely. Without a path
+    the checkpoint only lives in memory.
+    """
+
+    def __init__(self, total_segments: int, path: Optional[str] = None) -> None:
+        self.path = path
+        self.total_segments = total_segments
+        self._lock = threading.Lock()
+        self._segments: Dict[str, Dict[str, Any]] = {}
+
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state["total_segments"] != total_segments:
+                raise ValueError(
+                    f"checkpoint '{path}' was written with {state['total_segments']} "
+                    f"segments instead of {total_segments}."
+                )
+            self._segments = state["segments"]
+
+    def start_key(self, segment: int) -> Optional[Dict]:
+        return self._segments.get(str(segment), {}).get("LastEvaluatedKey")
+
+    def is_done(self, segment: int) -> bool:
+        return self._segments.get(str(segment), {}).get("done", False)
+
+    def update(self, segment: int, last_evaluated_key: Optional[Dict]) -> None:
+        with self._lock:
+            self._segments[str(segment)] = {
+                "LastEvaluatedKey": last_evaluated_key,
+                "done": last_evaluated_key is None,
+            }
+            if self.path is None:
+                return
+
+            # Write then rename, a crash never leaves a truncated checkpoint behind
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"total_segments": self.total_segments, "segments": self._segments},
+                    f,
+                )
+            os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def scan_segment(
+    segment: int,
+    total_segments: int,
+    table_name: Optional[str] = None,
+    client=None,
+    checkpoint: Optional[ScanCheckpoint] = None,
+    read_limiter: Optional[TokenBucket] = None,
+    page_size: Optional[int] = None,
+    config: Optional[DysessionSettings] = None,
+    **scan_kwargs: Any,
+) -> Iterator[List[Dict]]:
+    """Yield the pages of items of one Scan segment
+
+    The segment resumes from, and records its progress to `checkpoint` once the
+    caller has handled a page. `read_limiter` is charged the consumed RCU.
+    """
+
+    if client is None:
+        client = get_maintenance_client()
+
+    if table_name is None:
+        table_name = (config or get_settings()).table_name
+
+    if checkpoint is not None and checkpoint.is_done(segment):
+        return
+
+    request = {
+        "TableName": table_name,
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "ReturnConsumedCapacity": "TOTAL",
+        **scan_kwargs,
+    }
+    if page_size is not None:
+        request["Limit"] = page_size
+
+    start_key = checkpoint.start_key(segment) if checkpoint is not None else None
+    while True:
+        if start_key is not None:
+            request["ExclusiveStartKey"] = start_key
+
+        response = client.scan(**request)
+        record_consumed_capacity("Scan", response)
+        if read_limiter is not None:
+            read_limiter.acquire(
+                response.get("ConsumedCapacity", {}).get("CapacityUnits", 1)
+            )
+
+        yield response.get("Items", [])
+
+        start_key = response.get("LastEvaluatedKey")
+        if checkpoint is not None:
+            checkpoint.update(segment, start_key)
+        if start_key is None:
+            return
+
+
+def parallel_scan(
+    page_fn: Callable[[int, List[Dict]], None],
+    total_segments: int = 4,
+    **kwargs: Any,
+) -> None:
+    """Scan every segment on its own thread and call page_fn(segment, items) per page
+
+    `kwargs` are passed to `scan_segment`.
+    """
+
+    def run(segment: int) -> None:
+        for items in scan_segment(segment, total_segments, **kwargs):
+            page_fn(segment, items)
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        # list() re-raises the first exception of a segment
+        list(executor.map(run, range(total_segments)))
+
+
+def clear_expired_sessions(
+    table_name: Optional[str] = None,
+    client=None,
+    total_segments: Optional[int] = None,
+    read_capacity: Optional[float] = None,
+    write_capacity: Optional[float] = None,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    page_size: Optional[int] = None,
+    now: Optional[datetime] = None,
+    config: Optional[DysessionSettings] = None,
+) -> int:
+    """Delete the sessions whose TTL attribute is in the past and return how many
+
+    DynamoDB's own TTL deletion lags up to 48 hours, meanwhile expired items
+    are still billed and scanned. Segments are scanned in parallel with a
+    key-only projection and matches are deleted with BatchWriteItem.
+
+    `read_capacity` / `write_capacity` cap the consumed RCU / WCU per second.
+    `progress(expired, deleted)` is called with running totals after every page.
+    An interrupted run resumes from `checkpoint_path`, which is removed once
+    the run completes.
+    """
+
+    config = config or get_settings()
+    options = config.clear_expired
+
+    if client is None:
+        client = get_maintenance_client()
+
+    if table_name is None:
+        table_name = config.table_name
+
+    if total_segments is None:
+        total_segments = options["SEGMENTS"]
+    if read_capacity is None:
+        read_capacity = options["READ_CAPACITY"]
+    if write_capacity is None:
+        write_capacity = options["WRITE_CAPACITY"]
+
+    if now is None:
+        now = datetime.now()
+
+    pk = config.partition_key_name
+    read_limiter = TokenBucket(read_capacity) if read_capacity else None
+    write_limiter = TokenBucket(write_capacity) if write_capacity else None
+    checkpoint = ScanCheckpoint(total_segments, checkpoint_path)
+
+    lock = threading.Lock()
+    counts = {"expired": 0, "deleted": 0}
+
+    def delete_page(segment: int, items: List[Dict]) -> None:
+        session_keys = [item[pk]["S"] for item in items]
+        if session_keys:
+            # A delete costs at least one WCU
+            if write_limiter is not None:
+                write_limiter.acquire(len(session_keys))
+            deleted = sum(
+                1
+                for _ in batch_write_sessions(
+                    deletes=session_keys,
+                    table_name=table_name,
+                    client=client,
+                    max_workers=1,
+                    config=config,
+                )
+            )
+        else:
+            deleted = 0
+
+        with lock:
+            counts["expired"] += len(items)
+            counts["deleted"] += deleted
+            if progress is not None:
+                progress(counts["expired"], counts["deleted"])
+
+    parallel_scan(
+        delete_page,
+        total_segments=total_segments,
+        table_name=table_name,
+        client=client,
+        checkpoint=checkpoint,
+        read_limiter=read_limiter,
+        page_size=page_size,
+        ProjectionExpression=config.key_only_projection,
+        FilterExpression=config.expired_filter,
+        ExpressionAttributeNames=config.pk_names(ttl=True),
+        ExpressionAttributeValues={":now": {"N": str(int(now.timestamp()))}},
+    )
+
+    checkpoint.clear()
+    return counts["deleted"]
+
+
+__all__ = [
+    "TokenBucket",
+    "ScanCheckpoint",
+    "scan_segment",
+    "parallel_scan",
+    "clear_expired_sessions",
+]
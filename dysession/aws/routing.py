@@ -0,0 +1,221 @@
+"""
+Routing of DynamoDB calls across the replica regions of a global table.
+
+With `ROUTING["REGIONS"]`, sessions are read from and written to the nearest
+replica: `ROUTING["PREFERRED_REGION"]`, else the region the instance runs in
+(`AWS_REGION` / `AWS_DEFAULT_REGION`) if it is a replica, else
+`DYNAMODB_REGION`. A call which is throttled, times out or cannot connect is
+retried on the next replica.
+
+Every region has a health score, a moving average of its call outcomes. A
+region whose score drops under `ROUTING["UNHEALTHY_SCORE"]` is tried last for
+`ROUTING["COOLDOWN"]` seconds, after which it gets its share of calls again.
+"""
+
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from dysession.aws.client import get_client
+from dysession.logger import get_logger
+from dysession.metrics import THROTTLING_ERROR_CODES
+
+from ..settings import DysessionSettings, get_settings
+
+# Transient server side errors, worth a call to another replica
+FAILOVER_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+FAILOVER_EXCEPTIONS = (
+    ConnectTimeoutError,
+    ReadTimeoutError,
+    EndpointConnectionError,
+    ConnectionClosedError,
+)
+
+
+def is_failover_error(exc: BaseException) -> bool:
+    """Return True if exc tells the region is unavailable rather than the request wrong"""
+    if isinstance(exc, FAILOVER_EXCEPTIONS):
+        return True
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in FAILOVER_ERROR_CODES
+    return False
+
+
+class RegionHealth:
+    """Health score of one region, 1.0 when every recent call succeeded"""
+
+    __slots__ = ("score", "calls", "failures", "unhealthy_until")
+
+    def __init__(self) -> None:
+        self.score = 1.0
+        self.calls = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+
+
+class RegionRouter:
+    """Client-like object sending each DynamoDB call to the best replica region
+
+    Operations are looked up as attributes, like on a boto3 client, so the
+    router can be passed wherever dysession takes a `client`. The regional
+    clients come from the process-wide registry of `get_client`.
+    """
+
+    def __init__(
+        self,
+        regions: Sequence[str],
+        profile_name: Optional[str] = None,
+        cooldown: float = 30.0,
+        unhealthy_score: float = 0.5,
+        smoothing: float = 0.2,
+        client_factory: Callable[..., Any] = get_client,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not regions:
+            raise ValueError("regions should not be empty")
+        self.regions = list(dict.fromkeys(regions))
+        self.profile_name = profile_name
+        self.cooldown = cooldown
+        self.unhealthy_score = unhealthy_score
+        self.smoothing = smoothing
+        self.client_factory = client_factory
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._health: Dict[str, RegionHealth] = {
+            region: RegionHealth() for region in self.regions
+        }
+
+    @property
+    def exceptions(self):
+        # Regional clients share a boto3 session, hence their exception classes
+        return self.client(self.regions[0]).exceptions
+
+    def client(self, region_name: str):
+        return self.client_factory(region_name, self.profile_name)
+
+    def order(self) -> List[str]:
+        """Regions in the order they are tried: available ones by preference first"""
+        now = self.clock()
+        with self._lock:
+            cooling = {
+                region
+                for region, health in self._health.items()
+                if health.unhealthy_until > now
+            }
+            scores = {region: health.score for region, health in self._health.items()}
+        available = [region for region in self.regions if region not in cooling]
+        return available + sorted(cooling, key=lambda region: -scores[region])
+
+    def call(self, operation: str, **kwargs: Any) -> Dict[str, Any]:
+        """Call operation on the first region which answers, raise the last error"""
+        error: Optional[BaseException] = None
+        for region in self.order():
+            try:
+                response = getattr(self.client(region), operation)(**kwargs)
+            except Exception as e:
+                if not is_failover_error(e):
+                    # the region answered, the request itself failed
+                    self._observe(region, True)
+                    raise
+                self._observe(region, False)
+                get_logger().warning(
+                    f"{operation} failed on region '{region}', failing over: {e!r}"
+                )
+                error = e
+                continue
+            self._observe(region, True)
+            return response
+        raise error
+
+    def _observe(self, region: str, success: bool) -> None:
+        with self._lock:
+            health = self._health[region]
+            health.calls += 1
+            if not success:
+                health.failures += 1
+            health.score += self.smoothing * (float(success) - health.score)
+            if not success and health.score < self.unhealthy_score:
+                health.unhealthy_until = self.clock() + self.cooldown
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of every region's score and call counts"""
+        now = self.clock()
+        with self._lock:
+            return {
+                region: {
+                    "score": health.score,
+                    "healthy": health.unhealthy_until <= now,
+                    "calls": health.calls,
+                    "failures": health.failures,
+                }
+                for region, health in self._health.items()
+            }
+
+    def __getattr__(self, name: str) -> Callable[..., Dict[str, Any]]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def operation(**kwargs: Any) -> Dict[str, Any]:
+            return self.call(name, **kwargs)
+
+        operation.__name__ = name
+        return operation
+
+
+def preferred_region(config: DysessionSettings) -> str:
+    """Return the region sessions should be routed to first"""
+    regions = config.routing["REGIONS"]
+    if config.routing["PREFERRED_REGION"]:
+        return config.routing["PREFERRED_REGION"]
+    for variable in ("AWS_REGION", "AWS_DEFAULT_REGION"):
+        region = os.environ.get(variable)
+        if region in regions:
+            return region
+    return config.region
+
+
+@lru_cache
+def get_router() -> Optional[RegionRouter]:
+    """Return the process-wide router, or None if `ROUTING["REGIONS"]` is empty"""
+    config = get_settings()
+    regions = config.routing["REGIONS"]
+    if not regions:
+        return None
+
+    preferred = preferred_region(config)
+    return RegionRouter(
+        [preferred, *(region for region in regions if region != preferred)],
+        profile_name=config.profile,
+        cooldown=config.routing["COOLDOWN"],
+        unhealthy_score=config.routing["UNHEALTHY_SCORE"],
+    )
+
+
+@receiver(setting_changed)
+def update_router(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        get_router.cache_clear()  # pragma: no cover
+
+
+__all__ = [
+    "RegionRouter",
+    "get_router",
+    "is_failover_error",
+    "preferred_region",
+]
@@ -0,0 +1,214 @@
+"""
+Table analytics for capacity planning, aggregated over a parallel segmented Scan.
+
+Memory is bounded: every page is folded into fixed size histograms and counters
+by the segment thread which read it, items are never kept around.
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+from dysession.aws.client import get_maintenance_client
+from dysession.aws.dynamodb import check_dynamodb_table_exists
+from dysession.aws.maintenance import TokenBucket, parallel_scan
+
+from ..settings import DysessionSettings, get_settings
+
+# Upper bounds (inclusive) of the histogram buckets, the last bucket is unbounded
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 400 * 1024)
+TTL_BUCKETS = (0, 3600, 6 * 3600, 86400, 7 * 86400, 30 * 86400)
+AGE_BUCKETS = (60, 600, 3600, 6 * 3600, 86400, 7 * 86400, 30 * 86400)
+
+# DynamoDB bills reads per 4KB (eventually consistent reads at half price)
+# and writes per 1KB
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+
+# Scan segments read in parallel unless told otherwise
+DEFAULT_SEGMENTS = 4
+
+
+def attribute_value_size(value: Dict[str, Any]) -> int:
+    """Approximate billed size of a low-level attribute value, in bytes"""
+    (kind, inner), = value.items()
+    if kind == "S":
+        return len(inner.encode())
+    if kind == "N":
+        # Up to 38 significant digits stored 2 per byte, plus 1 byte
+        digits = len(inner.lstrip("-").replace(".", "").strip("0")) or 1
+        return math.ceil(digits / 2) + 1
+    if kind == "B":
+        return len(inner)
+    if kind in ("BOOL", "NULL"):
+        return 1
+    if kind == "SS":
+        return sum(len(s.encode()) for s in inner)
+    if kind == "NS":
+        return sum(attribute_value_size({"N": n}) for n in inner)
+    if kind == "BS":
+        return sum(len(b) for b in inner)
+    if kind == "L":
+        return 3 + sum(1 + attribute_value_size(v) for v in inner)
+    if kind == "M":
+        return 3 + sum(
+            1 + len(k.encode()) + attribute_value_size(v) for k, v in inner.items()
+        )
+    return 0
+
+
+def item_size(item: Dict[str, Dict[str, Any]]) -> int:
+    """Approximate billed size of a low-level item: attribute names plus values"""
+    return sum(len(name.encode()) + attribute_value_size(v) for name, v in item.items())
+
+
+def _bucket_labels(bounds: Sequence[int]) -> List[str]:
+    return [f"<={bound}" for bound in bounds] + [f">{bounds[-1]}"]
+
+
+class TableStats:
+    """Accumulator of a table's item statistics, safe to share between scan threads"""
+
+    def __init__(
+        self, now: Optional[datetime] = None, config: Optional[DysessionSettings] = None
+    ) -> None:
+        config = config or get_settings()
+        self.now = int((now or datetime.now()).timestamp())
+        self.pk = config.partition_key_name
+        self.ttl_attribute_name = config.ttl_attribute_name
+        self.lifetime = settings.SESSION_COOKIE_AGE
+
+        self._lock = threading.Lock()
+        self.items = 0
+        self.total_bytes = 0
+        self.max_bytes = 0
+        self.expired = 0
+        self.without_ttl = 0
+        self.read_units = 0.0
+        self.write_units = 0
+        self.sizes = [0] * (len(SIZE_BUCKETS) + 1)
+        self.ttls = [0] * (len(TTL_BUCKETS) + 1)
+        self.ages = [0] * (len(AGE_BUCKETS) + 1)
+        self.attributes: Counter = Counter()
+
+    def add_page(self, items: List[Dict[str, Dict[str, Any]]]) -> None:
+        """Fold a page of low-level items into the statistics
+
+        The page is aggregated into local counters first so the lock is only
+        taken once per page.
+        """
+        sizes = [0] * len(self.sizes)
+        ttls = [0] * len(self.ttls)
+        ages = [0] * len(self.ages)
+        attributes = Counter()
+        total_bytes = max_bytes = expired = without_ttl = write_units = 0
+        read_units = 0.0
+
+        for item in items:
+            size = item_size(item)
+            total_bytes += size
+            max_bytes = max(max_bytes, size)
+            sizes[bisect_left(SIZE_BUCKETS, size)] += 1
+            read_units += math.ceil(size / READ_UNIT_BYTES) * 0.5
+            write_units += math.ceil(size / WRITE_UNIT_BYTES)
+            attributes.update(name for name in item if name != self.pk)
+
+            ttl_value = item.get(self.ttl_attribute_name, {}).get("N")
+            if ttl_value is None:
+                without_ttl += 1
+                continue
+
+            ttl = int(Decimal(ttl_value))
+            remaining = ttl - self.now
+            if remaining < 0:
+                expired += 1
+            ttls[bisect_left(TTL_BUCKETS, remaining)] += 1
+            # A session is written with a TTL of SESSION_COOKIE_AGE seconds,
+            # unless set_expiry() changed it
+            age = max(0, self.now - (ttl - self.lifetime))
+            ages[bisect_left(AGE_BUCKETS, age)] += 1
+
+        with self._lock:
+            self.items += len(items)
+            self.total_bytes += total_bytes
+            self.max_bytes = max(self.max_bytes, max_bytes)
+            self.expired += expired
+            self.without_ttl += without_ttl
+            self.read_units += read_units
+            self.write_units += write_units
+            self.attributes.update(attributes)
+            for total, page in (
+                (self.sizes, sizes),
+                (self.ttls, ttls),
+                (self.ages, ages),
+            ):
+                for i, count in enumerate(page):
+                    total[i] += count
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the statistics as a JSON serializable dictionary"""
+        items = self.items or 1
+        return {
+            "items": self.items,
+            "total_bytes": self.total_bytes,
+            "average_bytes": self.total_bytes / items,
+            "max_bytes": self.max_bytes,
+            "expired": self.expired,
+            "expired_ratio": self.expired / items,
+            "without_ttl": self.without_ttl,
+            "size_histogram": dict(zip(_bucket_labels(SIZE_BUCKETS), self.sizes)),
+            "ttl_histogram": dict(zip(_bucket_labels(TTL_BUCKETS), self.ttls)),
+            "age_histogram": dict(zip(_bucket_labels(AGE_BUCKETS), self.ages)),
+            "attributes": dict(self.attributes.most_common()),
+            "capacity": {
+                # GetItem is eventually consistent, a full save is one PutItem
+                "rcu_per_load": self.read_units / items,
+                "wcu_per_save": self.write_units / items,
+                "rcu_full_scan": math.ceil(self.total_bytes / READ_UNIT_BYTES) * 0.5,
+            },
+        }
+
+
+def collect_table_stats(
+    table_name: Optional[str] = None,
+    client=None,
+    total_segments: int = DEFAULT_SEGMENTS,
+    read_capacity: Optional[float] = None,
+    page_size: Optional[int] = None,
+    now: Optional[datetime] = None,
+    config: Optional[DysessionSettings] = None,
+) -> TableStats:
+    """Scan the whole table in parallel segments and return its `TableStats`
+
+    Raise `DynamodbTableNotFound` if the table does not exist.
+    `read_capacity` caps the consumed RCU per second.
+    """
+
+    if client is None:
+        client = get_maintenance_client()
+
+    config = config or get_settings()
+    if table_name is None:
+        table_name = config.table_name
+
+    check_dynamodb_table_exists(table_name=table_name, client=client, config=config)
+
+    stats = TableStats(now=now, config=config)
+    parallel_scan(
+        lambda segment, items: stats.add_page(items),
+        total_segments=total_segments,
+        table_name=table_name,
+        client=client,
+        read_limiter=TokenBucket(read_capacity) if read_capacity else None,
+        page_size=page_size,
+    )
+    return stats
+
+
+__all__ = ["TableStats", "attribute_value_size", "item_size", "collect_table_stats"]
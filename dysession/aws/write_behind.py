@@ -0,0 +1,339 @@
+"""
+Write-behind persistence of sessions.
+
+With `WRITE_BEHIND["ENABLED"]`, `DynamoDB.set` and `DynamoDB.delete` queue the
+write instead of sending it, and a background thread flushes the queue with
+BatchWriteItem. Writes to the same session are coalesced, only the last one is
+sent. Until it is flushed, a queued write is served to the readers of the same
+process, which gives read-your-writes without waiting for DynamoDB.
+
+When the queue is full, writers wait up to `WRITE_BEHIND["BLOCK_TIMEOUT"]`
+seconds for room, then fall back to a synchronous write. The queue is flushed
+when the process exits.
+
+While the circuit breaker of `dysession.aws.circuit` is open, the flusher
+holds the queued writes instead of sending them.
+"""
+
+import atexit
+import copy
+import os
+import threading
+import time
+import weakref
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from dysession.aws.circuit import CircuitBreaker, get_breaker
+from dysession.aws.client import get_client
+from dysession.aws.dynamodb import BATCH_WRITE_LIMIT, batch_write_sessions
+from dysession.aws.routing import get_router
+from dysession.backends.model import SessionDataModel
+from dysession.logger import get_logger
+from dysession.metrics import track
+
+from ..settings import DysessionSettings, get_settings
+
+PendingKey = Tuple[str, str]
+
+
+class _Pending:
+    """A queued write: the model to put, or None to delete the session"""
+
+    __slots__ = ("model", "attempts")
+
+    def __init__(self, model: Optional[SessionDataModel], attempts: int = 0) -> None:
+        self.model = model
+        self.attempts = attempts
+
+
+class WriteBehindQueue:
+    """Bounded queue of session writes flushed by a background thread
+
+    `max_entries` bounds the number of distinct sessions waiting to be written.
+    A write failing `max_attempts` times is dropped and logged.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        config: Optional[DysessionSettings] = None,
+        max_entries: int = 10000,
+        flush_interval: float = 0.05,
+        block_timeout: float = 1.0,
+        max_attempts: int = 3,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.client = client
+        self.config = config or get_settings()
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.max_attempts = max_attempts
+        self.breaker = breaker
+
+        self._closed = False
+        self._reset()
+        self.dropped = 0
+        _queues.add(self)
+
+    def put(self, model: SessionDataModel, table_name: str) -> bool:
+        """Queue a put of a copy of model, return False if the queue stayed full"""
+        return self._enqueue((table_name, model.session_key), copy.deepcopy(model))
+
+    def delete(self, session_key: str, table_name: str) -> bool:
+        """Queue the deletion of session_key, return False if the queue stayed full"""
+        return self._enqueue((table_name, session_key), None)
+
+    def _enqueue(self, key: PendingKey, model: Optional[SessionDataModel]) -> bool:
+        self._check_fork()
+        with self._condition:
+            deadline = time.monotonic() + self.block_timeout
+            if self._closed:
+                # the caller writes through, let a queued write of key land first
+                while key in self._pending or key in self._in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # too late, the write through is newer than both
+                        self._pending.pop(key, None)
+                        self._in_flight.pop(key, None)
+                        break
+                    self._condition.wait(remaining)
+                return False
+            # backpressure: wait for the flusher to make room. A session with
+            # a write queued or in flight is never refused, a write through
+            # could land before the older queued one.
+            while (
+                len(self._pending) >= self.max_entries
+                and key not in self._pending
+                and key not in self._in_flight
+            ):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    return False
+                self._condition.wait(remaining)
+            self._pending[key] = _Pending(model)
+            self._ensure_thread()
+            self._condition.notify_all()
+            return True
+
+    def get(
+        self, session_key: str, table_name: str
+    ) -> Tuple[bool, Optional[SessionDataModel]]:
+        """Return (True, model) if a write of session_key is not flushed yet
+
+        model is a copy of the queued session, or None if its deletion is queued.
+        """
+        key = (table_name, session_key)
+        self._check_fork()
+        with self._condition:
+            pending = self._pending.get(key) or self._in_flight.get(key)
+            if pending is None:
+                return False, None
+            model = pending.model
+        return True, copy.deepcopy(model) if model is not None else None
+
+    def __len__(self) -> int:
+        self._check_fork()
+        with self._condition:
+            return len(self._pending) + len(self._in_flight)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued write is flushed, return False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._check_fork()
+        with self._condition:
+            self._condition.notify_all()
+            while self._pending or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    self._ensure_thread()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush the queue and stop the flusher, later writes are not queued"""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _check_fork(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _reset(self) -> None:
+        # Also run in a forked child: the parent flushes what it queued, the
+        # child starts empty. The old lock is never acquired, it may have
+        # been held by a thread of the parent at fork time.
+        self._condition = threading.Condition()
+        self._pending: Dict[PendingKey, _Pending] = {}
+        self._in_flight: Dict[PendingKey, _Pending] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="dysession-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+            if self.breaker is not None and not self._closed and not self.breaker.allow():
+                # DynamoDB is unavailable, hold the writes until the breaker half-opens
+                time.sleep(min(self.breaker.reset_timeout, 1.0))
+                continue
+            # let writes of the same sessions coalesce before sending them
+            if self.flush_interval and not self._closed:
+                time.sleep(self.flush_interval)
+            with self._condition:
+                self._in_flight, self._pending = self._pending, {}
+                self._condition.notify_all()
+
+            self._write(self._in_flight)
+
+            with self._condition:
+                self._in_flight = {}
+                self._condition.notify_all()
+
+    def _write(self, batch: Dict[PendingKey, _Pending]) -> None:
+        tables: Dict[str, List[Tuple[str, _Pending]]] = {}
+        for (table_name, session_key), pending in batch.items():
+            tables.setdefault(table_name, []).append((session_key, pending))
+
+        for table_name, entries in tables.items():
+            for start in range(0, len(entries), BATCH_WRITE_LIMIT):
+                chunk = entries[start : start + BATCH_WRITE_LIMIT]
+                try:
+                    with self._guard(), track("flush", table_name):
+                        list(
+                            batch_write_sessions(
+                                puts=[p.model for _, p in chunk if p.model is not None],
+                                deletes=[key for key, p in chunk if p.model is None],
+                                table_name=table_name,
+                                client=self._client(),
+                                max_workers=1,
+                                config=self.config,
+                            )
+                        )
+                except Exception as e:
+                    self._retry(table_name, chunk, e)
+
+    def _guard(self):
+        return self.breaker.guard() if self.breaker is not None else nullcontext()
+
+    def _client(self):
+        if self.client is not None:
+            return self.client
+        return get_router() or get_client(self.config.region, self.config.profile)
+
+    def _retry(
+        self, table_name: str, chunk: List[Tuple[str, _Pending]], error: Exception
+    ) -> None:
+        logger = get_logger()
+        with self._condition:
+            for session_key, pending in chunk:
+                key = (table_name, session_key)
+                if key in self._pending or self._in_flight.get(key) is not pending:
+                    # superseded by a newer write, queued or written through
+                    continue
+                if pending.attempts + 1 >= self.max_attempts:
+                    self.dropped += 1
+                    logger.error(
+                        f"Dropped the write of '{session_key}' to table "
+                        f"'{table_name}' after {self.max_attempts} attempts: {error!r}"
+                    )
+                    continue
+                self._pending[key] = _Pending(pending.model, pending.attempts + 1)
+
+
+# Every queue of the process, reset in a forked child
+_queues: "weakref.WeakSet[WriteBehindQueue]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for queue in list(_queues):
+        queue._reset()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no cover
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _build_queue() -> WriteBehindQueue:
+    config = get_settings()
+    options = config.write_behind
+    queue = WriteBehindQueue(
+        config=config,
+        max_entries=options["MAX_ENTRIES"],
+        flush_interval=options["FLUSH_INTERVAL"],
+        block_timeout=options["BLOCK_TIMEOUT"],
+        max_attempts=options["MAX_ATTEMPTS"],
+        breaker=get_breaker(),
+    )
+    # flush on worker shutdown
+    atexit.register(queue.close, options["SHUTDOWN_TIMEOUT"])
+    return queue
+
+
+@lru_cache
+def get_write_behind() -> Optional[WriteBehindQueue]:
+    """Return the process-wide write-behind queue, or None if `WRITE_BEHIND` is disabled"""
+    if not get_settings().write_behind["ENABLED"]:
+        return None
+    return _build_queue()
+
+
+@lru_cache
+def get_fallback_queue() -> Optional[WriteBehindQueue]:
+    """Return the queue of the writes refused by the open circuit breaker
+
+    None unless `CIRCUIT_BREAKER["WRITE_POLICY"]` is "QUEUE". It is the
+    write-behind queue if `WRITE_BEHIND` is enabled, else one of its own.
+    """
+    options = get_settings().circuit_breaker
+    if not options["ENABLED"] or options["WRITE_POLICY"] != "QUEUE":
+        return None
+    return get_write_behind() or _build_queue()
+
+
+def close_write_behind() -> None:
+    """Flush and stop the process-wide queues, e.g. when a worker is recycled"""
+    queues = set()
+    for factory in (get_write_behind, get_fallback_queue):
+        if factory.cache_info().currsize:
+            queues.add(factory())
+            factory.cache_clear()
+    for queue in queues - {None}:
+        queue.close(get_settings().write_behind["SHUTDOWN_TIMEOUT"])
+        atexit.unregister(queue.close)
+
+
+@receiver(setting_changed)
+def update_write_behind(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        close_write_behind()  # pragma: no cover
+
+
+__all__ = [
+    "WriteBehindQueue",
+    "get_write_behind",
+    "get_fallback_queue",
+    "close_write_behind",
+]
@@ -0,0 +1,100 @@
+"""
+Cached, DynamoDB-backed sessions.
+"""
+
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from dysession.aws.dynamodb import is_session_expired
+from dysession.backends.db import SessionStore as DBStore
+from dysession.backends.model import SessionDataModel
+
+KEY_PREFIX = "dysession.backends.cached_db"
+
+
+class SessionStore(DBStore):
+    """
+    Implement cached, DynamoDB backed sessions.
+
+    Reads are served from the Django cache `SESSION_CACHE_ALIAS` and fall back
+    to DynamoDB, writes go to DynamoDB first and then refresh the cache.
+    """
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key: Optional[str] = None, **kwargs: Any) -> None:
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        super().__init__(session_key, **kwargs)
+
+    @property
+    def native_async(self) -> bool:
+        # the a*() methods of DBStore would bypass the Django cache, e.g. a
+        # logged out session would still be served from it after adelete()
+        return False
+
+    @property
+    def cache_key(self) -> str:
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def _to_model(self, data: dict) -> SessionDataModel:
+        model = self._new_model(self.session_key)
+        for k, v in data.items():
+            model[k] = v
+        model.mark_clean()
+        return model
+
+    def load(self) -> SessionDataModel:
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends (e.g. memcache) raise an exception on invalid
+            # cache keys. If this happens, reset the session.
+            data = None
+
+        if data is not None:
+            model = self._to_model(data)
+            if not is_session_expired(model, config=self.config):
+                return model
+            self._cache.delete(self.cache_key)
+            self._session_key = None
+            return self._new_model()
+
+        model = self._get_session_from_ddb()
+        if model is None:
+            return self._new_model()
+        if not model.is_persisted:
+            # stored in the other encoding format, cached once saved again
+            return model
+
+        self._cache.set(
+            self.cache_key,
+            dict(model.items()),
+            self.get_expiry_age(expiry=model.get("_session_expiry", None)),
+        )
+        return model
+
+    def exists(self, session_key: str) -> bool:
+        return (
+            session_key
+            and (self.cache_key_prefix + session_key) in self._cache
+            or super().exists(session_key)
+        )
+
+    def save(self, must_create: bool = False) -> None:
+        if self.degraded and not must_create:
+            # caching the empty degraded session would hide the stored one
+            return
+        super().save(must_create)
+        self._cache.set(
+            self.cache_key, dict(self._session.items()), self.get_expiry_age()
+        )
+
+    def delete(self, session_key: Optional[str] = None) -> None:
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
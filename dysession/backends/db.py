@@ -1,36 +1,84 @@
 import logging
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Iterable, Optional
 
-import boto3
+from asgiref.sync import sync_to_async
 from django.contrib import auth
-from django.contrib.sessions.backends.base import CreateError, SessionBase
+from django.contrib.sessions.backends.base import (
+    VALID_KEY_CHARS,
+    CreateError,
+    SessionBase,
+)
 from django.core.exceptions import SuspiciousOperation
 from django.utils import timezone
+from django.utils.crypto import get_random_string
 
+from dysession.aws.aio import AsyncDynamoDB
+from dysession.aws.circuit import get_breaker
+from dysession.aws.client import get_client
 from dysession.aws.dynamodb import DynamoDB
+from dysession.aws.maintenance import clear_expired_sessions
+from dysession.aws.routing import RegionRouter, get_router
+from dysession.aws.write_behind import get_fallback_queue, get_write_behind
 from dysession.backends.error import (
     DeleteSessionError,
     SessionExpired,
     SessionKeyDoesNotExist,
     SessionKeyDuplicated,
+    SessionUnavailable,
 )
-from dysession.backends.model import SessionDataModel
-from dysession.settings import get_config
+from dysession.backends.model import Changes, SessionDataModel
+from dysession.settings import get_settings
 
 
 class SessionStore(SessionBase):
     """Implement DynamoDB session store"""
 
+    # Django reads it on every save, so a partial load always includes it
+    EXPIRY_KEY = "_session_expiry"
+
     def __init__(self, session_key: Optional[str], **kwargs: Any) -> None:
         super().__init__(session_key, **kwargs)
+        self.config = get_settings()
+        # Nothing is read from DynamoDB until the session is first accessed
         self.db = DynamoDB(
-            client=boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+            client=get_router() or get_client(self.config.region, self.config.profile),
+            config=self.config,
+            write_behind=get_write_behind(),
+            breaker=get_breaker(),
+            fallback_queue=get_fallback_queue(),
         )
-        self._get_session()
+        # Used by the a*() methods, its aiobotocore client is resolved on first await
+        self.adb = AsyncDynamoDB(cache=self.db.cache, config=self.config)
+        # Keys to load first, the others are loaded once touched.
+        # Set by the middleware, see `DYSESSION["PARTIAL_LOAD"]`.
+        self.hot_keys: Optional[Iterable[str]] = None
+        # True once the session could not be read, the circuit breaker being
+        # open. It is empty for this request and never saved over the stored one.
+        self.degraded = False
+
+    def _new_model(self, session_key: Optional[str] = None) -> SessionDataModel:
+        return SessionDataModel(session_key, self.config.partition_key_name)
 
     def _get_session_from_ddb(self) -> SessionDataModel:
+        attributes = None
+        if self.hot_keys is not None and not self.config.is_binary_format:
+            # a BINARY item is a single attribute, there is nothing to project
+            attributes = {*self.hot_keys, self.EXPIRY_KEY}
         try:
-            return self.db.get(session_key=self.session_key)
+            return self.db.get(session_key=self.session_key, attributes=attributes)
+        except SessionUnavailable:
+            # the cookie keeps its key, the session is back once DynamoDB is
+            self.degraded = True
+        except (SessionKeyDoesNotExist, SessionExpired, SuspiciousOperation) as e:
+            if isinstance(e, SuspiciousOperation):
+                logger = logging.getLogger(f"django.security.{e.__class__.__name__}")
+                logger.warning(str(e))
+            self._session_key = None
+
+    async def _aget_session_from_ddb(self) -> Optional[SessionDataModel]:
+        try:
+            return await self.adb.get(session_key=self.session_key)
         except (SessionKeyDoesNotExist, SessionExpired, SuspiciousOperation) as e:
             if isinstance(e, SuspiciousOperation):
                 logger = logging.getLogger(f"django.security.{e.__class__.__name__}")
@@ -49,11 +97,31 @@ class SessionStore(SessionBase):
             raise AttributeError
         except AttributeError:
             if self.session_key is None or no_load:
-                self._session_cache = SessionDataModel(self.session_key)
+                self._session_cache = self._new_model(self.session_key)
             else:
                 self._session_cache = self.load()
         return self._session_cache
 
+    async def _aget_session(self, no_load=False) -> SessionDataModel:
+        self.accessed = True
+        if isinstance(getattr(self, "_session_cache", None), SessionDataModel):
+            return self._session_cache
+
+        if self.session_key is None or no_load:
+            self._session_cache = self._new_model(self.session_key)
+        else:
+            self._session_cache = await self.aload()
+        return self._session_cache
+
+    # SessionBase binds `_session` to its own `_get_session`, which would cache
+    # a plain dict instead of a SessionDataModel
+    _session = property(_get_session)
+
+    @property
+    def is_loaded(self) -> bool:
+        "Return True once the session data has been read from (or created for) storage."
+        return isinstance(getattr(self, "_session_cache", None), SessionDataModel)
+
     @property
     def key_salt(self):
         return "dysession.backends." + self.__class__.__qualname__
@@ -61,13 +129,15 @@ class SessionStore(SessionBase):
     def is_empty(self) -> bool:
         "Return True when there is no session_key and the session is empty."
         try:
-            return not self._session_key and not self._session_cache.is_empty
-        except AttributeError:
+            # the partition key entry is always there, the session holds no data
+            # as long as it is the only one
+            return not self._session_key and len(self._session_cache) <= 1
+        except (AttributeError, TypeError):
             return True
 
     def clear(self):
         super().clear()
-        self._session_cache = SessionDataModel()
+        self._session_cache = self._new_model()
 
     def items(self) -> Dict[str, Any]:
         return self._session.items()
@@ -82,6 +152,13 @@ class SessionStore(SessionBase):
         """
         return self.db.exists(session_key)
 
+    def _get_new_session_key(self) -> str:
+        """
+        Return a random session key. Unlike SessionBase, don't look the key up
+        first: create() saves with a conditional put which rejects a taken key.
+        """
+        return get_random_string(32, VALID_KEY_CHARS)
+
     def create(self) -> None:
         """
         Create a new session instance. Guaranteed to create a new object with
@@ -93,28 +170,54 @@ class SessionStore(SessionBase):
             try:
                 # Save immediately to ensure we have a unique entry in the database.
                 self.save(must_create=True)
-            except (CreateError, SessionKeyDuplicated):
+            except CreateError:
                 # Key wasn't unique. Try again.
                 continue
             self.modified = True
             return
 
+    def _refresh_ttl(self, data: SessionDataModel) -> Changes:
+        """Set the TTL attribute of data to now + get_expiry_age()
+
+        An unchanged, stored session keeps its TTL until less than
+        `TTL_REFRESH_FRACTION` of its lifetime is left, so its save can be
+        skipped instead of rewriting the TTL on every request.
+        Return the changes of data, computed once for the whole save.
+        """
+        ttl_attribute_name = self.config.ttl_attribute_name
+        now = int(time.time())
+        # a stored set_expiry(seconds) is loaded as a Decimal
+        age = int(self.get_expiry_age())
+        ttl = data.get(ttl_attribute_name, None)
+        changes = data.changes()
+        if (
+            ttl is None
+            or not data.is_persisted
+            or changes.is_dirty
+            or ttl - now < age * self.config.ttl_refresh_fraction
+        ):
+            data[ttl_attribute_name] = now + age
+            changes = data.changes(since=changes, keys=(ttl_attribute_name,))
+        return changes
+
     def save(self, must_create: bool = False) -> None:
         """
         Save the session data. If 'must_create' is True, create a new session
         object (or raise CreateError). Otherwise, only update an existing
         object and don't create one (raise UpdateError if needed).
         """
-        try:
-            if self._session_key is None:
-                return self.create()
+        if self._session_key is None:
+            return self.create()
+        if self.degraded and not must_create:
+            return
 
-            data = self._get_session(no_load=must_create)
-            data.session_key = self._session_key
-            self.db.set(data=data)
+        data = self._get_session(no_load=must_create)
+        data.session_key = self._session_key
+        changes = self._refresh_ttl(data)
+        try:
+            self.db.set(data=data, ignore_duplicated=not must_create, changes=changes)
         except SessionKeyDuplicated:
-            if must_create:
-                raise SessionKeyDuplicated
+            raise CreateError
 
     def delete(self, session_key=None):
         """
@@ -122,10 +225,12 @@ class SessionStore(SessionBase):
         current session key value.
         """
         if session_key is None:
-            session_key = self._session_key
+            if self.session_key is None:
+                return
+            session_key = self.session_key
 
         try:
-            self.db.delete(self._get_session())
+            self.db.delete(self._new_model(session_key))
         except DeleteSessionError:
             pass
 
@@ -134,10 +239,77 @@ class SessionStore(SessionBase):
         Load the session data and return a dictionary.
         """
         s = self._get_session_from_ddb()
-        return s if s else SessionDataModel()
+        return s if s is not None else self._new_model()
+
+    # Native asyncio implementations, used by Django >= 5.0 under ASGI instead
+    # of running the blocking methods in a thread
+    @property
+    def native_async(self) -> bool:
+        """False if the a*() methods run the blocking ones in a thread
+
+        The write-behind queue, the region router and the circuit breaker are
+        only used by the blocking DynamoDB calls.
+        """
+        return (
+            self.db.breaker is None
+            and self.db.write_behind is None
+            and not isinstance(self.db.client, RegionRouter)
+        )
+
+    async def aexists(self, session_key: str) -> bool:
+        if not self.native_async:
+            return await sync_to_async(self.exists)(session_key)
+        return await self.adb.exists(session_key)
+
+    async def acreate(self) -> None:
+        if not self.native_async:
+            return await sync_to_async(self.create)()
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                await self.asave(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+
+    async def asave(self, must_create: bool = False) -> None:
+        if not self.native_async:
+            return await sync_to_async(self.save)(must_create)
+        if self._session_key is None:
+            return await self.acreate()
+
+        data = await self._aget_session(no_load=must_create)
+        data.session_key = self._session_key
+        changes = self._refresh_ttl(data)
+        try:
+            await self.adb.set(
+                data=data, ignore_duplicated=not must_create, changes=changes
+            )
+        except SessionKeyDuplicated:
+            raise CreateError
+
+    async def adelete(self, session_key: Optional[str] = None) -> None:
+        if not self.native_async:
+            return await sync_to_async(self.delete)(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+
+        try:
+            await self.adb.delete(self._new_model(session_key))
+        except DeleteSessionError:
+            pass
+
+    async def aload(self) -> SessionDataModel:
+        if not self.native_async:
+            return await sync_to_async(self.load)()
+        s = await self._aget_session_from_ddb()
+        return s if s is not None else self._new_model()
 
     @classmethod
     def clear_expired(cls) -> None:
-        # clearing expired-items from dynamodb table is extremely expensive
-        # Instead of clearing expired-items, we should use ttl attribube and which is much cost-effective
-        ...
+        # DynamoDB's TTL deletes expired items eventually (up to 48 hours late),
+        # this removes the leftovers with a Scan rate limited by CLEAR_EXPIRED
+        clear_expired_sessions()
@@ -6,9 +6,24 @@ class SessionKeyDoesNotExist(Exception):
     ...
 
 
+class SessionUnavailable(SessionKeyDoesNotExist):
+    """DynamoDB was not called because the circuit breaker is open
+
+    A SessionKeyDoesNotExist, so code unaware of the breaker treats the
+    session as missing.
+    """
+
+
 class SessionKeyDuplicated(Exception):
     ...
 
 
 class DeleteSessionError(Exception):
     ...
+
+
+class SessionDataKeyError(KeyError, AttributeError):
+    """A key is missing from a SessionDataModel
+
+    Also an AttributeError, which is what a missing key used to raise.
+    """
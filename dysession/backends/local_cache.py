@@ -0,0 +1,234 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_settings
+
+CacheKey = Tuple[str, str]
+
+POLICIES = ("LRU", "LFU")
+
+
+class _Entry:
+
+    __slots__ = ("expires_at", "size", "payload", "frequency")
+
+    def __init__(self, expires_at: float, payload: bytes) -> None:
+        self.expires_at = expires_at
+        self.size = len(payload)
+        self.payload = payload
+        self.frequency = 0
+
+
+class _Shard:
+    def __init__(self, max_entries: int, max_bytes: int, policy: str) -> None:
+        self.lock = threading.Lock()
+        # in recency order
+        self.entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # LFU: keys by hit count, each bucket in recency order
+        self.frequencies: Dict[int, "OrderedDict[CacheKey, None]"] = {}
+        self.min_frequency = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # bumped by every invalidation, see `LocalSessionCache.generation`
+        self.generation = 0
+
+    def put(self, key: CacheKey, entry: _Entry) -> None:
+        """Insert entry, evicting others until it fits the shard's bounds"""
+        self.remove(key)
+        while self.entries and (
+            len(self.entries) >= self.max_entries
+            or self.size + entry.size > self.max_bytes
+        ):
+            self.remove(self.victim())
+            self.evictions += 1
+        self.entries[key] = entry
+        self.size += entry.size
+        if self.policy == "LFU":
+            self.frequencies.setdefault(0, OrderedDict())[key] = None
+            self.min_frequency = 0
+
+    def touch(self, key: CacheKey, entry: _Entry) -> None:
+        self.entries.move_to_end(key)
+        if self.policy == "LFU":
+            frequency = entry.frequency
+            self._unlink(key, entry)
+            if frequency == self.min_frequency and frequency not in self.frequencies:
+                # the next count holds this key at least
+                self.min_frequency += 1
+            self.frequencies.setdefault(frequency + 1, OrderedDict())[key] = None
+        entry.frequency += 1
+
+    def remove(self, key: CacheKey) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            if self.policy == "LFU":
+                self._unlink(key, entry)
+
+    def victim(self) -> CacheKey:
+        if self.policy == "LRU":
+            return next(iter(self.entries))
+        if self.min_frequency not in self.frequencies:
+            # the last key of the lowest count was removed
+            self.min_frequency = min(self.frequencies)
+        # ties go to the least recently used key
+        return next(iter(self.frequencies[self.min_frequency]))
+
+    def _unlink(self, key: CacheKey, entry: _Entry) -> None:
+        bucket = self.frequencies[entry.frequency]
+        del bucket[key]
+        if not bucket:
+            del self.frequencies[entry.frequency]
+
+
+class LocalSessionCache:
+    """Bounded, thread-safe, in-process cache of decoded session snapshots
+
+    Snapshots are stored pickled: the pickled size drives the byte-size
+    bound and every hit returns a fresh `SessionDataModel`, so a request
+    mutating its session can never leak into the cached copy.
+
+    Keys are spread over `shards` independently locked partitions, so
+    threads of the same worker rarely wait on each other.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        shards: int = 16,
+        policy: str = "LRU",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"policy should be one of {POLICIES} instead of {policy!r}")
+        if shards <= 0:
+            raise ValueError("shards should be a positive integer")
+
+        self.ttl = ttl
+        self.clock = clock
+        self._shards = [
+            _Shard(
+                max_entries=max(1, max_entries // shards),
+                max_bytes=max(1, max_bytes // shards),
+                policy=policy,
+            )
+            for _ in range(shards)
+        ]
+
+    def _shard(self, key: CacheKey) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, session_key: str, table_name: str) -> Optional[SessionDataModel]:
+        key = (table_name, session_key)
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None or entry.expires_at <= self.clock():
+                if entry is not None:
+                    shard.remove(key)
+                shard.misses += 1
+                return None
+            shard.touch(key, entry)
+            shard.hits += 1
+            payload = entry.payload
+
+        model = SessionDataModel(session_key)
+        for k, v in pickle.loads(payload).items():
+            model[k] = v
+        model.mark_clean()
+        return model
+
+    def generation(self, session_key: str, table_name: str) -> int:
+        """Return the token to pass to `set` for an item about to be fetched
+
+        A fetch started before an invalidation may return the item it
+        replaced, `set` does not cache it.
+        """
+        shard = self._shard((table_name, session_key))
+        with shard.lock:
+            return shard.generation
+
+    def set(
+        self, model: SessionDataModel, table_name: str, generation: Optional[int] = None
+    ) -> None:
+        payload = pickle.dumps(dict(model.items()), pickle.HIGHEST_PROTOCOL)
+        key = (table_name, model.session_key)
+        entry = _Entry(self.clock() + self.ttl, payload)
+        shard = self._shard(key)
+        with shard.lock:
+            if generation is not None and generation != shard.generation:
+                # invalidated while it was fetched, may be stale
+                return
+            if entry.size > shard.max_bytes:
+                # would evict the whole shard and still not fit
+                shard.remove(key)
+                return
+            shard.put(key, entry)
+
+    def invalidate(self, session_key: str, table_name: str) -> None:
+        key = (table_name, session_key)
+        shard = self._shard(key)
+        with shard.lock:
+            shard.remove(key)
+            shard.generation += 1
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.frequencies.clear()
+                shard.size = 0
+                shard.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current occupancy summed over all shards"""
+        stats = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0}
+        for shard in self._shards:
+            with shard.lock:
+                stats["hits"] += shard.hits
+                stats["misses"] += shard.misses
+                stats["evictions"] += shard.evictions
+                stats["entries"] += len(shard.entries)
+                stats["bytes"] += shard.size
+        return stats
+
+
+@lru_cache
+def get_local_cache() -> Optional[LocalSessionCache]:
+    """Return the process-wide session cache, or None if `LOCAL_CACHE` is disabled"""
+    config = get_settings()
+    options = config.local_cache
+    if not options["ENABLED"]:
+        return None
+
+    return LocalSessionCache(
+        ttl=options["TTL"],
+        max_entries=options["MAX_ENTRIES"],
+        max_bytes=options["MAX_BYTES"],
+        shards=options["SHARDS"],
+        policy=options["POLICY"],
+    )
+
+
+@receiver(setting_changed)
+def update_local_cache(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        get_local_cache.cache_clear()  # pragma: no cover
+
+
+__all__ = ["LocalSessionCache", "get_local_cache"]
@@ -1,83 +1,357 @@
+import hashlib
 import json
-from typing import Any, Optional
+from collections.abc import ItemsView, KeysView, MutableMapping, ValuesView
+from decimal import Decimal
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, Optional
 
-from dysession.settings import get_config
+from dysession.backends.error import SessionDataKeyError
+from dysession.settings import get_settings
 
 
-class SessionDataModel:
+def _canonical(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        # boto3 loads every number as Decimal, make 1 and Decimal("1") equal
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    # not str(): distinct objects often share it, and a change would be missed
+    return f"{type(value).__module__}.{type(value).__qualname__}:{value!r}"
 
-    NOTFOUND_ALLOW_LIST = ["_auth_user_id", "_auth_user_backend", "_auth_user_hash"]
 
-    def __init__(self, session_key: Optional[str] = None) -> None:
+def value_digest(value: Any) -> bytes:
+    """Return a short digest of the canonical JSON encoding of value"""
+    try:
+        encoded = json.dumps(
+            value, sort_keys=True, separators=(",", ":"), default=_canonical
+        )
+    except (TypeError, ValueError):
+        # e.g. dict keys of mixed types cannot be sorted
+        encoded = repr(value)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).digest()
+
+
+class Changes:
+    """Keys set or removed since a model was last loaded or saved
+
+    Taken once per save by `SessionDataModel.changes`, which digests every
+    value, and passed along to the update and to `mark_clean`.
+    """
+
+    __slots__ = ("dirty_keys", "removed_keys", "digests")
+
+    def __init__(
+        self,
+        dirty_keys: FrozenSet[str],
+        removed_keys: FrozenSet[str],
+        digests: Dict[str, bytes],
+    ) -> None:
+        self.dirty_keys = dirty_keys
+        self.removed_keys = removed_keys
+        # digest of every current value
+        self.digests = digests
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.dirty_keys or self.removed_keys)
+
+
+class SessionDataModel(MutableMapping):
+    """Session data of one session key, backed by a single dict
+
+    The partition key is an entry of the mapping like any other key, holding
+    the session key. Changes are tracked per key against the digests taken
+    by `mark_clean`.
+    """
+
+    __slots__ = ("_data", "_digests", "_persisted", "_pk")
+
+    NOTFOUND_ALLOW_LIST = [
+        "_auth_user_id",
+        "_auth_user_backend",
+        "_auth_user_hash",
+        "_session_expiry",
+    ]
+
+    def __init__(
+        self, session_key: Optional[str] = None, partition_key_name: Optional[str] = None
+    ) -> None:
 
         if type(session_key) is not str and session_key is not None:
             raise TypeError("session_key should be type str or None")
 
-        self.__variables_names = set([])
-        self[get_config()["PARTITION_KEY_NAME"]] = session_key
+        if partition_key_name is None:
+            partition_key_name = get_settings().partition_key_name
+        self._pk = partition_key_name
+        self._data = {self._pk: session_key}
+        # Digest of every value as it was last loaded from or written to DynamoDB
+        self._digests = {}
+        self._persisted = False
 
     def __getitem__(self, key) -> Any:
-        # Set SESSION_EXPIRE_AT_BROWSER_CLOSE to False
-        # https://docs.djangoproject.com/en/4.1/topics/http/sessions/#browser-length-sessions-vs-persistent-sessions
-        if key == "_session_expiry":
-            return False
-
         try:
-            return getattr(self, key)
-        except AttributeError:
+            return self._data[key]
+        except KeyError:
             if key in self.NOTFOUND_ALLOW_LIST:
-                raise KeyError
-            raise
+                raise KeyError(key) from None
+            raise SessionDataKeyError(key) from None
+
+    def __setitem__(self, key, value) -> None:
+        self._data[key] = value
 
-    def __get_session_key(self):
-        return self[get_config()["PARTITION_KEY_NAME"]]
+    def __delitem__(self, key) -> None:
+        try:
+            del self._data[key]
+        except KeyError:
+            raise SessionDataKeyError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __getattr__(self, name: str) -> Any:
+        # Read-only attribute access to keys, e.g. `model.PK`. Only reached
+        # when normal lookup fails, so methods always win over session keys.
+        if name.startswith("__") or name in _INTERNAL_ATTRIBUTES:
+            raise AttributeError(name)
+        try:
+            return self._data[name]
+        except KeyError:
+            raise SessionDataKeyError(name) from None
+
+    @property
+    def session_key(self) -> Optional[str]:
+        return self._data[self._pk]
+
+    @session_key.setter
+    def session_key(self, value: Any) -> None:
+        if self._data.get(self._pk) != value:
+            # A new key means a new item, which has to be written as a whole
+            self._persisted = False
+        self._data[self._pk] = value
 
-    def __set_session_key(self, value: Any):
-        self[get_config()["PARTITION_KEY_NAME"]] = value
+    @property
+    def is_empty(self) -> bool:
+        """True if the session holds no data besides its partition key"""
+        return len(self) <= 1
 
-    session_key = property(__get_session_key, __set_session_key)
+    def changes(
+        self, since: Optional[Changes] = None, keys: Iterable[str] = ()
+    ) -> Changes:
+        """Return the keys changed since the model was last loaded or saved
 
-    def __setitem__(self, key, value):
-        setattr(self, key, value)
-        self.__variables_names.add(key)
+        Values are compared by digest, so reassigning an identical value is not
+        a change while mutating a list or dict in place is. Given `since`, only
+        `keys`, set after it was taken, are digested again.
+        """
+        if since is None:
+            digests = {key: value_digest(value) for key, value in self._data.items()}
+        else:
+            digests = dict(since.digests)
+            for key in keys:
+                if key in self._data:
+                    digests[key] = value_digest(self._data[key])
+                else:
+                    digests.pop(key, None)
+        clean = self._digests
+        return Changes(
+            frozenset(key for key, digest in digests.items() if clean.get(key) != digest),
+            frozenset(clean.keys() - digests.keys()),
+            digests,
+        )
 
-    def __delitem__(self, key):
-        self.__variables_names.remove(key)
-        delattr(self, key)
+    @property
+    def dirty_keys(self) -> FrozenSet[str]:
+        """Keys whose value differs from the last loaded or saved one"""
+        return self.changes().dirty_keys
 
-    def __iter__(self):
-        return iter(self.__variables_names)
+    @property
+    def removed_keys(self) -> FrozenSet[str]:
+        """Keys deleted since the model was last loaded or saved"""
+        return frozenset(self._digests.keys() - self._data.keys())
 
-    def __is_empty(self) -> bool:
-        return len(self.__variables_names) == 0
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.removed_keys or self.dirty_keys)
 
-    is_empty = property(__is_empty)
+    @property
+    def is_persisted(self) -> bool:
+        """True if the model mirrors an item which exists in DynamoDB"""
+        return self._persisted
 
-    def get(self, key, default=...) -> Any:
+    @property
+    def is_partial(self) -> bool:
+        """True if some keys of the stored item were not loaded yet"""
+        return False
+
+    def complete(self) -> None:
+        """Load the keys which were not loaded yet, see `PartialSessionDataModel`"""
+
+    def mark_clean(
+        self, persisted: bool = True, changes: Optional[Changes] = None
+    ) -> None:
+        """Forget tracked changes, the model now mirrors the stored item
+
+        With persisted=False the stored item cannot be updated in place and
+        the next save rewrites it as a whole. `changes`, taken since the last
+        change of the model, spares digesting every value again.
+        """
+        if changes is not None:
+            self._digests = dict(changes.digests)
+        else:
+            self._digests = {
+                key: value_digest(value) for key, value in self._data.items()
+            }
+        self._persisted = persisted
+
+    def get(self, key, default=None) -> Any:
         try:
             return self[key]
-        except AttributeError:
-            if default is Ellipsis:
-                raise
+        except KeyError:
             return default
 
     def pop(self, key, default=...) -> Any:
         try:
-            ret = self[key]
-            del self[key]
-            return ret
-        except AttributeError:
+            return self._data.pop(key)
+        except KeyError:
             if default is Ellipsis:
-                raise
+                if key in self.NOTFOUND_ALLOW_LIST:
+                    raise KeyError(key) from None
+                raise SessionDataKeyError(key) from None
             return default
 
-    def items(self):
-        for key in self.__variables_names:
-            yield (key, self[key])
+    def keys(self) -> KeysView:
+        return self._data.keys()
+
+    def values(self) -> ValuesView:
+        return self._data.values()
+
+    def items(self) -> ItemsView:
+        return self._data.items()
 
     def __str__(self) -> str:
-        data = {}
-        for key in self.__variables_names:
-            data[key] = getattr(self, key)
+        return json.dumps(self._data)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._data!r})"
+
+
+class PartialSessionDataModel(SessionDataModel):
+    """Session data of which only some keys were read from DynamoDB
+
+    `loaded_keys` were fetched (present or not), the other keys are fetched
+    by `loader` the first time one of them, or the whole mapping, is read.
+    Setting a key never loads the rest: the update only writes dirty keys.
+    """
+
+    __slots__ = ("_loaded_keys", "_loader")
+
+    def __init__(
+        self,
+        session_key: Optional[str] = None,
+        partition_key_name: Optional[str] = None,
+        loaded_keys: Iterable[str] = (),
+        loader: Optional[Callable[[], Optional[SessionDataModel]]] = None,
+    ) -> None:
+        super().__init__(session_key, partition_key_name)
+        self._loaded_keys = frozenset(loaded_keys) | {self._pk}
+        self._loader = loader
+
+    @property
+    def is_partial(self) -> bool:
+        return self._loader is not None
+
+    def _needs(self, key: Any) -> bool:
+        return (
+            self._loader is not None
+            and key not in self._data
+            and key not in self._loaded_keys
+        )
+
+    def complete(self) -> None:
+        """Fetch the keys which were not loaded yet
+
+        Keys set or deleted since the partial load keep their local value.
+        """
+        loader, self._loader = self._loader, None
+        if loader is None:
+            return
+
+        try:
+            full = loader()
+        except BaseException:
+            # still partial, the next access tries again
+            self._loader = loader
+            raise
+        if full is None:
+            # the item vanished meanwhile, what was loaded is all there is
+            return
+
+        for key, value in full._data.items():
+            if key in self._loaded_keys:
+                continue
+            if key not in self._data:
+                self._data[key] = value
+            self._digests[key] = full._digests[key]
+        self._persisted = self._persisted and full.is_persisted
+
+    def __getitem__(self, key) -> Any:
+        if self._needs(key):
+            self.complete()
+        return super().__getitem__(key)
+
+    def __delitem__(self, key) -> None:
+        if self._needs(key):
+            self.complete()
+        super().__delitem__(key)
+
+    def __contains__(self, key) -> bool:
+        if self._needs(key):
+            self.complete()
+        return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        self.complete()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self.complete()
+        return super().__len__()
+
+    def __getattr__(self, name: str) -> Any:
+        if not name.startswith("__") and name not in _INTERNAL_ATTRIBUTES:
+            if self._needs(name):
+                self.complete()
+        return super().__getattr__(name)
+
+    def pop(self, key, default=...) -> Any:
+        if self._needs(key):
+            self.complete()
+        return super().pop(key, default)
+
+    def keys(self) -> KeysView:
+        self.complete()
+        return super().keys()
+
+    def values(self) -> ValuesView:
+        self.complete()
+        return super().values()
+
+    def items(self) -> ItemsView:
+        self.complete()
+        return super().items()
+
+    def __str__(self) -> str:
+        self.complete()
+        return super().__str__()
+
 
-        return json.dumps(data)
+_INTERNAL_ATTRIBUTES = frozenset(
+    SessionDataModel.__slots__ + PartialSessionDataModel.__slots__
+)
@@ -0,0 +1,40 @@
+from functools import wraps
+from typing import Callable
+
+
+def partial_session_load(*keys: str) -> Callable:
+    """Load only `keys` of the session first in this view, the rest on first use
+
+    Without keys, `DYSESSION["PARTIAL_LOAD"]["HOT_KEYS"]` are loaded first.
+    Requires `dysession.middleware.SessionMiddleware`.
+
+    ```
+    @partial_session_load()
+    def whoami(request):
+        return JsonResponse({"user": request.user.pk})
+    ```
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            return view_func(*args, **kwargs)
+
+        wrapper.dysession_hot_keys = tuple(keys) or True
+        return wrapper
+
+    return decorator
+
+
+def full_session_load(view_func: Callable) -> Callable:
+    """Always load the whole session in this view, whatever `PARTIAL_LOAD["PATHS"]` says"""
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        return view_func(*args, **kwargs)
+
+    wrapper.dysession_hot_keys = False
+    return wrapper
+
+
+__all__ = ["partial_session_load", "full_session_load"]
@@ -1,12 +1,26 @@
+import atexit
 import logging
 import sys
 from enum import Enum, auto
 from functools import lru_cache
-from typing import Literal
+from logging.handlers import QueueListener
+from queue import Queue
+from typing import List, Literal
 
-from dysession.settings import get_config
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from dysession.settings import get_settings
 
 from .handler.colorful_console import ColorfulConsoleLoggerHandler
+from .handler.dropping_queue import DroppingQueueHandler
+
+FORMATTER = logging.Formatter(
+    "[%(asctime)-s] [%(levelname)-8s] %(name)s %(message)s ... ( %(filename)s:%(levelno)s )"
+)
+
+# Listeners of the `LOGGING["QUEUE"]` pipelines, stopped (and drained) at exit
+_listeners: List[QueueListener] = []
 
 
 class LoggingType(Enum):
@@ -41,11 +55,14 @@ def get_logger(
     logger.critical("This is a CRITICAL log.")
     logger.fatal("This is a FATAL log.")
     ```
+
+    Loggers are built once per arguments. With `LOGGING["QUEUE"]`, records
+    are handed to a bounded queue and written by a background thread.
     """
 
     if logger_type is None:
         try:
-            logger_type = LoggingType[get_config()["LOGGING"]["TYPE"]]
+            logger_type = LoggingType[get_settings().logging["TYPE"]]
             if (
                 logger_type == LoggingType.PLAINTEXT_CONSOLE
                 or logger_type == LoggingType.COLOR_CONSOLE
@@ -54,10 +71,14 @@ def get_logger(
         except KeyError:
             raise KeyError("logger_type only accept 'CONSOLE' and 'FILE'")
 
+    return _get_logger(logger_name, logger_type, level)
+
+
+@lru_cache
+def _get_logger(
+    logger_name: str, logger_type: LoggingType, level: int
+) -> logging.Logger:
     logger = logging.getLogger(logger_name)
-    format = logging.Formatter(
-        "[%(asctime)-s] [%(levelname)-8s] %(name)s %(message)s ... ( %(filename)s:%(levelno)s )"
-    )
     logger.setLevel(level)
 
     if not logger.handlers:
@@ -67,10 +88,13 @@ def get_logger(
             else:
                 handler = logging.StreamHandler()
         elif logger_type == LoggingType.FILE:
-            filepath = get_config()["LOGGING"].get("FILE_PATH", "session.log")
+            filepath = get_settings().logging["FILE_PATH"]
             handler = logging.FileHandler(filepath, "a", encoding="utf-8")
 
-        handler.setFormatter(format)
+        handler.setFormatter(FORMATTER)
+        options = get_settings().logging
+        if options["QUEUE"]:
+            handler = _queue_handler(handler, options["QUEUE_SIZE"])
         logger.addHandler(handler)
     else:
         logger.warning(
@@ -80,7 +104,31 @@ def get_logger(
     return logger
 
 
+def _queue_handler(handler: logging.Handler, size: int) -> DroppingQueueHandler:
+    """Move the I/O of handler to a background thread fed by a bounded queue"""
+    records = Queue(maxsize=size)
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    if not _listeners:
+        atexit.register(stop_listeners)
+    _listeners.append(listener)
+    return DroppingQueueHandler(records)
+
+
+def stop_listeners() -> None:
+    """Write the queued records and stop the `LOGGING["QUEUE"]` threads"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+@receiver(setting_changed)
+def update_logger(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        _get_logger.cache_clear()  # pragma: no cover
+
+
 __all__ = (
     LoggingType,
     get_logger,
+    stop_listeners,
 )
@@ -0,0 +1,19 @@
+from logging.handlers import QueueHandler
+from queue import Full, Queue
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    A QueueHandler which drops records instead of blocking, or printing a
+    traceback, when its bounded queue is full
+    """
+
+    def __init__(self, queue: Queue) -> None:
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
@@ -0,0 +1,104 @@
+"""
+Sampled and aggregated logging of routine session misses.
+
+A missing or expired session is routine in production (stale cookies, bots,
+expired logins). Each of them is logged with a probability of
+`LOGGING["SAMPLE_RATE"]`, and with `LOGGING["SUMMARY_INTERVAL"]` their counts
+are logged once per interval instead:
+
+```
+[...] [INFO    ] dysession 12 expired, 40 missing sessions in the last 60s
+```
+
+The summary is written by the first miss after the interval is over, there is
+no timer thread. Unexpected errors are not sampled.
+"""
+
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from dysession.logger import get_logger
+from dysession.settings import get_settings
+
+MISSING = "missing"
+EXPIRED = "expired"
+
+
+class MissLog:
+    """Thread-safe sampler and counter of missing and expired session events"""
+
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        summary_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.summary_interval = summary_interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {EXPIRED: 0, MISSING: 0}
+        self._since = clock()
+
+    def missing(self, session_key: str, table_name: str) -> None:
+        self._record(
+            MISSING, "'%s' cannot be found on table '%s'.", session_key, table_name
+        )
+
+    def expired(self, session_key: str) -> None:
+        self._record(EXPIRED, "'%s' is expired .", session_key)
+
+    def _record(self, kind: str, message: str, *args) -> None:
+        if self.summary_interval is not None:
+            with self._lock:
+                self._counts[kind] += 1
+            self.summarize(force=False)
+
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            # args are only formatted when the record is handled
+            get_logger().error(message, *args)
+
+    def summarize(self, force: bool = True) -> Optional[str]:
+        """Log and reset the counts, unless the interval is not over and not force"""
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._since
+            if not force and elapsed < self.summary_interval:
+                return None
+            counts, self._counts = self._counts, {EXPIRED: 0, MISSING: 0}
+            self._since = now
+
+        if not any(counts.values()):
+            return None
+        summary = (
+            f"{counts[EXPIRED]} expired, {counts[MISSING]} missing sessions "
+            f"in the last {elapsed:.0f}s"
+        )
+        get_logger().info(summary)
+        return summary
+
+
+@lru_cache
+def get_miss_log() -> MissLog:
+    """Return the process-wide `MissLog` configured by `DYSESSION["LOGGING"]`"""
+    options = get_settings().logging
+    return MissLog(
+        sample_rate=options["SAMPLE_RATE"],
+        summary_interval=options["SUMMARY_INTERVAL"],
+    )
+
+
+@receiver(setting_changed)
+def update_miss_log(*, setting, **kwargs):
+    if setting == "DYSESSION":  # pragma: no cover
+        get_miss_log.cache_clear()  # pragma: no cover
+
+
+__all__ = ["MissLog", "get_miss_log"]
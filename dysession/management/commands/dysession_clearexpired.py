@@ -0,0 +1,88 @@
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from dysession.aws.client import get_maintenance_client
+from dysession.aws.maintenance import clear_expired_sessions
+from dysession.settings import get_settings
+
+from ._arg_types import positive_int
+
+__all__ = ["Command"]
+
+
+class Command(BaseCommand):
+
+    help = "Delete expired session records which DynamoDB's TTL has not removed yet"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        config = get_settings()
+        options = config.clear_expired
+        parser.add_argument(
+            "-n",
+            "--table",
+            type=str,
+            default=config.table_name,
+            help="<Opitonal> DynamoDB table to clean up.",
+            required=False,
+        )
+        parser.add_argument(
+            "--region",
+            type=str,
+            default=config.region,
+            help="<Opitonal> Region of the DynamoDB table.",
+            required=False,
+        )
+        parser.add_argument(
+            "--segments",
+            type=positive_int,
+            default=options["SEGMENTS"],
+            help="<Opitonal> Number of Scan segments read in parallel.",
+            required=False,
+        )
+        parser.add_argument(
+            "--rcu",
+            type=positive_int,
+            default=options["READ_CAPACITY"],
+            help="<Opitonal> Maximum read capacity units consumed per second.",
+            required=False,
+        )
+        parser.add_argument(
+            "--wcu",
+            type=positive_int,
+            default=options["WRITE_CAPACITY"],
+            help="<Opitonal> Maximum write capacity units consumed per second.",
+            required=False,
+        )
+        parser.add_argument(
+            "--page-size",
+            type=positive_int,
+            default=None,
+            help="<Opitonal> Maximum number of items evaluated per Scan request.",
+            required=False,
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="<Opitonal> JSON file to resume an interrupted run from.",
+            required=False,
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        def progress(expired: int, deleted: int) -> None:
+            if options["verbosity"] > 1:
+                self.stdout.write(f"expired: {expired}, deleted: {deleted}")
+
+        deleted = clear_expired_sessions(
+            table_name=options["table"],
+            client=get_maintenance_client(region_name=options["region"]),
+            total_segments=options["segments"],
+            read_capacity=options["rcu"],
+            write_capacity=options["wcu"],
+            checkpoint_path=options["checkpoint"],
+            progress=progress,
+            page_size=options["page_size"],
+        )
+        self.stdout.write(f"{deleted} expired sessions deleted.")
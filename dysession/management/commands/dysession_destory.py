@@ -3,7 +3,7 @@ from typing import Any, Optional
 from django.core.management.base import BaseCommand, CommandParser
 from dysession.aws.dynamodb import destory_dynamodb_table
 
-from dysession.settings import get_config
+from dysession.settings import get_settings
 
 
 __all__ = ["Command"]
@@ -14,19 +14,19 @@ class Command(BaseCommand):
     help = "Clear all session record which stored in DynamoDB"
 
     def add_arguments(self, parser: CommandParser) -> None:
-        config = get_config()
+        config = get_settings()
         parser.add_argument(
             "-n",
             "--table",
             type=str,
-            default=config["DYNAMODB_TABLENAME"],
+            default=config.table_name,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
         parser.add_argument(
             "--region",
             type=str,
-            default=config["DYNAMODB_REGION"],
+            default=config.region,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
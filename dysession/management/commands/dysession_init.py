@@ -4,9 +4,9 @@ import boto3
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandParser
 
-from dysession.aws.dynamodb import create_dynamodb_table
+from dysession.aws.dynamodb import create_dynamodb_table, enable_time_to_live
 from dysession.logger import get_logger
-from dysession.settings import get_config
+from dysession.settings import get_settings
 
 from ._arg_types import positive_int
 
@@ -18,47 +18,40 @@ class Command(BaseCommand):
     help = "Clear all session record which stored in DynamoDB"
 
     def add_arguments(self, parser: CommandParser) -> None:
-        config = get_config()
+        config = get_settings()
         parser.add_argument(
             "-n",
             "--table",
             type=str,
-            default=config["DYNAMODB_TABLENAME"],
+            default=config.table_name,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
         parser.add_argument(
             "--pk",
             action="append",
-            default=config["PARTITION_KEY_NAME"],
-            help="<Opitonal> Indicate to clear specified user's session data.",
-            required=False,
-        )
-        parser.add_argument(
-            "--sk",
-            type=str,
-            default=config["SORT_KEY_NAME"],
+            default=config.partition_key_name,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
         parser.add_argument(
             "--ttl",
             type=str,
-            default=config["TTL_ATTRIBUTE_NAME"],
+            default=config.ttl_attribute_name,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
         parser.add_argument(
             "--region",
             type=str,
-            default=config["DYNAMODB_REGION"],
+            default=config.region,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
         parser.add_argument(
             "--period",
             type=positive_int,
-            default=config["CACHE_PERIOD"],
+            default=config.cache_period,
             help="<Opitonal> Indicate to clear specified user's session data.",
             required=False,
         )
@@ -68,4 +61,5 @@ class Command(BaseCommand):
         logger = get_logger()
         logger.info("Start command: initialize dynamodb table")
         create_dynamodb_table(options=options)
+        enable_time_to_live(options=options)
         logger.info("End of command: dynamodb table created successfully!")
@@ -0,0 +1,100 @@
+import json
+from typing import Any, Dict, Optional
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from dysession.aws.client import get_maintenance_client
+from dysession.aws.stats import DEFAULT_SEGMENTS, collect_table_stats
+from dysession.settings import get_settings
+
+from ._arg_types import positive_int
+
+__all__ = ["Command"]
+
+
+class Command(BaseCommand):
+
+    help = "Scan the session table and report item sizes, TTLs and capacity estimates"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        config = get_settings()
+        parser.add_argument(
+            "-n",
+            "--table",
+            type=str,
+            default=config.table_name,
+            help="<Opitonal> DynamoDB table to analyze.",
+            required=False,
+        )
+        parser.add_argument(
+            "--region",
+            type=str,
+            default=config.region,
+            help="<Opitonal> Region of the DynamoDB table.",
+            required=False,
+        )
+        parser.add_argument(
+            "--segments",
+            type=positive_int,
+            default=DEFAULT_SEGMENTS,
+            help="<Opitonal> Number of Scan segments read in parallel.",
+            required=False,
+        )
+        parser.add_argument(
+            "--rcu",
+            type=positive_int,
+            default=None,
+            help="<Opitonal> Maximum read capacity units consumed per second.",
+            required=False,
+        )
+        parser.add_argument(
+            "--page-size",
+            type=positive_int,
+            default=None,
+            help="<Opitonal> Maximum number of items evaluated per Scan request.",
+            required=False,
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="<Opitonal> Print the statistics as JSON.",
+        )
+        return super().add_arguments(parser)
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        stats = collect_table_stats(
+            table_name=options["table"],
+            client=get_maintenance_client(region_name=options["region"]),
+            total_segments=options["segments"],
+            read_capacity=options["rcu"],
+            page_size=options["page_size"],
+        )
+        summary = stats.summary()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write(f"Items:             {summary['items']}")
+        self.stdout.write(f"Total size:        {summary['total_bytes']} bytes")
+        self.stdout.write(f"Average item size: {summary['average_bytes']:.1f} bytes")
+        self.stdout.write(f"Largest item:      {summary['max_bytes']} bytes")
+        self.stdout.write(
+            f"Expired:           {summary['expired']} ({summary['expired_ratio']:.1%})"
+        )
+        self.stdout.write(f"Without TTL:       {summary['without_ttl']}")
+        self.write_histogram("Item size (bytes)", summary["size_histogram"])
+        self.write_histogram("TTL remaining (seconds)", summary["ttl_histogram"])
+        self.write_histogram("Age since last write (seconds)", summary["age_histogram"])
+        self.write_histogram("Attributes", summary["attributes"])
+
+        capacity = summary["capacity"]
+        self.stdout.write("Capacity estimate")
+        self.stdout.write(f"  RCU per load:    {capacity['rcu_per_load']:.2f}")
+        self.stdout.write(f"  WCU per save:    {capacity['wcu_per_save']:.2f}")
+        self.stdout.write(f"  RCU full scan:   {capacity['rcu_full_scan']:.1f}")
+
+    def write_histogram(self, title: str, histogram: Dict[str, int]) -> None:
+        self.stdout.write(title)
+        for label, count in histogram.items():
+            self.stdout.write(f"  {label:>12} {count}")
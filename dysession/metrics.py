@@ -0,0 +1,254 @@
+"""
+In-process metrics of the DynamoDB session operations.
+
+Every operation made through `dysession.aws.dynamodb`, `dysession.aws.aio` and
+their `DynamoDB` / `AsyncDynamoDB` classes is counted and timed, labelled by
+operation, table and outcome. Low-level DynamoDB calls are named after the API
+(``GetItem``, ``PutItem`` ...), session level calls after the backend method
+(``load``, ``save``, ``exists``, ``delete``, and ``flush`` for the write-behind
+batches).
+
+Outcomes:
+
+* ``ok``: the call succeeded.
+* ``hit`` / ``miss``: the session was found or not.
+* ``cache_hit``: the session was served by the local cache.
+* ``expired``: the session was found but is expired.
+* ``skipped``: a save was elided because nothing changed.
+* ``queued``: a save or delete was queued for write-behind.
+* ``backpressure``: the write-behind queue was full, the save was written through.
+* ``degraded``: the circuit breaker is open, the call was not sent (for the
+  ``circuit`` series: ``open``, ``half_open`` and ``closed`` count the state changes).
+* ``conflict``: a conditional write was rejected.
+* ``throttled``: DynamoDB throttled the request.
+* ``error``: any other exception.
+
+```
+from dysession.metrics import get_registry
+
+get_registry().snapshot()
+get_registry().render_text()  # Prometheus text exposition format
+```
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from dysession.aws.error import DynamodbItemNotFound
+from dysession.backends.error import (
+    SessionExpired,
+    SessionKeyDoesNotExist,
+    SessionKeyDuplicated,
+    SessionUnavailable,
+)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+THROTTLING_ERROR_CODES = frozenset(
+    (
+        "ProvisionedThroughputExceededException",
+        "ThrottlingException",
+        "RequestLimitExceeded",
+    )
+)
+
+SeriesKey = Tuple[str, str, str]
+
+
+def classify(exc: BaseException) -> str:
+    """Return the outcome label of an exception raised by an operation"""
+    if isinstance(exc, SessionUnavailable):
+        return "degraded"
+    if isinstance(exc, (DynamodbItemNotFound, SessionKeyDoesNotExist)):
+        return "miss"
+    if isinstance(exc, SessionExpired):
+        return "expired"
+    if isinstance(exc, SessionKeyDuplicated):
+        return "conflict"
+    if isinstance(exc, ClientError):
+        code = exc.response.get("Error", {}).get("Code")
+        if code in THROTTLING_ERROR_CODES:
+            return "throttled"
+        if code == "ConditionalCheckFailedException":
+            return "conflict"
+    return "error"
+
+
+class _Series:
+    """Counter and latency histogram of one (operation, table, outcome)"""
+
+    __slots__ = ("lock", "count", "total", "buckets")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.buckets[index] += 1
+
+
+class MetricsRegistry:
+    """Thread safe registry of operation series
+
+    Each series has its own lock, held for a few increments, so concurrent
+    requests only contend when they record the very same series.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._series: Dict[SeriesKey, _Series] = {}
+
+    def _get_series(self, key: SeriesKey) -> _Series:
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, _Series())
+        return series
+
+    def observe(self, operation: str, table: str, outcome: str, seconds: float) -> None:
+        self._get_series((operation, table, outcome)).observe(seconds)
+
+    def track(self, operation: str, table: Optional[str]) -> "OperationTimer":
+        """Return a context manager timing one operation
+
+        The outcome is ``ok`` unless it is set on the timer or the block raises,
+        in which case it is derived from the exception by `classify`.
+        """
+        return OperationTimer(self, operation, table or "")
+
+    def count(
+        self,
+        operation: Optional[str] = None,
+        table: Optional[str] = None,
+        outcome: Optional[str] = None,
+    ) -> int:
+        """Return the number of operations matching every given label"""
+        return sum(
+            series.count
+            for (series_operation, series_table, series_outcome), series in list(
+                self._series.items()
+            )
+            if operation in (None, series_operation)
+            and table in (None, series_table)
+            and outcome in (None, series_outcome)
+        )
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return a copy of every series, sorted by labels"""
+        result = []
+        for (operation, table, outcome), series in sorted(list(self._series.items())):
+            with series.lock:
+                result.append(
+                    {
+                        "operation": operation,
+                        "table": table,
+                        "outcome": outcome,
+                        "count": series.count,
+                        "sum": series.total,
+                        "buckets": dict(
+                            zip(LATENCY_BUCKETS + (float("inf"),), series.buckets)
+                        ),
+                    }
+                )
+        return result
+
+    def render_text(self) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP dysession_operations_total Session operations by outcome.",
+            "# TYPE dysession_operations_total counter",
+        ]
+        snapshot = self.snapshot()
+        for series in snapshot:
+            lines.append(f"dysession_operations_total{{{_labels(series)}}} {series['count']}")
+
+        lines.extend(
+            [
+                "# HELP dysession_operation_duration_seconds Session operation latency.",
+                "# TYPE dysession_operation_duration_seconds histogram",
+            ]
+        )
+        for series in snapshot:
+            labels = _labels(series)
+            cumulative = 0
+            for bound, count in series["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'dysession_operation_duration_seconds_bucket{{{labels},le="{le}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(f"dysession_operation_duration_seconds_sum{{{labels}}} {series['sum']}")
+            lines.append(
+                f"dysession_operation_duration_seconds_count{{{labels}}} {series['count']}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(series: Dict[str, Any]) -> str:
+    return ",".join(
+        f'{name}="{_escape(series[name])}"' for name in ("operation", "table", "outcome")
+    )
+
+
+class OperationTimer:
+    __slots__ = ("registry", "operation", "table", "outcome", "start")
+
+    def __init__(self, registry: MetricsRegistry, operation: str, table: str) -> None:
+        self.registry = registry
+        self.operation = operation
+        self.table = table
+        self.outcome = "ok"
+
+    def __enter__(self) -> "OperationTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        outcome = self.outcome if exc is None else classify(exc)
+        self.registry.observe(
+            self.operation, self.table, outcome, time.perf_counter() - self.start
+        )
+        return False
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry"""
+    return _registry
+
+
+def track(operation: str, table: Optional[str]) -> OperationTimer:
+    """Time an operation on the process-wide registry, see `MetricsRegistry.track`"""
+    return _registry.track(operation, table)
+
+
+__all__ = [
+    "LATENCY_BUCKETS",
+    "MetricsRegistry",
+    "OperationTimer",
+    "classify",
+    "get_registry",
+    "track",
+]
@@ -1,10 +1,103 @@
+import asyncio
+import math
+
 from django.conf import settings
 from django.contrib.sessions.middleware import SessionMiddleware as DjSessionMiddleware
+from django.http import HttpResponse
+
+from dysession.aws.capacity import (
+    ConsumedCapacity,
+    capacity_scope,
+    get_ledger,
+    request_capacity_consumed,
+)
+from dysession.aws.circuit import get_breaker
+from dysession.backends.error import SessionUnavailable
+from dysession.logger import get_logger
+from dysession.settings import get_settings
+
+UNRESOLVED_ENDPOINT = "<unresolved>"
 
 
 class SessionMiddleware(DjSessionMiddleware):
+    def __call__(self, request):
+        with capacity_scope() as capacity:
+            response = super().__call__(request)
+        if asyncio.iscoroutine(response):
+            # async mode, the coroutine is __acall__ which opens its own scope
+            return response
+        self.account_capacity(request, capacity)
+        return response
+
+    async def __acall__(self, request):
+        with capacity_scope() as capacity:
+            response = await super().__acall__(request)
+        self.account_capacity(request, capacity)
+        return response
+
     def process_request(self, request):
         # SESSION_COOKIE_NAME can be change by developers
         # https://docs.djangoproject.com/en/3.2/ref/settings/#session-cookie-name
         session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        # SessionStore is lazy: DynamoDB is only queried when the view touches
+        # request.session, and `request.session.accessed` tells if it ever did.
         request.session = self.SessionStore(session_key=session_key)
+        if hasattr(request.session, "hot_keys"):
+            request.session.hot_keys = get_settings().partial_load_keys(
+                request.path_info
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # set by the `dysession.decorators` decorators, the session is still
+        # unloaded unless an earlier middleware touched it
+        policy = getattr(view_func, "dysession_hot_keys", None)
+        if policy is None or not hasattr(request.session, "hot_keys"):
+            return None
+        if policy is True:
+            policy = tuple(get_settings().partial_load["HOT_KEYS"])
+        request.session.hot_keys = policy or None
+        return None
+
+    def process_exception(self, request, exception):
+        # e.g. login() cannot create the new session while the circuit
+        # breaker is open, answer 503 rather than fail with a 500
+        if not isinstance(exception, SessionUnavailable):
+            return None
+        get_logger().warning(
+            f"Refused {request.method} {request.path}, DynamoDB is unavailable."
+        )
+        return self.unavailable()
+
+    def process_response(self, request, response):
+        try:
+            return super().process_response(request, response)
+        except SessionUnavailable:
+            # a new session cannot be created while the circuit breaker is
+            # open, the response is sent without its cookie
+            get_logger().warning(
+                f"Did not save the session of {request.method} {request.path}, "
+                "DynamoDB is unavailable."
+            )
+            return response
+
+    def unavailable(self) -> HttpResponse:
+        response = HttpResponse("Service Unavailable", status=503)
+        breaker = get_breaker()
+        if breaker is not None:
+            response["Retry-After"] = str(math.ceil(breaker.reset_timeout))
+        return response
+
+    def account_capacity(self, request, capacity: ConsumedCapacity) -> None:
+        """Charge the capacity consumed by the request to its endpoint"""
+        if not capacity.calls:
+            return
+
+        # View names keep the number of endpoints bounded, unlike paths
+        match = getattr(request, "resolver_match", None)
+        endpoint = (match.view_name if match else None) or UNRESOLVED_ENDPOINT
+
+        request.dysession_capacity = capacity
+        get_ledger().record_endpoint(endpoint, capacity)
+        request_capacity_consumed.send(
+            sender=self.__class__, request=request, endpoint=endpoint, capacity=capacity
+        )
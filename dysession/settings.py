@@ -1,40 +1,155 @@
+import re
+from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import Dict, Union
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Pattern, Tuple, Union
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.dispatch import receiver
 from django.test.signals import setting_changed
 
 DEFAULT_CONFIG = {
     "DYNAMODB_TABLENAME": "sessions",
     "PARTITION_KEY_NAME": "PK",
-    "SORT_KEY_NAME": "SK",
     "TTL_ATTRIBUTE_NAME": "ttl",
     "CACHE_PERIOD": 3600,
+    "TTL_REFRESH_FRACTION": 0.5,
     "DYNAMODB_REGION": "ap-northeast-1",
+    "DYNAMODB_PROFILE": None,
+    "CLIENT": {
+        "MAX_POOL_CONNECTIONS": 10,
+        "CONNECT_TIMEOUT": 1,
+        "READ_TIMEOUT": 2,
+        "TCP_KEEPALIVE": True,
+        "RETRY_MODE": "standard",
+        "MAX_ATTEMPTS": 3,
+        "ENDPOINT_URL": None,
+    },
     "LOGGING": {
         "TYPE": "CONSOLE",
+        "FILE_PATH": "session.log",
+        "QUEUE": False,
+        "QUEUE_SIZE": 10000,
+        "SAMPLE_RATE": 1.0,
+        "SUMMARY_INTERVAL": None,
+    },
+    "LOCAL_CACHE": {
+        "ENABLED": False,
+        "TTL": 5,
+        "MAX_ENTRIES": 10000,
+        "MAX_BYTES": 64 * 1024 * 1024,
+        "SHARDS": 16,
+        "POLICY": "LRU",
+    },
+    "ENCODING": {
+        "FORMAT": "ATTRIBUTES",
+        "COMPRESSION": "zlib",
+        "COMPRESS_THRESHOLD": 1024,
+    },
+    "CLEAR_EXPIRED": {
+        "SEGMENTS": 4,
+        "READ_CAPACITY": None,
+        "WRITE_CAPACITY": None,
+    },
+    "PARTIAL_LOAD": {
+        "ENABLED": False,
+        "HOT_KEYS": ["_auth_user_id", "_auth_user_backend", "_auth_user_hash"],
+        "PATHS": [],
+    },
+    "ROUTING": {
+        "REGIONS": [],
+        "PREFERRED_REGION": None,
+        "COOLDOWN": 30,
+        "UNHEALTHY_SCORE": 0.5,
+    },
+    "WRITE_BEHIND": {
+        "ENABLED": False,
+        "MAX_ENTRIES": 10000,
+        "FLUSH_INTERVAL": 0.05,
+        "BLOCK_TIMEOUT": 1.0,
+        "MAX_ATTEMPTS": 3,
+        "SHUTDOWN_TIMEOUT": 10.0,
+    },
+    "CIRCUIT_BREAKER": {
+        "ENABLED": False,
+        "FAILURE_THRESHOLD": 5,
+        "RESET_TIMEOUT": 10,
+        "READ_DEADLINE": 0.5,
+        "WRITE_DEADLINE": 1.0,
+        "WRITE_POLICY": "QUEUE",
     },
 }
 
 
 @lru_cache
-def get_config() -> Dict[str, Union[str, int]]:
+def get_config() -> Dict[str, Union[str, int, None]]:
     """Return cached django-dysession config in dictionary type
 
     Contain Items:
         * DYNAMODB_TABLENAME
         * PARTITION_KEY_NAME
-        * SORT_KEY_NAME
         * TTL_ATTRIBUTE_NAME
         * CACHE_PERIOD
+        * TTL_REFRESH_FRACTION
         * DYNAMODB_REGION
+        * DYNAMODB_PROFILE
+        * CLIENT
+            * MAX_POOL_CONNECTIONS
+            * CONNECT_TIMEOUT
+            * READ_TIMEOUT
+            * TCP_KEEPALIVE
+            * RETRY_MODE
+            * MAX_ATTEMPTS
+            * ENDPOINT_URL
         * LOGGING
             * TYPE
             * FILE_PATH
+            * QUEUE
+            * QUEUE_SIZE
+            * SAMPLE_RATE
+            * SUMMARY_INTERVAL
+        * LOCAL_CACHE
+            * ENABLED
+            * TTL
+            * MAX_ENTRIES
+            * MAX_BYTES
+            * SHARDS
+            * POLICY
+        * ENCODING
+            * FORMAT
+            * COMPRESSION
+            * COMPRESS_THRESHOLD
+        * CLEAR_EXPIRED
+            * SEGMENTS
+            * READ_CAPACITY
+            * WRITE_CAPACITY
+        * PARTIAL_LOAD
+            * ENABLED
+            * HOT_KEYS
+            * PATHS
+        * ROUTING
+            * REGIONS
+            * PREFERRED_REGION
+            * COOLDOWN
+            * UNHEALTHY_SCORE
+        * WRITE_BEHIND
+            * ENABLED
+            * MAX_ENTRIES
+            * FLUSH_INTERVAL
+            * BLOCK_TIMEOUT
+            * MAX_ATTEMPTS
+            * SHUTDOWN_TIMEOUT
+        * CIRCUIT_BREAKER
+            * ENABLED
+            * FAILURE_THRESHOLD
+            * RESET_TIMEOUT
+            * READ_DEADLINE
+            * WRITE_DEADLINE
+            * WRITE_POLICY
 
     Returns:
-        Dict[str, Union[str, int]]
+        Dict[str, Union[str, int, None]]
     """
     config = DEFAULT_CONFIG.copy()
     custom_config = getattr(settings, "DYSESSION", {})
@@ -42,10 +157,343 @@ def get_config() -> Dict[str, Union[str, int]]:
     return config
 
 
+_TABLE_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9_.-]{3,255}$")
+
+
+def _check(condition: bool, message: str) -> None:
+    if not condition:
+        raise ImproperlyConfigured(f"DYSESSION: {message}")
+
+
+def _is_positive_int(value: Any) -> bool:
+    return type(value) is int and value > 0
+
+
+def _is_positive_number(value: Any) -> bool:
+    return type(value) in (int, float) and value > 0
+
+
+def _is_attribute_name(value: Any) -> bool:
+    return isinstance(value, str) and 0 < len(value.encode()) <= 255
+
+
+def _section(config: Dict, name: str) -> Mapping[str, Any]:
+    # Nested dicts are merged with their defaults, unlike get_config()
+    value = config.get(name)
+    if value is None:
+        value = {}
+    _check(isinstance(value, dict), f"{name} should be a dict.")
+    return MappingProxyType({**DEFAULT_CONFIG[name], **value})
+
+
+@dataclass(frozen=True)
+class DysessionSettings:
+    """Validated, immutable snapshot of the django-dysession settings
+
+    Built once by `get_settings()` and handed to the DynamoDB layer, so the
+    request path reads attributes instead of looking up `get_config()`.
+    """
+
+    table_name: str
+    partition_key_name: str
+    ttl_attribute_name: str
+    cache_period: int
+    ttl_refresh_fraction: float
+    region: str
+    profile: Optional[str]
+    client: Mapping[str, Any]
+    logging: Mapping[str, Any]
+    local_cache: Mapping[str, Any]
+    encoding: Mapping[str, Any]
+    clear_expired: Mapping[str, Any]
+    partial_load: Mapping[str, Any]
+    routing: Mapping[str, Any]
+    write_behind: Mapping[str, Any]
+    circuit_breaker: Mapping[str, Any]
+    # PARTIAL_LOAD["PATHS"], compiled
+    partial_load_paths: Tuple[Pattern, ...] = ()
+
+    # Expressions shared by every request, "#pk" / "#ttl" are bound by pk_names()
+    key_only_projection: str = field(default="#pk", init=False)
+    must_create_condition: str = field(default="attribute_not_exists(#pk)", init=False)
+    must_exist_condition: str = field(default="attribute_exists(#pk)", init=False)
+    expired_filter: str = field(default="#ttl < :now", init=False)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DysessionSettings":
+        """Validate a `get_config()` dictionary, raise ImproperlyConfigured if invalid"""
+        table_name = config["DYNAMODB_TABLENAME"]
+        _check(
+            isinstance(table_name, str) and bool(_TABLE_NAME_PATTERN.match(table_name)),
+            f"DYNAMODB_TABLENAME {table_name!r} is not a valid DynamoDB table name.",
+        )
+        for name in ("PARTITION_KEY_NAME", "TTL_ATTRIBUTE_NAME"):
+            _check(
+                _is_attribute_name(config[name]),
+                f"{name} should be a non-empty string of at most 255 bytes.",
+            )
+        _check(
+            config["PARTITION_KEY_NAME"] != config["TTL_ATTRIBUTE_NAME"],
+            "PARTITION_KEY_NAME and TTL_ATTRIBUTE_NAME should differ.",
+        )
+        _check(
+            _is_positive_int(config["CACHE_PERIOD"]),
+            "CACHE_PERIOD should be a positive int.",
+        )
+        ttl_refresh_fraction = config["TTL_REFRESH_FRACTION"]
+        _check(
+            type(ttl_refresh_fraction) in (int, float) and 0 <= ttl_refresh_fraction <= 1,
+            "TTL_REFRESH_FRACTION should be a number between 0 and 1.",
+        )
+        region = config["DYNAMODB_REGION"]
+        _check(
+            isinstance(region, str) and bool(region),
+            "DYNAMODB_REGION should be a non-empty string.",
+        )
+        profile = config.get("DYNAMODB_PROFILE")
+        _check(
+            profile is None or isinstance(profile, str),
+            "DYNAMODB_PROFILE should be a string or None.",
+        )
+
+        client = _section(config, "CLIENT")
+        for name in ("MAX_POOL_CONNECTIONS", "MAX_ATTEMPTS"):
+            _check(
+                _is_positive_int(client[name]),
+                f"CLIENT['{name}'] should be a positive int.",
+            )
+        for name in ("CONNECT_TIMEOUT", "READ_TIMEOUT"):
+            _check(
+                _is_positive_number(client[name]),
+                f"CLIENT['{name}'] should be a positive number.",
+            )
+        _check(
+            type(client["TCP_KEEPALIVE"]) is bool,
+            "CLIENT['TCP_KEEPALIVE'] should be a bool.",
+        )
+        _check(
+            client["RETRY_MODE"] in ("legacy", "standard", "adaptive"),
+            "CLIENT['RETRY_MODE'] should be 'legacy', 'standard' or 'adaptive'.",
+        )
+        _check(
+            client["ENDPOINT_URL"] is None or isinstance(client["ENDPOINT_URL"], str),
+            "CLIENT['ENDPOINT_URL'] should be a string or None.",
+        )
+
+        logging = _section(config, "LOGGING")
+        _check(
+            logging["TYPE"] in ("CONSOLE", "FILE"),
+            "LOGGING['TYPE'] should be 'CONSOLE' or 'FILE'.",
+        )
+        _check(
+            isinstance(logging["FILE_PATH"], str) and bool(logging["FILE_PATH"]),
+            "LOGGING['FILE_PATH'] should be a non-empty string.",
+        )
+        _check(type(logging["QUEUE"]) is bool, "LOGGING['QUEUE'] should be a bool.")
+        _check(
+            _is_positive_int(logging["QUEUE_SIZE"]),
+            "LOGGING['QUEUE_SIZE'] should be a positive int.",
+        )
+        sample_rate = logging["SAMPLE_RATE"]
+        _check(
+            type(sample_rate) in (int, float) and 0 <= sample_rate <= 1,
+            "LOGGING['SAMPLE_RATE'] should be a number between 0 and 1.",
+        )
+        _check(
+            logging["SUMMARY_INTERVAL"] is None
+            or _is_positive_number(logging["SUMMARY_INTERVAL"]),
+            "LOGGING['SUMMARY_INTERVAL'] should be None or a positive number.",
+        )
+
+        local_cache = _section(config, "LOCAL_CACHE")
+        _check(
+            _is_positive_number(local_cache["TTL"]),
+            "LOCAL_CACHE['TTL'] should be a positive number.",
+        )
+        for name in ("MAX_ENTRIES", "MAX_BYTES", "SHARDS"):
+            _check(
+                _is_positive_int(local_cache[name]),
+                f"LOCAL_CACHE['{name}'] should be a positive int.",
+            )
+        _check(
+            local_cache["POLICY"] in ("LRU", "LFU"),
+            "LOCAL_CACHE['POLICY'] should be 'LRU' or 'LFU'.",
+        )
+
+        encoding = _section(config, "ENCODING")
+        _check(
+            encoding["FORMAT"] in ("ATTRIBUTES", "BINARY"),
+            "ENCODING['FORMAT'] should be 'ATTRIBUTES' or 'BINARY'.",
+        )
+        _check(
+            encoding["COMPRESSION"] in (None, "zlib", "lzma"),
+            "ENCODING['COMPRESSION'] should be None, 'zlib' or 'lzma'.",
+        )
+        _check(
+            type(encoding["COMPRESS_THRESHOLD"]) is int
+            and encoding["COMPRESS_THRESHOLD"] >= 0,
+            "ENCODING['COMPRESS_THRESHOLD'] should be an int >= 0.",
+        )
+
+        clear_expired = _section(config, "CLEAR_EXPIRED")
+        _check(
+            _is_positive_int(clear_expired["SEGMENTS"]),
+            "CLEAR_EXPIRED['SEGMENTS'] should be a positive int.",
+        )
+        for name in ("READ_CAPACITY", "WRITE_CAPACITY"):
+            value = clear_expired[name]
+            _check(
+                value is None or _is_positive_number(value),
+                f"CLEAR_EXPIRED['{name}'] should be None or a positive number.",
+            )
+
+        partial_load = _section(config, "PARTIAL_LOAD")
+        _check(
+            type(partial_load["ENABLED"]) is bool,
+            "PARTIAL_LOAD['ENABLED'] should be a bool.",
+        )
+        _check(
+            isinstance(partial_load["HOT_KEYS"], (list, tuple))
+            and all(_is_attribute_name(key) for key in partial_load["HOT_KEYS"]),
+            "PARTIAL_LOAD['HOT_KEYS'] should be a list of attribute names.",
+        )
+        paths = partial_load["PATHS"]
+        _check(
+            isinstance(paths, (list, tuple)) and all(isinstance(p, str) for p in paths),
+            "PARTIAL_LOAD['PATHS'] should be a list of regular expressions.",
+        )
+        try:
+            partial_load_paths = tuple(re.compile(path) for path in paths)
+        except re.error as e:
+            _check(False, f"PARTIAL_LOAD['PATHS'] holds an invalid regular expression: {e}.")
+
+        routing = _section(config, "ROUTING")
+        regions = routing["REGIONS"]
+        _check(
+            isinstance(regions, (list, tuple))
+            and all(isinstance(r, str) and r for r in regions),
+            "ROUTING['REGIONS'] should be a list of region names.",
+        )
+        _check(
+            not regions or region in regions,
+            "DYNAMODB_REGION should be one of ROUTING['REGIONS'].",
+        )
+        _check(
+            routing["PREFERRED_REGION"] is None or routing["PREFERRED_REGION"] in regions,
+            "ROUTING['PREFERRED_REGION'] should be None or one of ROUTING['REGIONS'].",
+        )
+        _check(
+            type(routing["COOLDOWN"]) in (int, float) and routing["COOLDOWN"] >= 0,
+            "ROUTING['COOLDOWN'] should be a number >= 0.",
+        )
+        _check(
+            type(routing["UNHEALTHY_SCORE"]) in (int, float)
+            and 0 <= routing["UNHEALTHY_SCORE"] <= 1,
+            "ROUTING['UNHEALTHY_SCORE'] should be a number between 0 and 1.",
+        )
+
+        write_behind = _section(config, "WRITE_BEHIND")
+        _check(
+            type(write_behind["ENABLED"]) is bool,
+            "WRITE_BEHIND['ENABLED'] should be a bool.",
+        )
+        for name in ("MAX_ENTRIES", "MAX_ATTEMPTS"):
+            _check(
+                _is_positive_int(write_behind[name]),
+                f"WRITE_BEHIND['{name}'] should be a positive int.",
+            )
+        for name in ("FLUSH_INTERVAL", "BLOCK_TIMEOUT", "SHUTDOWN_TIMEOUT"):
+            value = write_behind[name]
+            _check(
+                type(value) in (int, float) and value >= 0,
+                f"WRITE_BEHIND['{name}'] should be a number >= 0.",
+            )
+
+        circuit_breaker = _section(config, "CIRCUIT_BREAKER")
+        _check(
+            type(circuit_breaker["ENABLED"]) is bool,
+            "CIRCUIT_BREAKER['ENABLED'] should be a bool.",
+        )
+        _check(
+            _is_positive_int(circuit_breaker["FAILURE_THRESHOLD"]),
+            "CIRCUIT_BREAKER['FAILURE_THRESHOLD'] should be a positive int.",
+        )
+        _check(
+            type(circuit_breaker["RESET_TIMEOUT"]) in (int, float)
+            and circuit_breaker["RESET_TIMEOUT"] > 0,
+            "CIRCUIT_BREAKER['RESET_TIMEOUT'] should be a positive number.",
+        )
+        for name in ("READ_DEADLINE", "WRITE_DEADLINE"):
+            value = circuit_breaker[name]
+            _check(
+                value is None or (type(value) in (int, float) and value > 0),
+                f"CIRCUIT_BREAKER['{name}'] should be a positive number or None.",
+            )
+        _check(
+            circuit_breaker["WRITE_POLICY"] in ("QUEUE", "DROP"),
+            "CIRCUIT_BREAKER['WRITE_POLICY'] should be 'QUEUE' or 'DROP'.",
+        )
+
+        return cls(
+            table_name=table_name,
+            partition_key_name=config["PARTITION_KEY_NAME"],
+            ttl_attribute_name=config["TTL_ATTRIBUTE_NAME"],
+            cache_period=config["CACHE_PERIOD"],
+            ttl_refresh_fraction=ttl_refresh_fraction,
+            region=region,
+            profile=profile,
+            client=client,
+            logging=logging,
+            local_cache=local_cache,
+            encoding=encoding,
+            clear_expired=clear_expired,
+            partial_load=partial_load,
+            partial_load_paths=partial_load_paths,
+            routing=routing,
+            write_behind=write_behind,
+            circuit_breaker=circuit_breaker,
+        )
+
+    @property
+    def is_binary_format(self) -> bool:
+        return self.encoding["FORMAT"] == "BINARY"
+
+    def partial_load_keys(self, path: str) -> Optional[Tuple[str, ...]]:
+        """Return the keys to load first for a request of path, or None to load all"""
+        if not self.partial_load["ENABLED"]:
+            return None
+        if self.partial_load_paths and not any(
+            pattern.match(path) for pattern in self.partial_load_paths
+        ):
+            return None
+        return tuple(self.partial_load["HOT_KEYS"])
+
+    def key(self, session_key: str) -> Dict[str, Dict[str, str]]:
+        """Low-level primary key of session_key"""
+        return {self.partition_key_name: {"S": session_key}}
+
+    def pk_names(self, ttl: bool = False) -> Dict[str, str]:
+        """ExpressionAttributeNames binding "#pk" (and "#ttl") of the expressions"""
+        names = {"#pk": self.partition_key_name}
+        if ttl:
+            names["#ttl"] = self.ttl_attribute_name
+        return names
+
+
+@lru_cache
+def get_settings() -> DysessionSettings:
+    """Return the cached, validated `DysessionSettings` of the current settings
+
+    Raise ImproperlyConfigured if `DYSESSION` holds an invalid value.
+    """
+    return DysessionSettings.from_config(get_config())
+
+
 @receiver(setting_changed)
 def update_dysession_config(*, setting, **kwargs):
     if setting == "DYSESSION":  # pragma: no cover
         get_config.cache_clear()  # pragma: no cover
+        get_settings.cache_clear()  # pragma: no cover
 
 
-__all__ = ["get_config"]
+__all__ = ["get_config", "get_settings", "DysessionSettings"]
@@ -0,0 +1,25 @@
+from django.http import HttpRequest, HttpResponse
+
+from dysession.aws.capacity import get_ledger
+from dysession.metrics import get_registry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Expose the session metrics and consumed capacity in the Prometheus text format
+
+    Not routed by default, add it to your URLconf behind whatever access
+    control suits your deployment:
+
+    ```
+    path("internal/dysession/metrics", dysession.views.metrics)
+    ```
+    """
+    return HttpResponse(
+        get_registry().render_text() + get_ledger().render_text(),
+        content_type=PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+__all__ = ["metrics"]
@@ -9,7 +9,6 @@ class DysessionInitTestCase(TestCase):
         [
             ("DYNAMODB_TABLENAME",),
             ("PARTITION_KEY_NAME",),
-            ("SORT_KEY_NAME",),
             ("TTL_ATTRIBUTE_NAME",),
             ("CACHE_PERIOD",),
             ("DYNAMODB_REGION",),
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import boto3
+from django.contrib.sessions.backends.base import CreateError
+from django.test import SimpleTestCase
+
+from dysession.aws.aio import (
+    AioSession,
+    AsyncClientRegistry,
+    AsyncDynamoDB,
+    adelete_session_item,
+    aget_item,
+    ainsert_session_item,
+    akey_exists,
+)
+from dysession.aws.error import DynamodbItemNotFound
+from dysession.backends.db import SessionStore
+from dysession.backends.error import (
+    SessionExpired,
+    SessionKeyDoesNotExist,
+    SessionKeyDuplicated,
+)
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+try:
+    from aiobotocore.client import AioBaseClient
+except ImportError:  # pragma: no cover
+    AioBaseClient = None
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:  # pragma: no cover
+    ThreadedMotoServer = None
+
+CREDENTIALS = {"aws_access_key_id": "testing", "aws_secret_access_key": "testing"}
+
+
+@unittest.skipIf(
+    AioSession is None or ThreadedMotoServer is None,
+    "aiobotocore and moto[server] are required",
+)
+class AsyncDynamoDBTestCase(SimpleTestCase):
+    """aiobotocore cannot be patched by moto's mocks, run against moto's server instead"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+        cls.server.start()
+        cls.endpoint_url = f"http://127.0.0.1:{cls.server._server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        # the server shares moto's in-process backends with the mocked tests
+        self.sync_client = boto3.client(
+            "dynamodb",
+            region_name=get_config()["DYNAMODB_REGION"],
+            endpoint_url=self.endpoint_url,
+            **CREDENTIALS,
+        )
+        try:
+            self.sync_client.delete_table(TableName=get_config()["DYNAMODB_TABLENAME"])
+        except self.sync_client.exceptions.ResourceNotFoundException:
+            pass
+        self.sync_client.create_table(
+            TableName=get_config()["DYNAMODB_TABLENAME"],
+            KeySchema=[
+                {"AttributeName": get_config()["PARTITION_KEY_NAME"], "KeyType": "HASH"}
+            ],
+            AttributeDefinitions=[
+                {
+                    "AttributeName": get_config()["PARTITION_KEY_NAME"],
+                    "AttributeType": "S",
+                }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        self.sync_client.delete_table(TableName=get_config()["DYNAMODB_TABLENAME"])
+
+    def dynamodb_client(self):
+        return AioSession().create_client(
+            "dynamodb",
+            region_name=get_config()["DYNAMODB_REGION"],
+            endpoint_url=self.endpoint_url,
+            **CREDENTIALS,
+        )
+
+    async def test_item_helpers(self):
+        async with self.dynamodb_client() as client:
+            model = SessionDataModel("asyncsessionkey")
+            model["a"] = 1
+            model["b"] = {"x": [1, 2]}
+            await ainsert_session_item(model, client=client)
+
+            self.assertTrue(await akey_exists("asyncsessionkey", client=client))
+            model = await aget_item("asyncsessionkey", client=client)
+            self.assertEqual(model["a"], 1)
+            self.assertEqual(model["b"], {"x": [1, 2]})
+            self.assertFalse(model.is_dirty)
+
+            with self.assertRaises(SessionKeyDuplicated):
+                await ainsert_session_item(model, ignore_duplicated=False, client=client)
+
+            await adelete_session_item(model, client=client)
+            with self.assertRaises(DynamodbItemNotFound):
+                await aget_item("asyncsessionkey", client=client)
+
+    async def test_async_dynamodb_controller(self):
+        async with self.dynamodb_client() as client:
+            db = AsyncDynamoDB(client)
+
+            model = SessionDataModel("asyncsessionkey")
+            model["a"] = 1
+            model["b"] = 2
+            await db.set(model)
+
+            model = await db.get("asyncsessionkey")
+            model["a"] = 3
+            with mock.patch.object(
+                client, "update_item", wraps=client.update_item
+            ) as mock_update:
+                await db.set(model)
+                await db.set(model)
+                mock_update.assert_called_once()
+
+            model = await db.get("asyncsessionkey")
+            self.assertEqual(model["a"], 3)
+            self.assertEqual(model["b"], 2)
+            self.assertTrue(await db.exists("asyncsessionkey"))
+
+            await db.delete(model)
+            with self.assertRaises(SessionKeyDoesNotExist):
+                await db.get("asyncsessionkey")
+
+    async def test_async_dynamodb_controller_expired(self):
+        async with self.dynamodb_client() as client:
+            db = AsyncDynamoDB(client)
+
+            model = SessionDataModel("asyncsessionkey")
+            model[get_config()["TTL_ATTRIBUTE_NAME"]] = int(datetime.now().timestamp()) - 1
+            await db.set(model)
+
+            with self.assertRaises(SessionExpired):
+                await db.get("asyncsessionkey")
+
+    async def test_session_store_async_methods(self):
+        async with self.dynamodb_client() as client:
+            store = SessionStore(None)
+            store.adb.client = client
+
+            await store.acreate()
+            self.assertTrue(await store.aexists(store.session_key))
+
+            (await store._aget_session())["a"] = 1
+            await store.asave()
+
+            loaded = SessionStore(store.session_key)
+            loaded.adb.client = client
+            self.assertEqual((await loaded.aload())["a"], 1)
+
+            with self.assertRaises(CreateError):
+                await loaded.asave(must_create=True)
+
+            await loaded.adelete()
+            self.assertFalse(await store.aexists(store.session_key))
+
+
+@unittest.skipIf(AioSession is None, "aiobotocore is required")
+class AsyncClientRegistryTestCase(SimpleTestCase):
+    async def test_same_client_is_returned_within_a_loop(self):
+        registry = AsyncClientRegistry()
+        client = await registry.get("us-east-1")
+        self.assertIs(client, await registry.get("us-east-1"))
+        self.assertIsNot(client, await registry.get("eu-west-1"))
+        self.assertEqual(client.meta.config.read_timeout, 2)
+        self.assertEqual(client.meta.config.retries["mode"], "standard")
+        await registry.close()
+
+    def test_each_loop_has_its_own_client(self):
+        registry = AsyncClientRegistry()
+
+        async def get_and_close():
+            client = await registry.get("us-east-1")
+            await registry.close()
+            return client
+
+        self.assertIsNot(asyncio.run(get_and_close()), asyncio.run(get_and_close()))
+
+    def test_clients_are_closed_with_their_loop(self):
+        registry = AsyncClientRegistry()
+
+        async def get():
+            client = await registry.get("us-east-1")
+            self.assertEqual(len(registry._clients), 1)
+            return client
+
+        with mock.patch.object(AioBaseClient, "__aexit__", autospec=True) as aexit:
+            client = asyncio.run(get())
+        aexit.assert_called_once_with(client, None, None, None)
+        self.assertEqual(registry._clients, {})
@@ -0,0 +1,193 @@
+import logging
+from unittest import mock
+
+import boto3
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import ResolverMatch
+from moto import mock_dynamodb
+
+from dysession.aws.capacity import (
+    CapacityLedger,
+    capacity_scope,
+    get_ledger,
+    record_consumed_capacity,
+    request_capacity_consumed,
+)
+from dysession.aws.dynamodb import (
+    create_dynamodb_table,
+    get_item,
+    insert_session_item,
+    key_exists,
+)
+from dysession.backends.model import SessionDataModel
+from dysession.middleware import UNRESOLVED_ENDPOINT, SessionMiddleware
+from dysession.settings import get_config
+
+
+class CapacityLedgerTestCase(TestCase):
+    def setUp(self):
+        get_ledger().reset()
+
+    def tearDown(self):
+        get_ledger().reset()
+
+    def test_record_single_and_batch_responses(self):
+        with capacity_scope() as capacity:
+            record_consumed_capacity(
+                "GetItem", {"ConsumedCapacity": {"TableName": "sessions", "CapacityUnits": 0.5}}
+            )
+            record_consumed_capacity(
+                "BatchWriteItem",
+                {
+                    "ConsumedCapacity": [
+                        {"TableName": "sessions", "CapacityUnits": 2.0},
+                        {"TableName": "other", "CapacityUnits": 1.0},
+                    ]
+                },
+            )
+            record_consumed_capacity("DeleteItem", {})
+
+        self.assertEqual(capacity.read_units, 0.5)
+        self.assertEqual(capacity.write_units, 3.0)
+        self.assertEqual(capacity.calls, 2)
+
+        total = get_ledger().total()
+        self.assertEqual((total.read_units, total.write_units), (0.5, 3.0))
+        operations = get_ledger().snapshot()["operations"]
+        self.assertEqual(
+            [(row["table"], row["operation"]) for row in operations],
+            [("other", "BatchWriteItem"), ("sessions", "BatchWriteItem"), ("sessions", "GetItem")],
+        )
+
+    def test_nested_scopes_charge_the_innermost(self):
+        response = {"ConsumedCapacity": {"TableName": "sessions", "CapacityUnits": 1.0}}
+        with capacity_scope() as outer:
+            record_consumed_capacity("PutItem", response)
+            with capacity_scope() as inner:
+                record_consumed_capacity("PutItem", response)
+
+        self.assertEqual(outer.write_units, 1.0)
+        self.assertEqual(inner.write_units, 1.0)
+
+    def test_top_endpoints_and_render_text(self):
+        ledger = CapacityLedger()
+        with capacity_scope() as cheap:
+            cheap.add("GetItem", 0.5)
+        with capacity_scope() as costly:
+            costly.add("PutItem", 4.0)
+        ledger.record_endpoint("cheap", cheap)
+        ledger.record_endpoint("costly", costly)
+        ledger.record_endpoint("costly", costly)
+        ledger.record("PutItem", "sessions", 4.0)
+
+        (endpoint, capacity), _ = ledger.top_endpoints()
+        self.assertEqual(endpoint, "costly")
+        self.assertEqual(capacity.write_units, 8.0)
+        self.assertEqual(capacity.calls, 2)
+
+        text = ledger.render_text()
+        self.assertIn(
+            'dysession_consumed_capacity_units_total{table="sessions",'
+            'operation="PutItem",kind="write"} 4.0\n',
+            text,
+        )
+        self.assertIn(
+            'dysession_endpoint_consumed_capacity_units_total{endpoint="costly",'
+            'kind="write"} 8.0\n',
+            text,
+        )
+
+
+class DynamoDBCapacityTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        get_ledger().reset()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        get_ledger().reset()
+
+    def create_table(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+        return client
+
+    @mock_dynamodb
+    def test_helpers_record_consumed_capacity(self):
+        client = self.create_table()
+        model = SessionDataModel("capacitysessionkey")
+        model["a"] = 1
+
+        with capacity_scope() as capacity:
+            insert_session_item(model, client=client)
+            get_item("capacitysessionkey", client=client)
+            key_exists("notexistsessionkey", client=client)
+
+        self.assertEqual(capacity.calls, 3)
+        self.assertGreater(capacity.read_units, 0)
+        self.assertGreater(capacity.write_units, 0)
+        self.assertEqual(get_ledger().total().calls, 3)
+
+    @mock_dynamodb
+    @override_settings(SESSION_ENGINE="dysession.backends.db")
+    def test_middleware_charges_the_endpoint(self):
+        client = self.create_table()
+
+        def view(request):
+            request.resolver_match = ResolverMatch(view, (), {}, url_name="checkout")
+            request.session["a"] = 1
+            return HttpResponse("ok")
+
+        receiver = mock.Mock()
+        request_capacity_consumed.connect(receiver)
+        try:
+            request = self.factory.get("/checkout")
+            with mock.patch("dysession.backends.db.get_client", return_value=client):
+                SessionMiddleware(view)(request)
+        finally:
+            request_capacity_consumed.disconnect(receiver)
+
+        receiver.assert_called_once()
+        kwargs = receiver.call_args.kwargs
+        self.assertEqual(kwargs["endpoint"], "checkout")
+        self.assertIs(kwargs["capacity"], request.dysession_capacity)
+        self.assertGreater(kwargs["capacity"].write_units, 0)
+        self.assertIn("checkout", get_ledger().snapshot()["endpoints"])
+
+    @override_settings(SESSION_ENGINE="dysession.backends.db")
+    def test_middleware_ignores_requests_without_dynamodb_calls(self):
+        receiver = mock.Mock()
+        request_capacity_consumed.connect(receiver)
+        try:
+            request = self.factory.get("/health")
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = "untouchedsessionkey"
+            SessionMiddleware(lambda request: HttpResponse("ok"))(request)
+        finally:
+            request_capacity_consumed.disconnect(receiver)
+
+        receiver.assert_not_called()
+        self.assertNotIn(UNRESOLVED_ENDPOINT, get_ledger().snapshot()["endpoints"])
+
+    @override_settings(SESSION_ENGINE="dysession.backends.db")
+    def test_async_middleware_opens_a_scope(self):
+        async def view(request):
+            record_consumed_capacity(
+                "GetItem", {"ConsumedCapacity": {"TableName": "sessions", "CapacityUnits": 0.5}}
+            )
+            return HttpResponse("ok")
+
+        request = self.factory.get("/")
+        async_to_sync(SessionMiddleware(view))(request)
+
+        self.assertEqual(request.dysession_capacity.read_units, 0.5)
+        self.assertIn(UNRESOLVED_ENDPOINT, get_ledger().snapshot()["endpoints"])
@@ -0,0 +1,307 @@
+import logging
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from moto import mock_dynamodb
+
+from dysession.aws.circuit import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    get_breaker,
+)
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table, key_exists
+from dysession.aws.write_behind import (
+    WriteBehindQueue,
+    close_write_behind,
+    get_fallback_queue,
+)
+from dysession.backends.db import SessionStore
+from dysession.backends.error import SessionUnavailable
+from dysession.backends.local_cache import LocalSessionCache
+from dysession.backends.model import SessionDataModel
+from dysession.metrics import get_registry
+from dysession.middleware import SessionMiddleware
+from dysession.settings import get_config
+
+
+def throttled(**kwargs):
+    raise ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": ""}}, "GetItem"
+    )
+
+
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        get_registry().reset()
+        self.now = [0.0]
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=10, clock=lambda: self.now[0]
+        )
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def fail(self):
+        with self.assertRaises(ClientError):
+            with self.breaker.guard():
+                throttled()
+
+    def test_open_then_half_open_then_closed(self):
+        self.fail()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.now[0] = 10.0
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # a single probe at a time
+        self.assertFalse(self.breaker.allow())
+        with self.breaker.guard():
+            pass
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self.assertEqual(get_registry().count("circuit", outcome=OPEN), 1)
+        self.assertEqual(get_registry().count("circuit", outcome=CLOSED), 1)
+
+    def test_failed_probe_opens_again(self):
+        self.fail()
+        self.fail()
+        self.now[0] = 10.0
+        self.assertTrue(self.breaker.allow())
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_request_errors_and_slow_calls(self):
+        # DynamoDB answered, the request itself was wrong
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                with self.breaker.guard():
+                    raise ValueError
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        with mock.patch("dysession.aws.circuit.time.perf_counter", side_effect=[0, 1]):
+            with self.breaker.guard(deadline=0.5):
+                pass
+        with mock.patch("dysession.aws.circuit.time.perf_counter", side_effect=[0, 1]):
+            with self.breaker.guard(deadline=0.5):
+                pass
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_state_changes_are_reported_without_the_lock(self):
+        with mock.patch("dysession.aws.circuit.get_logger") as get_logger:
+            get_logger.return_value.warning.side_effect = lambda message: (
+                self.assertFalse(self.breaker._lock.locked())
+            )
+            self.fail()
+            self.fail()
+        get_logger.return_value.warning.assert_called_once()
+
+    def test_get_breaker(self):
+        self.assertIsNone(get_breaker())
+        self.assertIsNone(get_fallback_queue())
+        with override_settings(
+            DYSESSION={"CIRCUIT_BREAKER": {"ENABLED": True, "FAILURE_THRESHOLD": 3}}
+        ):
+            self.assertIs(get_breaker(), get_breaker())
+            self.assertEqual(get_breaker().failure_threshold, 3)
+        with override_settings(
+            DYSESSION={"CIRCUIT_BREAKER": {"ENABLED": True, "WRITE_POLICY": "DROP"}}
+        ):
+            self.assertIsNone(get_fallback_queue())
+
+
+class DegradedModeTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        get_registry().reset()
+        self.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def create_table(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+        return client
+
+    def trip(self, db, client):
+        with mock.patch.object(client, "get_item", side_effect=throttled):
+            with self.assertRaises(ClientError):
+                db.get("unreachablesessionkey")
+        self.assertEqual(self.breaker.state, OPEN)
+
+    @mock_dynamodb
+    def test_reads_are_served_by_the_local_cache(self):
+        client = self.create_table()
+        db = DynamoDB(client, cache=LocalSessionCache(ttl=60), breaker=self.breaker)
+        model = SessionDataModel("cachedsessionkey")
+        model["a"] = 1
+        db.set(model)
+        db.get("cachedsessionkey")
+        self.trip(db, client)
+
+        with mock.patch.object(client, "get_item") as get_item:
+            self.assertEqual(db.get("cachedsessionkey")["a"], 1)
+            with self.assertRaises(SessionUnavailable):
+                db.get("uncachedsessionkey")
+        get_item.assert_not_called()
+        self.assertEqual(get_registry().count("load", outcome="degraded"), 1)
+
+    @mock_dynamodb
+    def test_writes_are_queued(self):
+        client = self.create_table()
+        queue = WriteBehindQueue(client=client, breaker=self.breaker)
+        db = DynamoDB(client, cache=None, breaker=self.breaker, fallback_queue=queue)
+        self.trip(db, client)
+
+        model = SessionDataModel("queuedsessionkey")
+        model["a"] = 1
+        with mock.patch.object(client, "put_item") as put_item:
+            db.set(model)
+        put_item.assert_not_called()
+        self.assertEqual(get_registry().count("save", outcome="degraded"), 1)
+        # read your writes, from the queue
+        self.assertEqual(db.get("queuedsessionkey")["a"], 1)
+
+        # flushed once DynamoDB is back
+        self.breaker.record(True)
+        queue.close(timeout=5)
+        self.assertTrue(key_exists("queuedsessionkey", client=client))
+
+    @mock_dynamodb
+    def test_writes_are_dropped(self):
+        client = self.create_table()
+        db = DynamoDB(client, cache=None, breaker=self.breaker)
+        self.trip(db, client)
+
+        model = SessionDataModel("droppedsessionkey")
+        db.set(model)
+        # a new session cannot be queued, nor be reported as stored
+        with self.assertRaises(SessionUnavailable):
+            db.set(SessionDataModel("newsessionkey"), ignore_duplicated=False)
+        db.delete(model)
+
+        self.breaker.record(True)
+        self.assertFalse(key_exists("droppedsessionkey", client=client))
+        self.assertFalse(key_exists("newsessionkey", client=client))
+        self.assertEqual(get_registry().count(outcome="degraded"), 3)
+
+    @mock_dynamodb
+    def test_session_store_does_not_overwrite_a_degraded_session(self):
+        client = self.create_table()
+        config = {"CIRCUIT_BREAKER": {"ENABLED": True, "FAILURE_THRESHOLD": 1}}
+        with override_settings(DYSESSION=config), mock.patch(
+            "dysession.backends.db.get_client", return_value=client
+        ):
+            session = SessionStore(None)
+            session["a"] = 1
+            session.save()
+
+            get_breaker().record(False)
+            degraded = SessionStore(session.session_key)
+            self.assertNotIn("a", degraded)
+            self.assertTrue(degraded.degraded)
+            self.assertEqual(degraded.session_key, session.session_key)
+            degraded["b"] = 2
+            degraded.save()
+
+            get_breaker().record(True)
+            stored = SessionStore(session.session_key)
+            self.assertEqual(stored["a"], 1)
+            self.assertNotIn("b", stored)
+            close_write_behind()
+
+    @mock_dynamodb
+    def test_session_store_create_is_refused(self):
+        client = self.create_table()
+        config = {"CIRCUIT_BREAKER": {"ENABLED": True, "FAILURE_THRESHOLD": 1}}
+        with override_settings(DYSESSION=config), mock.patch(
+            "dysession.backends.db.get_client", return_value=client
+        ):
+            get_breaker().record(False)
+            session = SessionStore(None)
+            session["_auth_user_id"] = "1"
+            with self.assertRaises(SessionUnavailable):
+                session.cycle_key()
+            close_write_behind()
+
+    async def test_session_store_async_methods_are_guarded(self):
+        config = {"CIRCUIT_BREAKER": {"ENABLED": True, "FAILURE_THRESHOLD": 1}}
+        with mock_dynamodb(), override_settings(DYSESSION=config):
+            client = self.create_table()
+            with mock.patch("dysession.backends.db.get_client", return_value=client):
+                session = SessionStore(None)
+                session["a"] = 1
+                await session.asave()
+                self.assertFalse(session.native_async)
+
+                get_breaker().record(False)
+                degraded = SessionStore(session.session_key)
+                self.assertNotIn("a", await degraded.aload())
+                self.assertTrue(degraded.degraded)
+            close_write_behind()
+
+    @mock_dynamodb
+    def test_middleware_answers_login_with_503(self):
+        client = self.create_table()
+        config = {
+            "CIRCUIT_BREAKER": {"ENABLED": True, "FAILURE_THRESHOLD": 1, "RESET_TIMEOUT": 30}
+        }
+        with override_settings(
+            DYSESSION=config, SESSION_ENGINE="dysession.backends.db"
+        ), mock.patch("dysession.backends.db.get_client", return_value=client):
+            get_breaker().record(False)
+            request = RequestFactory().post("/login")
+
+            def login_view(request):
+                request.session["_auth_user_id"] = "1"
+                request.session.cycle_key()
+                return HttpResponse("ok")
+
+            middleware = SessionMiddleware(login_view)
+            middleware.process_request(request)
+            with self.assertRaises(SessionUnavailable) as cm:
+                login_view(request)
+            response = middleware.process_exception(request, cm.exception)
+            response = middleware.process_response(request, response)
+
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "30")
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+            self.assertIsNone(middleware.process_exception(request, ValueError()))
+            close_write_behind()
+
+    @mock_dynamodb
+    def test_middleware_does_not_set_the_cookie_of_an_unsaved_session(self):
+        client = self.create_table()
+        config = {"CIRCUIT_BREAKER": {"ENABLED": True, "FAILURE_THRESHOLD": 1}}
+        with override_settings(
+            DYSESSION=config, SESSION_ENGINE="dysession.backends.db"
+        ), mock.patch("dysession.backends.db.get_client", return_value=client):
+            get_breaker().record(False)
+
+            def view(request):
+                request.session["a"] = 1
+                return HttpResponse("ok")
+
+            response = SessionMiddleware(view)(RequestFactory().get("/"))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+            close_write_behind()
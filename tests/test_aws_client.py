@@ -0,0 +1,136 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from moto import mock_dynamodb
+
+from dysession.aws.client import (
+    ClientRegistry,
+    clear_clients,
+    get_client,
+    get_maintenance_client,
+)
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table, get_item
+from dysession.aws.error import DynamodbItemNotFound
+from dysession.settings import get_config
+
+
+class ClientRegistryTestCase(TestCase):
+    def setUp(self):
+        clear_clients()
+
+    def tearDown(self):
+        clear_clients()
+
+    @mock_dynamodb
+    def test_same_client_is_returned_for_same_key(self):
+        self.assertIs(get_client(), get_client())
+        self.assertIs(get_client("us-east-1"), get_client("us-east-1"))
+
+    @mock_dynamodb
+    def test_default_region_comes_from_config(self):
+        client = get_client()
+        self.assertEqual(client.meta.region_name, get_config()["DYNAMODB_REGION"])
+        self.assertIs(client, get_client(get_config()["DYNAMODB_REGION"]))
+
+    @mock_dynamodb
+    def test_different_region_has_different_client(self):
+        self.assertIsNot(get_client("us-east-1"), get_client("eu-west-1"))
+
+    @mock_dynamodb
+    def test_clear_clients_rebuilds_client(self):
+        client = get_client()
+        clear_clients()
+        self.assertIsNot(client, get_client())
+
+    @mock_dynamodb
+    def test_client_is_rebuilt_after_fork(self):
+        registry = ClientRegistry()
+        client = registry.get("us-east-1")
+
+        with mock.patch("os.getpid", return_value=registry._pid + 1):
+            forked_client = registry.get("us-east-1")
+            self.assertIsNot(client, forked_client)
+            self.assertIs(forked_client, registry.get("us-east-1"))
+
+    @mock_dynamodb
+    def test_fork_does_not_acquire_the_parent_lock(self):
+        registry = ClientRegistry()
+        # held by a thread of the parent at fork time, which the child lacks
+        lock = registry._lock
+        lock.acquire()
+        try:
+            with mock.patch("os.getpid", return_value=registry._pid + 1):
+                registry.get("us-east-1")
+            self.assertIsNot(registry._lock, lock)
+        finally:
+            lock.release()
+
+    @mock_dynamodb
+    def test_concurrent_access_builds_one_client(self):
+        registry = ClientRegistry()
+        clients = []
+
+        def worker():
+            clients.append(registry.get("us-east-1"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(map(id, clients))), 1)
+
+    @mock_dynamodb
+    def test_helpers_use_pooled_client(self):
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            }
+        )
+        # the table was created by the maintenance client
+        get_client()
+
+        with mock.patch("boto3.session.Session.client") as mock_client:
+            with self.assertRaises(DynamodbItemNotFound):
+                get_item(session_key="not_exist")
+            DynamoDB().exists("not_exist")
+            mock_client.assert_not_called()
+
+    @mock_dynamodb
+    def test_maintenance_client_keeps_botocore_defaults(self):
+        client = get_maintenance_client()
+        self.assertIsNot(client, get_client())
+        self.assertIs(client, get_maintenance_client())
+        # long Scans and table operations, not the session lookup budget
+        self.assertEqual(client.meta.config.read_timeout, 60)
+        self.assertEqual(client.meta.config.connect_timeout, 60)
+
+    def test_client_config(self):
+        client = get_client()
+        self.assertEqual(client.meta.config.max_pool_connections, 10)
+        self.assertEqual(client.meta.config.read_timeout, 2)
+        self.assertTrue(client.meta.config.tcp_keepalive)
+        self.assertEqual(client.meta.config.retries["mode"], "standard")
+
+        with override_settings(
+            DYSESSION={
+                "CLIENT": {
+                    "MAX_POOL_CONNECTIONS": 50,
+                    "READ_TIMEOUT": 0.5,
+                    "RETRY_MODE": "adaptive",
+                    "MAX_ATTEMPTS": 2,
+                    "ENDPOINT_URL": "http://localhost:8000",
+                }
+            }
+        ):
+            tuned = get_client()
+            self.assertIsNot(tuned, client)
+            self.assertEqual(tuned.meta.config.max_pool_connections, 50)
+            self.assertEqual(tuned.meta.config.read_timeout, 0.5)
+            self.assertEqual(
+                tuned.meta.config.retries, {"mode": "adaptive", "total_max_attempts": 2}
+            )
+            self.assertEqual(tuned.meta.endpoint_url, "http://localhost:8000")
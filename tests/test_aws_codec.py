@@ -0,0 +1,173 @@
+import logging
+from decimal import Decimal
+
+import boto3
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from moto import mock_dynamodb
+from parameterized import parameterized
+
+from dysession.aws.codec import (SESSION_DATA_ATTRIBUTE, decode_session,
+                                 encode_session, item_to_model,
+                                 put_item_request, update_item_request)
+from dysession.aws.dynamodb import (DynamoDB, create_dynamodb_table, get_item,
+                                    insert_session_item)
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+BINARY = {"ENCODING": {"FORMAT": "BINARY"}}
+
+
+def make_model(session_key: str, **data) -> SessionDataModel:
+    model = SessionDataModel(session_key)
+    for k, v in data.items():
+        model[k] = v
+    return model
+
+
+class BinaryEncodingTestCase(TestCase):
+    @parameterized.expand([["zlib"], ["lzma"], [None]])
+    def test_round_trip(self, compression):
+        with override_settings(
+            DYSESSION={"ENCODING": {"FORMAT": "BINARY", "COMPRESSION": compression}}
+        ):
+            model = make_model("key", a=1, b="x" * 5000, c={"n": Decimal("1.5")}, ttl=10)
+            blob = encode_session(model)
+
+            self.assertEqual(blob[:2], b"dy")
+            self.assertEqual(decode_session(blob), {"a": 1, "b": "x" * 5000, "c": {"n": 1.5}})
+            if compression is None:
+                self.assertGreater(len(blob), 5000)
+            else:
+                self.assertLess(len(blob), 1000)
+
+    @override_settings(DYSESSION={"ENCODING": {"FORMAT": "BINARY", "COMPRESS_THRESHOLD": 100}})
+    def test_small_sessions_are_not_compressed(self):
+        self.assertEqual(encode_session(make_model("key", a=1))[3], 0)
+        self.assertEqual(encode_session(make_model("key", a="x" * 100))[3], 1)
+
+    @override_settings(DYSESSION={"ENCODING": {"FORMAT": "BINARY", "COMPRESSION": "gzip"}})
+    def test_unknown_compression(self):
+        with self.assertRaises(ImproperlyConfigured):
+            encode_session(make_model("key", a=1))
+
+    @parameterized.expand([[b"xx\x01\x00{}"], [b"dy\x02\x00{}"], [b"dy\x01\x09{}"], [b"dy"]])
+    def test_decode_rejects_unknown_header(self, blob):
+        with self.assertRaises(ValueError):
+            decode_session(blob)
+
+    @override_settings(DYSESSION=BINARY)
+    def test_put_item_keeps_pk_and_ttl_top_level(self):
+        pk = get_config()["PARTITION_KEY_NAME"]
+        request = put_item_request(make_model("key", a=1, ttl=10), "sessions")
+
+        self.assertEqual(
+            set(request["Item"]), {pk, "ttl", SESSION_DATA_ATTRIBUTE}
+        )
+        self.assertEqual(request["Item"]["ttl"], {"N": "10"})
+
+    @override_settings(DYSESSION=BINARY)
+    def test_update_item_rewrites_the_session_attribute(self):
+        model = make_model("key", a=1, b=2, ttl=10)
+        model.mark_clean()
+        self.assertIsNone(update_item_request(model, "sessions"))
+
+        del model["b"]
+        request = update_item_request(model, "sessions")
+        self.assertEqual(request["UpdateExpression"], "SET #s0 = :s0")
+        self.assertEqual(request["ExpressionAttributeNames"]["#s0"], SESSION_DATA_ATTRIBUTE)
+        self.assertEqual(decode_session(request["ExpressionAttributeValues"][":s0"]["B"]), {"a": 1})
+
+        model.mark_clean()
+        model["ttl"] = 20
+        request = update_item_request(model, "sessions")
+        self.assertEqual(request["UpdateExpression"], "SET #s0 = :s0, #s1 = :s1")
+        self.assertEqual(
+            {request["ExpressionAttributeNames"]["#s0"], request["ExpressionAttributeNames"]["#s1"]},
+            {SESSION_DATA_ATTRIBUTE, "ttl"},
+        )
+
+    def test_item_of_other_format_is_not_persisted(self):
+        pk = get_config()["PARTITION_KEY_NAME"]
+        with override_settings(DYSESSION=BINARY):
+            binary_item = put_item_request(make_model("key", a=1), "sessions")["Item"]
+        attributes_item = {pk: {"S": "key"}, "a": {"N": "1"}}
+
+        model = item_to_model("key", binary_item)
+        self.assertEqual(model["a"], 1)
+        self.assertFalse(model.is_persisted)
+        self.assertTrue(item_to_model("key", attributes_item).is_persisted)
+
+        with override_settings(DYSESSION=BINARY):
+            self.assertTrue(item_to_model("key", binary_item).is_persisted)
+            model = item_to_model("key", attributes_item)
+            self.assertEqual(model["a"], 1)
+            self.assertFalse(model.is_persisted)
+
+
+class BinaryEncodingDynamoDBTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def test_large_session_fits_once_compressed(self):
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+
+        with override_settings(DYSESSION=BINARY):
+            model = make_model("largesessionkey", data="session " * 100000)
+            insert_session_item(data=model, client=client)
+            self.assertEqual(get_item("largesessionkey", client=client)["data"], model["data"])
+
+    @mock_dynamodb
+    def test_attributes_item_is_migrated_by_next_save(self):
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        insert_session_item(data=make_model("migratedsessionkey", a=1, b=2), client=client)
+
+        with override_settings(DYSESSION=BINARY):
+            db = DynamoDB(client=client)
+            model = db.get("migratedsessionkey")
+            model["a"] = 3
+            db.set(model)
+
+        item = client.get_item(
+            TableName="sessions",
+            Key={get_config()["PARTITION_KEY_NAME"]: {"S": "migratedsessionkey"}},
+        )["Item"]
+        self.assertEqual(set(item), {get_config()["PARTITION_KEY_NAME"], SESSION_DATA_ATTRIBUTE})
+        self.assertEqual(decode_session(item[SESSION_DATA_ATTRIBUTE]["B"]), {"a": 3, "b": 2})
+
+    @mock_dynamodb
+    def test_projected_binary_item_is_read_whole(self):
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        with override_settings(DYSESSION=BINARY):
+            insert_session_item(data=make_model("binarysessionkey", a=1, b=2), client=client)
+
+        model = get_item(
+            "binarysessionkey", client=client, attributes=["a"], loader=lambda: None
+        )
+        self.assertFalse(model.is_partial)
+        self.assertEqual(model["b"], 2)
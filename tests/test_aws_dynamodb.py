@@ -1,15 +1,21 @@
 import logging
+from unittest import mock
 
 import boto3
 from django.test import TestCase
 from moto import mock_dynamodb
 from parameterized import parameterized
 
-from dysession.aws.dynamodb import (check_dynamodb_table_exists,
+from dysession.aws.dynamodb import (batch_get_sessions, batch_write_sessions,
+                                    check_dynamodb_table_exists,
                                     create_dynamodb_table, delete_session_item,
-                                    destory_dynamodb_table, get_item,
-                                    insert_session_item, key_exists)
-from dysession.aws.error import DynamodbItemNotFound, DynamodbTableNotFound
+                                    destory_dynamodb_table,
+                                    enable_time_to_live, get_item,
+                                    insert_session_item, key_exists,
+                                    update_session_item)
+from dysession.aws.error import (DynamodbItemNotFound, DynamodbTableNotFound,
+                                 DynamodbUnprocessedItems)
+from dysession.backends.error import SessionKeyDuplicated
 from dysession.backends.model import SessionDataModel
 from dysession.settings import get_config
 
@@ -26,7 +32,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -35,7 +40,6 @@ class AWSDynamoDBTestCase(TestCase):
         response = create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
             client=client,
@@ -44,12 +48,29 @@ class AWSDynamoDBTestCase(TestCase):
         self.assertEqual(response["ResponseMetadata"]["HTTPStatusCode"], 200)
         self.assertEqual(response["TableDescription"]["TableName"], options["table"])
 
+    @mock_dynamodb
+    def test_enable_time_to_live(self):
+        options = {
+            "pk": get_config()["PARTITION_KEY_NAME"],
+            "ttl": get_config()["TTL_ATTRIBUTE_NAME"],
+            "table": "sessions",
+        }
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(options=options, client=client)
+
+        enable_time_to_live(options=options, client=client)
+
+        description = client.describe_time_to_live(TableName="sessions")[
+            "TimeToLiveDescription"
+        ]
+        self.assertEqual(description["TimeToLiveStatus"], "ENABLED")
+        self.assertEqual(description["AttributeName"], options["ttl"])
+
     @mock_dynamodb
     def test_init_dynamodb_table_with_client_input(self):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -58,7 +79,6 @@ class AWSDynamoDBTestCase(TestCase):
         response = create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
         )
@@ -71,7 +91,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -80,7 +99,6 @@ class AWSDynamoDBTestCase(TestCase):
         create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
             client=client,
@@ -95,7 +113,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -103,7 +120,6 @@ class AWSDynamoDBTestCase(TestCase):
         create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
         )
@@ -117,7 +133,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -126,7 +141,6 @@ class AWSDynamoDBTestCase(TestCase):
         create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
             client=client,
@@ -138,7 +152,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -147,7 +160,6 @@ class AWSDynamoDBTestCase(TestCase):
         create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
             client=client,
@@ -161,7 +173,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -169,7 +180,6 @@ class AWSDynamoDBTestCase(TestCase):
         create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
         )
@@ -182,7 +192,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -191,7 +200,6 @@ class AWSDynamoDBTestCase(TestCase):
         create_dynamodb_table(
             options={
                 "pk": options["pk"],
-                "sk": options["sk"],
                 "table": options["table"],
             },
             client=client,
@@ -205,7 +213,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -217,7 +224,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -234,7 +240,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -246,7 +251,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -262,7 +266,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -274,7 +277,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -290,7 +292,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -302,7 +303,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -315,7 +315,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -327,7 +326,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -347,7 +345,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -359,7 +356,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -381,7 +377,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -393,7 +388,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -424,7 +418,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -436,7 +429,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -467,7 +459,6 @@ class AWSDynamoDBTestCase(TestCase):
 
         options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -479,7 +470,6 @@ class AWSDynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": options["pk"],
-                    "sk": options["sk"],
                     "table": options["table"],
                 },
                 client=client,
@@ -499,3 +489,202 @@ class AWSDynamoDBTestCase(TestCase):
 
         with self.assertRaises(DynamodbItemNotFound):
             resp = get_item(session_key=session_key)
+
+    # Update Item
+    @mock_dynamodb
+    def test_update_item_only_writes_dirty_keys(self):
+
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+        )
+
+        model = SessionDataModel("updatesessionkey")
+        model["a"] = 1
+        model["b"] = 2
+        model["c"] = {"large": "x" * 100}
+        insert_session_item(data=model)
+
+        model = get_item(session_key="updatesessionkey")
+        model["a"] = 3
+        model["d"] = [1, 2]
+        del model["b"]
+
+        resp = update_session_item(data=model)
+        self.assertEqual(resp["ResponseMetadata"]["HTTPStatusCode"], 200)
+
+        model = get_item(session_key="updatesessionkey")
+        self.assertEqual(model["a"], 3)
+        self.assertListEqual(model["d"], [1, 2])
+        self.assertEqual(model["c"], {"large": "x" * 100})
+        self.assertNotIn("b", model)
+
+    @mock_dynamodb
+    def test_update_item_without_changes_does_nothing(self):
+
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+        )
+
+        model = SessionDataModel("updatesessionkey")
+        model["a"] = 1
+        insert_session_item(data=model)
+
+        model = get_item(session_key="updatesessionkey")
+        self.assertIsNone(update_session_item(data=model))
+
+    @mock_dynamodb
+    def test_update_item_does_not_resurrect_deleted_item(self):
+
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+        )
+
+        model = SessionDataModel("updatesessionkey")
+        model["a"] = 1
+        insert_session_item(data=model)
+
+        model = get_item(session_key="updatesessionkey")
+        delete_session_item(data=model)
+
+        model["a"] = 2
+        with self.assertRaises(DynamodbItemNotFound):
+            update_session_item(data=model)
+        with self.assertRaises(DynamodbItemNotFound):
+            get_item(session_key="updatesessionkey")
+
+    @mock_dynamodb
+    def test_insert_item_must_create_is_a_single_conditional_put(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+
+        model = SessionDataModel("createsessionkey")
+        model["a"] = 1
+
+        with mock.patch.object(client, "get_item") as mock_get_item:
+            insert_session_item(data=model, ignore_duplicated=False, client=client)
+            with self.assertRaises(SessionKeyDuplicated):
+                insert_session_item(data=model, ignore_duplicated=False, client=client)
+            mock_get_item.assert_not_called()
+
+
+class AWSDynamoDBBatchTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def create_table(self):
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        return client
+
+    @mock_dynamodb
+    def test_batch_write_and_get_more_than_one_request(self):
+
+        client = self.create_table()
+
+        models = []
+        for i in range(130):
+            model = SessionDataModel(f"batchsessionkey{i:04d}")
+            model["index"] = i
+            models.append(model)
+
+        written = list(batch_write_sessions(puts=models, client=client))
+        self.assertEqual(sorted(written), sorted(m.session_key for m in models))
+
+        keys = [m.session_key for m in models] + ["notexistkey"]
+        loaded = {m.session_key: m for m in batch_get_sessions(keys, client=client)}
+        self.assertEqual(len(loaded), 130)
+        self.assertEqual(loaded["batchsessionkey0042"]["index"], 42)
+        self.assertFalse(loaded["batchsessionkey0042"].is_dirty)
+
+        deleted = list(
+            batch_write_sessions(deletes=keys[:100], client=client, max_workers=2)
+        )
+        self.assertEqual(len(deleted), 100)
+        self.assertEqual(len(list(batch_get_sessions(keys, client=client))), 30)
+
+    @mock_dynamodb
+    def test_batch_requests_dedupe_keys(self):
+
+        client = self.create_table()
+
+        first = SessionDataModel("dupsessionkey")
+        first["a"] = 1
+        second = SessionDataModel("dupsessionkey")
+        second["a"] = 2
+
+        written = list(batch_write_sessions(puts=[first, second], client=client))
+        self.assertEqual(written, ["dupsessionkey"])
+
+        loaded = list(
+            batch_get_sessions(["dupsessionkey", "dupsessionkey"], client=client)
+        )
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(loaded[0]["a"], 2)
+
+    @mock_dynamodb
+    def test_batch_get_retries_unprocessed_keys(self):
+
+        client = self.create_table()
+        model = SessionDataModel("retrysessionkey")
+        model["a"] = 1
+        insert_session_item(data=model, client=client)
+
+        real_batch_get_item = client.batch_get_item
+        responses = []
+
+        def batch_get_item(RequestItems, **kwargs):
+            if not responses:
+                responses.append(1)
+                return {"Responses": {}, "UnprocessedKeys": RequestItems}
+            return real_batch_get_item(RequestItems=RequestItems, **kwargs)
+
+        with mock.patch.object(client, "batch_get_item", batch_get_item), mock.patch(
+            "dysession.aws.dynamodb.time.sleep"
+        ) as mock_sleep:
+            loaded = list(batch_get_sessions(["retrysessionkey"], client=client))
+
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @mock_dynamodb
+    def test_batch_write_gives_up_after_max_retries(self):
+
+        client = self.create_table()
+        model = SessionDataModel("retrysessionkey")
+
+        def batch_write_item(RequestItems, **kwargs):
+            return {"UnprocessedItems": RequestItems}
+
+        with mock.patch.object(client, "batch_write_item", batch_write_item), mock.patch(
+            "dysession.aws.dynamodb.time.sleep"
+        ) as mock_sleep:
+            with self.assertRaises(DynamodbUnprocessedItems) as context:
+                list(batch_write_sessions(puts=[model], client=client, max_retries=3))
+
+        self.assertEqual(mock_sleep.call_count, 3)
+        self.assertIn("sessions", context.exception.unprocessed)
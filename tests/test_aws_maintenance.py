@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+import boto3
+from django.test import TestCase
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import (create_dynamodb_table, get_item,
+                                    insert_session_item)
+from dysession.aws.error import DynamodbItemNotFound
+from dysession.aws.maintenance import (ScanCheckpoint, TokenBucket,
+                                       clear_expired_sessions)
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+
+def create_sessions(client, expired: int, alive: int, untracked: int = 0):
+    create_dynamodb_table(
+        options={
+            "pk": get_config()["PARTITION_KEY_NAME"],
+            "table": "sessions",
+        },
+        client=client,
+    )
+
+    ttl = get_config()["TTL_ATTRIBUTE_NAME"]
+    now = int(datetime.now().timestamp())
+    for i in range(expired):
+        model = SessionDataModel(f"expiredsessionkey{i:04d}")
+        model[ttl] = now - 60
+        insert_session_item(data=model, client=client)
+    for i in range(alive):
+        model = SessionDataModel(f"alivesessionkey{i:04d}")
+        model[ttl] = now + 3600
+        insert_session_item(data=model, client=client)
+    for i in range(untracked):
+        insert_session_item(data=SessionDataModel(f"nottlsessionkey{i:04d}"), client=client)
+
+
+class TokenBucketTestCase(TestCase):
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_acquire_waits_for_refill(self):
+        clock = mock.Mock(return_value=0.0)
+        bucket = TokenBucket(10, clock=clock)
+
+        with mock.patch("dysession.aws.maintenance.time.sleep") as mock_sleep:
+            bucket.acquire(10)
+            mock_sleep.assert_not_called()
+
+            def sleep(seconds):
+                clock.return_value += seconds
+
+            mock_sleep.side_effect = sleep
+            bucket.acquire(5)
+            mock_sleep.assert_called_once_with(0.5)
+
+    def test_acquire_sleeps_without_the_lock(self):
+        clock = mock.Mock(return_value=0.0)
+        bucket = TokenBucket(10, clock=clock)
+        bucket.acquire(10)
+
+        def sleep(seconds):
+            self.assertFalse(bucket._lock.locked())
+            clock.return_value += seconds
+
+        with mock.patch("dysession.aws.maintenance.time.sleep", side_effect=sleep):
+            bucket.acquire(5)
+
+    def test_acquire_more_than_capacity_goes_into_debt(self):
+        clock = mock.Mock(return_value=0.0)
+        bucket = TokenBucket(10, clock=clock)
+
+        with mock.patch("dysession.aws.maintenance.time.sleep") as mock_sleep:
+            bucket.acquire(25)
+            mock_sleep.assert_not_called()
+
+
+class ScanCheckpointTestCase(TestCase):
+    def test_checkpoint_is_persisted_and_reloaded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.json")
+
+            checkpoint = ScanCheckpoint(2, path)
+            checkpoint.update(0, {"PK": {"S": "somesessionkey"}})
+            checkpoint.update(1, None)
+
+            reloaded = ScanCheckpoint(2, path)
+            self.assertEqual(reloaded.start_key(0), {"PK": {"S": "somesessionkey"}})
+            self.assertFalse(reloaded.is_done(0))
+            self.assertTrue(reloaded.is_done(1))
+
+            with self.assertRaises(ValueError):
+                ScanCheckpoint(4, path)
+
+            reloaded.clear()
+            self.assertFalse(os.path.exists(path))
+
+
+# moto ignores Segment / TotalSegments and returns the whole table to every
+# segment, tests counting deletions therefore scan a single segment
+class ClearExpiredSessionsTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def test_only_expired_sessions_are_deleted(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_sessions(client, expired=40, alive=10, untracked=5)
+
+        progress = mock.Mock()
+        deleted = clear_expired_sessions(
+            client=client, total_segments=1, page_size=7, progress=progress
+        )
+
+        self.assertEqual(deleted, 40)
+        self.assertEqual(progress.call_args[0], (40, 40))
+        self.assertEqual(client.scan(TableName="sessions")["Count"], 15)
+        with self.assertRaises(DynamodbItemNotFound):
+            get_item("expiredsessionkey0000", client=client)
+        get_item("alivesessionkey0000", client=client)
+        get_item("nottlsessionkey0000", client=client)
+
+    @mock_dynamodb
+    def test_scan_is_key_only_and_filtered_on_ttl(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_sessions(client, expired=1, alive=1)
+
+        with mock.patch.object(client, "scan", wraps=client.scan) as mock_scan:
+            clear_expired_sessions(client=client, total_segments=2)
+
+        self.assertEqual(mock_scan.call_count, 2)
+        for call in mock_scan.call_args_list:
+            self.assertEqual(call.kwargs["ProjectionExpression"], "#pk")
+            self.assertEqual(call.kwargs["FilterExpression"], "#ttl < :now")
+            self.assertEqual(call.kwargs["TotalSegments"], 2)
+        self.assertEqual(
+            sorted(call.kwargs["Segment"] for call in mock_scan.call_args_list), [0, 1]
+        )
+
+    @mock_dynamodb
+    def test_resume_from_checkpoint(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_sessions(client, expired=10, alive=0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.json")
+
+            real_scan = client.scan
+            pages = []
+
+            def interrupted_scan(**kwargs):
+                if pages:
+                    raise KeyboardInterrupt
+                pages.append(1)
+                return real_scan(**kwargs)
+
+            with mock.patch.object(client, "scan", interrupted_scan):
+                with self.assertRaises(KeyboardInterrupt):
+                    clear_expired_sessions(
+                        client=client, total_segments=1, page_size=4, checkpoint_path=path
+                    )
+
+            with open(path) as f:
+                self.assertIsNotNone(json.load(f)["segments"]["0"]["LastEvaluatedKey"])
+
+            deleted = clear_expired_sessions(
+                client=client, total_segments=1, page_size=4, checkpoint_path=path
+            )
+            self.assertEqual(deleted, 6)
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(client.scan(TableName="sessions")["Count"], 0)
+
+    @mock_dynamodb
+    def test_expired_before_now(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_sessions(client, expired=3, alive=2)
+
+        deleted = clear_expired_sessions(
+            client=client, total_segments=1, now=datetime.now() + timedelta(hours=2)
+        )
+        self.assertEqual(deleted, 5)
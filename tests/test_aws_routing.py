@@ -0,0 +1,137 @@
+import logging
+import os
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError, ConnectTimeoutError
+from django.test import TestCase, override_settings
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import (
+    DynamoDB,
+    create_dynamodb_table,
+    insert_session_item,
+    key_exists,
+)
+from dysession.aws.routing import RegionRouter, get_router, is_failover_error
+from dysession.backends.db import SessionStore
+from dysession.backends.error import SessionKeyDuplicated
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+REGIONS = ["eu-west-1", "us-east-1"]
+
+
+def throttled(**kwargs):
+    raise ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": ""}}, "GetItem"
+    )
+
+
+class RegionRouterTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def create_tables(self):
+        # one table per region, moto does not replicate global tables
+        clients = {}
+        for region in REGIONS:
+            clients[region] = boto3.client("dynamodb", region_name=region)
+            create_dynamodb_table(
+                options={
+                    "pk": get_config()["PARTITION_KEY_NAME"],
+                    "table": get_config()["DYNAMODB_TABLENAME"],
+                },
+                client=clients[region],
+            )
+        return clients
+
+    def router(self, clients, **kwargs):
+        return RegionRouter(
+            REGIONS, client_factory=lambda region, profile: clients[region], **kwargs
+        )
+
+    def test_is_failover_error(self):
+        self.assertTrue(is_failover_error(ConnectTimeoutError(endpoint_url="")))
+        with self.assertRaises(ClientError) as cm:
+            throttled()
+        self.assertTrue(is_failover_error(cm.exception))
+        self.assertFalse(is_failover_error(ValueError()))
+
+    @mock_dynamodb
+    def test_calls_go_to_the_preferred_region(self):
+        clients = self.create_tables()
+        router = self.router(clients)
+
+        insert_session_item(SessionDataModel("routedsessionkey"), client=router)
+
+        self.assertTrue(key_exists("routedsessionkey", client=clients["eu-west-1"]))
+        self.assertFalse(key_exists("routedsessionkey", client=clients["us-east-1"]))
+        self.assertEqual(router.health()["eu-west-1"]["calls"], 1)
+
+    @mock_dynamodb
+    def test_failover_and_recovery(self):
+        clients = self.create_tables()
+        now = [0.0]
+        router = self.router(clients, cooldown=30, clock=lambda: now[0])
+        insert_session_item(
+            SessionDataModel("replicatedsessionkey"), client=clients["us-east-1"]
+        )
+
+        db = DynamoDB(router, cache=None)
+        with mock.patch.object(clients["eu-west-1"], "get_item", side_effect=throttled):
+            for _ in range(4):
+                db.get("replicatedsessionkey")
+
+        health = router.health()
+        self.assertLess(health["eu-west-1"]["score"], 0.5)
+        self.assertFalse(health["eu-west-1"]["healthy"])
+        self.assertEqual(health["us-east-1"]["calls"], 4)
+        # cooling down, the preferred region is tried last
+        self.assertEqual(router.order(), ["us-east-1", "eu-west-1"])
+
+        now[0] = 31.0
+        self.assertEqual(router.order(), REGIONS)
+
+    @mock_dynamodb
+    def test_every_region_failing_raises_the_last_error(self):
+        clients = self.create_tables()
+        router = self.router(clients)
+
+        with mock.patch.object(
+            clients["eu-west-1"], "get_item", side_effect=throttled
+        ), mock.patch.object(clients["us-east-1"], "get_item", side_effect=throttled):
+            with self.assertRaises(ClientError):
+                router.get_item(
+                    TableName=get_config()["DYNAMODB_TABLENAME"],
+                    Key={get_config()["PARTITION_KEY_NAME"]: {"S": "x"}},
+                )
+
+    @mock_dynamodb
+    def test_request_errors_are_not_failed_over(self):
+        clients = self.create_tables()
+        router = self.router(clients)
+        db = DynamoDB(router, cache=None)
+
+        db.set(SessionDataModel("conflictsessionkey"), ignore_duplicated=False)
+        with self.assertRaises(SessionKeyDuplicated):
+            db.set(SessionDataModel("conflictsessionkey"), ignore_duplicated=False)
+
+        self.assertEqual(router.health()["us-east-1"]["calls"], 0)
+        self.assertEqual(router.health()["eu-west-1"]["score"], 1.0)
+
+    def test_get_router(self):
+        self.assertIsNone(get_router())
+
+        with override_settings(
+            DYSESSION={"DYNAMODB_REGION": "eu-west-1", "ROUTING": {"REGIONS": REGIONS}}
+        ), mock.patch.dict(os.environ, {"AWS_REGION": "us-east-1"}):
+            router = get_router()
+            self.assertIs(router, get_router())
+            self.assertEqual(router.regions, ["us-east-1", "eu-west-1"])
+            # the async methods go through the router too
+            self.assertFalse(SessionStore(None).native_async)
+        self.assertTrue(SessionStore(None).native_async)
@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime
+
+import boto3
+from django.test import TestCase
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import create_dynamodb_table, insert_session_item
+from dysession.aws.error import DynamodbTableNotFound
+from dysession.aws.stats import (TableStats, attribute_value_size,
+                                 collect_table_stats, item_size)
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+
+class ItemSizeTestCase(TestCase):
+    def test_attribute_value_size(self):
+        self.assertEqual(attribute_value_size({"S": "abc"}), 3)
+        self.assertEqual(attribute_value_size({"S": "é"}), 2)
+        self.assertEqual(attribute_value_size({"N": "12345"}), 4)
+        self.assertEqual(attribute_value_size({"N": "0"}), 2)
+        self.assertEqual(attribute_value_size({"B": b"\x00\x01"}), 2)
+        self.assertEqual(attribute_value_size({"BOOL": True}), 1)
+        self.assertEqual(attribute_value_size({"NULL": True}), 1)
+        self.assertEqual(attribute_value_size({"SS": ["a", "bc"]}), 3)
+        self.assertEqual(attribute_value_size({"L": [{"S": "a"}, {"S": "b"}]}), 7)
+        self.assertEqual(attribute_value_size({"M": {"k": {"S": "v"}}}), 6)
+
+    def test_item_size_counts_attribute_names(self):
+        self.assertEqual(item_size({"PK": {"S": "abcd"}, "a": {"N": "1"}}), 9)
+
+
+class TableStatsTestCase(TestCase):
+    def test_add_page(self):
+        now = datetime.now()
+        timestamp = int(now.timestamp())
+        stats = TableStats(now=now)
+        stats.add_page(
+            [
+                {"PK": {"S": "a"}, "ttl": {"N": str(timestamp - 10)}, "x": {"S": "1"}},
+                {"PK": {"S": "b"}, "ttl": {"N": str(timestamp + 100)}},
+            ]
+        )
+        stats.add_page([{"PK": {"S": "c"}, "x": {"S": "y" * 3000}}])
+
+        summary = stats.summary()
+        self.assertEqual(summary["items"], 3)
+        self.assertEqual(summary["expired"], 1)
+        self.assertAlmostEqual(summary["expired_ratio"], 1 / 3)
+        self.assertEqual(summary["without_ttl"], 1)
+        self.assertEqual(summary["attributes"], {"x": 2, "ttl": 2})
+        self.assertEqual(summary["size_histogram"]["<=256"], 2)
+        self.assertEqual(summary["size_histogram"]["<=4096"], 1)
+        self.assertEqual(summary["ttl_histogram"]["<=0"], 1)
+        self.assertEqual(summary["ttl_histogram"]["<=3600"], 1)
+        self.assertEqual(summary["capacity"]["wcu_per_save"], 5 / 3)
+        self.assertEqual(summary["capacity"]["rcu_per_load"], 0.5)
+
+    def test_empty_summary(self):
+        summary = TableStats().summary()
+        self.assertEqual(summary["items"], 0)
+        self.assertEqual(summary["expired_ratio"], 0)
+
+
+class CollectTableStatsTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def test_collect_table_stats(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        for i in range(25):
+            model = SessionDataModel(f"statssessionkey{i:04d}")
+            model["a"] = i
+            insert_session_item(data=model, client=client)
+
+        # moto returns the whole table to every segment, see test_aws_maintenance
+        stats = collect_table_stats(client=client, total_segments=1, page_size=10)
+
+        self.assertEqual(stats.items, 25)
+        self.assertEqual(stats.attributes["a"], 25)
+        self.assertEqual(stats.without_ttl, 25)
+
+    @mock_dynamodb
+    def test_table_not_exist(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        with self.assertRaises(DynamodbTableNotFound):
+            collect_table_stats(table_name="notexist", client=client)
@@ -0,0 +1,247 @@
+import logging
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from django.test import TestCase, override_settings
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table, key_exists
+from dysession.aws.write_behind import (
+    WriteBehindQueue,
+    close_write_behind,
+    get_write_behind,
+)
+from dysession.backends.db import SessionStore
+from dysession.backends.error import SessionKeyDoesNotExist, SessionKeyDuplicated
+from dysession.backends.model import SessionDataModel
+from dysession.metrics import get_registry
+from dysession.settings import get_config
+
+
+class WriteBehindQueueTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def create_table(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+        return client
+
+    @mock_dynamodb
+    def test_coalesce_writes_of_a_session(self):
+        client = self.create_table()
+        queue = WriteBehindQueue(client=client, flush_interval=0.2)
+        table_name = get_config()["DYNAMODB_TABLENAME"]
+
+        model = SessionDataModel("writebehindsessionkey")
+        with mock.patch.object(
+            client, "batch_write_item", wraps=client.batch_write_item
+        ) as batch_write_item:
+            for value in range(3):
+                model["a"] = value
+                self.assertTrue(queue.put(model, table_name))
+            # a copy is queued, later changes of the model are not
+            model["a"] = 100
+
+            queued, pending = queue.get("writebehindsessionkey", table_name)
+            self.assertTrue(queued)
+            self.assertEqual(pending["a"], 2)
+
+            self.assertTrue(queue.flush(timeout=5))
+            queue.close(timeout=5)
+
+        batch_write_item.assert_called_once()
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.get("writebehindsessionkey", table_name), (False, None))
+        self.assertEqual(
+            DynamoDB(client, cache=None).get("writebehindsessionkey")["a"], 2
+        )
+        # closed, writes are no longer queued
+        self.assertFalse(queue.put(model, table_name))
+
+    @mock_dynamodb
+    def test_delete_is_queued(self):
+        client = self.create_table()
+        table_name = get_config()["DYNAMODB_TABLENAME"]
+        db = DynamoDB(client, cache=None)
+        db.set(SessionDataModel("deletedsessionkey"))
+
+        queue = WriteBehindQueue(client=client, flush_interval=0)
+        self.assertTrue(queue.delete("deletedsessionkey", table_name))
+        self.assertEqual(queue.get("deletedsessionkey", table_name)[1], None)
+        queue.close(timeout=5)
+
+        self.assertFalse(key_exists("deletedsessionkey", client=client))
+
+    def test_backpressure(self):
+        queue = WriteBehindQueue(client=mock.Mock(), max_entries=1, block_timeout=0)
+        with mock.patch.object(queue, "_ensure_thread"):
+            self.assertTrue(queue.put(SessionDataModel("firstsessionkey"), "sessions"))
+            # the same session is coalesced in place
+            self.assertTrue(queue.put(SessionDataModel("firstsessionkey"), "sessions"))
+            self.assertFalse(queue.put(SessionDataModel("secondsessionkey"), "sessions"))
+        self.assertEqual(len(queue), 1)
+
+    def test_backpressure_never_refuses_a_queued_session(self):
+        queue = WriteBehindQueue(client=mock.Mock(), max_entries=1, block_timeout=0)
+        with mock.patch.object(queue, "_ensure_thread"):
+            queue.put(SessionDataModel("inflightsessionkey"), "sessions")
+            # taken by the flusher
+            queue._in_flight, queue._pending = queue._pending, {}
+            queue.put(SessionDataModel("othersessionkey"), "sessions")
+
+            # a write through could land before the one in flight
+            model = SessionDataModel("inflightsessionkey")
+            model["a"] = 1
+            self.assertTrue(queue.put(model, "sessions"))
+            self.assertFalse(queue.put(SessionDataModel("newsessionkey"), "sessions"))
+
+    def test_superseded_writes_are_not_retried(self):
+        queue = WriteBehindQueue(client=mock.Mock())
+        stale = mock.Mock(attempts=0)
+        # written through since the failed batch was sent
+        queue._in_flight[("sessions", "supersededsessionkey")] = mock.Mock(attempts=0)
+
+        queue._retry("sessions", [("supersededsessionkey", stale)], ValueError())
+        self.assertEqual(len(queue._pending), 0)
+
+    def test_forked_child_starts_empty(self):
+        client = mock.Mock()
+        queue = WriteBehindQueue(client=client)
+        with mock.patch.object(queue, "_ensure_thread"):
+            queue.put(SessionDataModel("parentsessionkey"), "sessions")
+        condition = queue._condition
+
+        with mock.patch("dysession.aws.write_behind.os.getpid", return_value=-1):
+            # what the parent queued is not written again at the child's exit
+            queue.close(timeout=5)
+            self.assertEqual(len(queue), 0)
+        self.assertIsNot(queue._condition, condition)
+        client.batch_write_item.assert_not_called()
+
+    def test_failed_writes_are_retried_then_dropped(self):
+        client = mock.Mock()
+        client.batch_write_item.side_effect = ClientError(
+            {"Error": {"Code": "InternalServerError", "Message": ""}}, "BatchWriteItem"
+        )
+        queue = WriteBehindQueue(client=client, flush_interval=0, max_attempts=2)
+        queue.put(SessionDataModel("failingsessionkey"), "sessions")
+
+        self.assertTrue(queue.flush(timeout=5))
+        queue.close(timeout=5)
+        self.assertEqual(client.batch_write_item.call_count, 2)
+        self.assertEqual(queue.dropped, 1)
+
+
+class DynamoDBWriteBehindTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        get_registry().reset()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        get_registry().reset()
+
+    create_table = WriteBehindQueueTestCase.create_table
+
+    @mock_dynamodb
+    def test_read_your_writes(self):
+        client = self.create_table()
+        queue = WriteBehindQueue(client=client, flush_interval=0.2)
+        db = DynamoDB(client, cache=None, write_behind=queue)
+
+        model = SessionDataModel("queuedsessionkey")
+        model["a"] = 1
+        with mock.patch.object(client, "put_item", wraps=client.put_item) as put_item:
+            db.set(model)
+        put_item.assert_not_called()
+        self.assertFalse(model.is_dirty)
+        self.assertEqual(get_registry().count("save", outcome="queued"), 1)
+
+        self.assertEqual(db.get("queuedsessionkey")["a"], 1)
+        self.assertTrue(db.exists("queuedsessionkey"))
+
+        db.delete(model)
+        with self.assertRaises(SessionKeyDoesNotExist):
+            db.get("queuedsessionkey")
+        self.assertFalse(db.exists("queuedsessionkey"))
+
+        queue.close(timeout=5)
+        self.assertFalse(key_exists("queuedsessionkey", client=client))
+
+    @mock_dynamodb
+    def test_new_sessions_are_created_synchronously(self):
+        client = self.create_table()
+        queue = WriteBehindQueue(client=client)
+        db = DynamoDB(client, cache=None, write_behind=queue)
+
+        db.set(SessionDataModel("createdsessionkey"), ignore_duplicated=False)
+        self.assertEqual(len(queue), 0)
+        self.assertTrue(key_exists("createdsessionkey", client=client))
+        with self.assertRaises(SessionKeyDuplicated):
+            db.set(SessionDataModel("createdsessionkey"), ignore_duplicated=False)
+
+    @mock_dynamodb
+    def test_write_through_when_the_queue_is_full(self):
+        client = self.create_table()
+        queue = WriteBehindQueue(client=client, max_entries=1, block_timeout=0)
+        db = DynamoDB(client, cache=None, write_behind=queue)
+
+        with mock.patch.object(queue, "_ensure_thread"):
+            db.set(SessionDataModel("firstsessionkey"))
+            db.set(SessionDataModel("secondsessionkey"))
+
+        self.assertFalse(key_exists("firstsessionkey", client=client))
+        self.assertTrue(key_exists("secondsessionkey", client=client))
+        self.assertEqual(get_registry().count("save", outcome="backpressure"), 1)
+
+    @mock_dynamodb
+    def test_session_store(self):
+        client = self.create_table()
+        with override_settings(DYSESSION={"WRITE_BEHIND": {"ENABLED": True}}):
+            with mock.patch(
+                "dysession.backends.db.get_client", return_value=client
+            ), mock.patch("dysession.aws.write_behind.get_client", return_value=client):
+                self.assertIs(get_write_behind(), get_write_behind())
+
+                session = SessionStore(None)
+                session["a"] = 1
+                session.save()
+                session["a"] = 2
+                session.save()
+
+                self.assertEqual(SessionStore(session.session_key)["a"], 2)
+                close_write_behind()
+
+            self.assertEqual(
+                DynamoDB(client, cache=None).get(session.session_key)["a"], 2
+            )
+        self.assertIsNone(get_write_behind())
+
+    async def test_session_store_async_methods_see_queued_writes(self):
+        with mock_dynamodb(), override_settings(
+            DYSESSION={"WRITE_BEHIND": {"ENABLED": True, "FLUSH_INTERVAL": 1}}
+        ):
+            client = self.create_table()
+            with mock.patch(
+                "dysession.backends.db.get_client", return_value=client
+            ), mock.patch("dysession.aws.write_behind.get_client", return_value=client):
+                session = SessionStore(None)
+                self.assertFalse(session.native_async)
+                await session.asave()
+                session["a"] = 1
+                await session.asave()
+
+                self.assertEqual(len(get_write_behind()), 1)
+                self.assertEqual((await SessionStore(session.session_key).aload())["a"], 1)
+                close_write_behind()
@@ -0,0 +1,152 @@
+import logging
+from datetime import datetime
+from unittest import mock
+
+import boto3
+from django.core.cache import caches
+from django.test import TestCase
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table, insert_session_item
+from dysession.backends.cached_db import SessionStore
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+
+class CachedDBSessionStoreTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        caches["default"].clear()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def create_dynamodb_table(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+
+    @mock_dynamodb
+    def test_save_writes_to_dynamodb_and_cache(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore()
+        store["a"] = 1
+        store.save()
+
+        self.assertEqual(caches["default"].get(store.cache_key)["a"], 1)
+        self.assertEqual(DynamoDB().get(store.session_key)["a"], 1)
+
+    @mock_dynamodb
+    def test_load_is_served_from_cache(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore()
+        store["a"] = 1
+        store.save()
+
+        with mock.patch.object(DynamoDB, "get") as mock_get:
+            self.assertEqual(SessionStore(store.session_key)["a"], 1)
+            mock_get.assert_not_called()
+
+    @mock_dynamodb
+    def test_cache_miss_falls_back_to_dynamodb(self):
+        self.create_dynamodb_table()
+        model = SessionDataModel("cacheddbsession")
+        model["a"] = 1
+        insert_session_item(data=model)
+
+        store = SessionStore("cacheddbsession")
+        self.assertEqual(store["a"], 1)
+        self.assertEqual(caches["default"].get(store.cache_key)["a"], 1)
+
+    @mock_dynamodb
+    def test_expired_cached_session_is_discarded(self):
+        self.create_dynamodb_table()
+        caches["default"].set(
+            SessionStore.cache_key_prefix + "cacheddbsession",
+            {
+                "a": 1,
+                get_config()["TTL_ATTRIBUTE_NAME"]: int(datetime.now().timestamp()) - 10,
+            },
+        )
+
+        store = SessionStore("cacheddbsession")
+        self.assertNotIn("a", store)
+        self.assertIsNone(store.session_key)
+
+    @mock_dynamodb
+    def test_exists(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore()
+        store["a"] = 1
+        store.save()
+
+        self.assertTrue(store.exists(store.session_key))
+        self.assertFalse(store.exists("notexistsessionkey"))
+
+    @mock_dynamodb
+    def test_delete_removes_cache_and_item(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore()
+        store["a"] = 1
+        store.save()
+        session_key = store.session_key
+
+        store.delete()
+
+        self.assertIsNone(caches["default"].get(SessionStore.cache_key_prefix + session_key))
+        self.assertFalse(DynamoDB().exists(session_key))
+
+    async def test_async_delete_removes_cache_and_item(self):
+        with mock_dynamodb():
+            self.create_dynamodb_table()
+
+            store = SessionStore()
+            store["_auth_user_id"] = "1"
+            await store.asave()
+            session_key = store.session_key
+
+            # logout
+            await store.adelete()
+
+            self.assertIsNone(
+                caches["default"].get(SessionStore.cache_key_prefix + session_key)
+            )
+            self.assertFalse(DynamoDB().exists(session_key))
+            self.assertNotIn("_auth_user_id", SessionStore(session_key))
+
+    async def test_async_save_updates_cache(self):
+        with mock_dynamodb():
+            self.create_dynamodb_table()
+
+            store = SessionStore()
+            store["a"] = 1
+            await store.asave()
+            store["a"] = 2
+            await store.asave()
+
+            self.assertEqual(caches["default"].get(store.cache_key)["a"], 2)
+            self.assertEqual((await SessionStore(store.session_key).aload())["a"], 2)
+
+    @mock_dynamodb
+    def test_flush(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore()
+        store["a"] = 1
+        store.save()
+        session_key = store.session_key
+
+        store.flush()
+
+        self.assertIsNone(store.session_key)
+        self.assertFalse(store.exists(session_key))
@@ -2,9 +2,12 @@ import logging
 import time
 from datetime import datetime
 from typing import Any
+from unittest import mock
 
 import boto3
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.test import TestCase, override_settings
 from moto import mock_dynamodb
 from parameterized import parameterized
 
@@ -13,6 +16,7 @@ from dysession.aws.dynamodb import (
     check_dynamodb_table_exists,
     create_dynamodb_table,
     get_item,
+    get_skipped_writes,
     insert_session_item,
 )
 from dysession.aws.error import DynamodbItemNotFound, DynamodbTableNotFound
@@ -21,8 +25,9 @@ from dysession.backends.error import (
     SessionKeyDoesNotExist,
     SessionKeyDuplicated,
 )
+from dysession.backends.db import SessionStore
 from dysession.backends.model import SessionDataModel
-from dysession.settings import get_config
+from dysession.settings import DysessionSettings, get_config
 
 
 class DynamoDBTestCase(TestCase):
@@ -36,7 +41,6 @@ class DynamoDBTestCase(TestCase):
     def create_dynamodb_table(self):
         self.options = {
             "pk": get_config()["PARTITION_KEY_NAME"],
-            "sk": get_config()["SORT_KEY_NAME"],
             "table": "sessions",
             "region": "ap-northeast-1",
         }
@@ -50,7 +54,6 @@ class DynamoDBTestCase(TestCase):
             create_dynamodb_table(
                 options={
                     "pk": self.options["pk"],
-                    "sk": self.options["sk"],
                     "table": self.options["table"],
                 },
                 client=client,
@@ -284,3 +287,341 @@ class DynamoDBTestCase(TestCase):
 
         db = DynamoDB(self.client)
         db.delete(model)
+
+
+class SessionStoreTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def create_dynamodb_table(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+
+    @mock_dynamodb
+    def test_init_does_not_load_session(self):
+        with mock.patch.object(DynamoDB, "get") as mock_get:
+            store = SessionStore("lazysessionkey")
+            mock_get.assert_not_called()
+
+        self.assertFalse(store.accessed)
+        self.assertFalse(store.is_loaded)
+
+    @mock_dynamodb
+    def test_first_access_loads_session_once(self):
+        self.create_dynamodb_table()
+        model = SessionDataModel("lazysessionkey")
+        model["a"] = 1
+        insert_session_item(data=model)
+
+        store = SessionStore("lazysessionkey")
+        with mock.patch.object(DynamoDB, "get", wraps=store.db.get) as mock_get:
+            self.assertEqual(store["a"], 1)
+            self.assertEqual(store["a"], 1)
+            mock_get.assert_called_once()
+
+        self.assertTrue(store.accessed)
+        self.assertTrue(store.is_loaded)
+
+    @mock_dynamodb
+    def test_data_set_before_create_is_saved(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore(None)
+        store["a"] = 1
+        store.save()
+
+        self.assertIsNotNone(store.session_key)
+        self.assertEqual(SessionStore(store.session_key)["a"], 1)
+
+
+class SessionStoreTTLTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    create_dynamodb_table = SessionStoreTestCase.create_dynamodb_table
+
+    def stored_ttl(self, session_key: str) -> int:
+        return int(get_item(session_key)[get_config()["TTL_ATTRIBUTE_NAME"]])
+
+    @mock_dynamodb
+    def test_save_writes_the_expiry_age(self):
+        self.create_dynamodb_table()
+
+        store = SessionStore(None)
+        store["a"] = 1
+        store.save()
+        self.assertAlmostEqual(
+            self.stored_ttl(store.session_key),
+            time.time() + settings.SESSION_COOKIE_AGE,
+            delta=5,
+        )
+
+        store = SessionStore(store.session_key)
+        store.set_expiry(60)
+        store.save()
+        self.assertAlmostEqual(
+            self.stored_ttl(store.session_key), time.time() + 60, delta=5
+        )
+
+    @mock_dynamodb
+    def test_sliding_refresh(self):
+        self.create_dynamodb_table()
+        store = SessionStore(None)
+        store.set_expiry(100)
+        store.save()
+        ttl = self.stored_ttl(store.session_key)
+        now = time.time()
+
+        # more than TTL_REFRESH_FRACTION of the lifetime is left, nothing is written
+        skipped = get_skipped_writes()
+        with mock.patch("dysession.backends.db.time.time", return_value=now + 40):
+            SessionStore(store.session_key).save()
+        self.assertEqual(get_skipped_writes(), skipped + 1)
+        self.assertEqual(self.stored_ttl(store.session_key), ttl)
+
+        with mock.patch("dysession.backends.db.time.time", return_value=now + 60):
+            SessionStore(store.session_key).save()
+        self.assertEqual(self.stored_ttl(store.session_key), int(now + 60) + 100)
+
+
+class DynamoDBPartialWriteTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def create_dynamodb_table(self):
+        self.client = boto3.client(
+            "dynamodb", region_name=get_config()["DYNAMODB_REGION"]
+        )
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=self.client,
+        )
+
+    @mock_dynamodb
+    def test_new_model_is_put_and_loaded_model_is_updated(self):
+        self.create_dynamodb_table()
+        db = DynamoDB(self.client)
+
+        model = SessionDataModel("partialwritekey")
+        model["a"] = 1
+        model["b"] = 2
+        with mock.patch.object(
+            self.client, "put_item", wraps=self.client.put_item
+        ) as mock_put, mock.patch.object(
+            self.client, "update_item", wraps=self.client.update_item
+        ) as mock_update:
+            db.set(model)
+            mock_put.assert_called_once()
+            mock_update.assert_not_called()
+            self.assertFalse(model.is_dirty)
+
+            model = db.get("partialwritekey")
+            model["a"] = 3
+            db.set(model)
+            mock_put.assert_called_once()
+            mock_update.assert_called_once()
+
+            # nothing changed, nothing to write
+            db.set(model)
+            mock_update.assert_called_once()
+
+        model = db.get("partialwritekey")
+        self.assertEqual(model["a"], 3)
+        self.assertEqual(model["b"], 2)
+
+    @mock_dynamodb
+    def test_vanished_item_is_written_back_whole(self):
+        self.create_dynamodb_table()
+        db = DynamoDB(self.client)
+
+        model = SessionDataModel("partialwritekey")
+        model["a"] = 1
+        model["b"] = 2
+        db.set(model)
+
+        model = db.get("partialwritekey")
+        db.delete(model)
+        model["a"] = 3
+        db.set(model)
+
+        model = db.get("partialwritekey")
+        self.assertEqual(model["a"], 3)
+        self.assertEqual(model["b"], 2)
+
+    @mock_dynamodb
+    def test_unchanged_content_is_not_written(self):
+        self.create_dynamodb_table()
+        db = DynamoDB(self.client)
+
+        model = SessionDataModel("partialwritekey")
+        model["a"] = 1
+        model["cart"] = [1, 2]
+        db.set(model)
+
+        model = db.get("partialwritekey")
+        skipped = get_skipped_writes()
+        with mock.patch.object(
+            self.client, "update_item", wraps=self.client.update_item
+        ) as mock_update:
+            model["a"] = 1
+            db.set(model)
+            mock_update.assert_not_called()
+            self.assertEqual(get_skipped_writes(), skipped + 1)
+
+            model["cart"].append(3)
+            db.set(model)
+            mock_update.assert_called_once()
+
+        self.assertListEqual(db.get("partialwritekey")["cart"], [1, 2, 3])
+
+
+class SessionStoreCreateTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def test_create_retries_on_key_collision(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+        model = SessionDataModel("collidingsessionkey")
+        model["owner"] = "someone else"
+        insert_session_item(data=model)
+
+        store = SessionStore(None)
+        store["owner"] = "me"
+        with mock.patch.object(
+            SessionStore,
+            "_get_new_session_key",
+            side_effect=["collidingsessionkey", "freshsessionkey"],
+        ):
+            store.save()
+
+        self.assertEqual(store.session_key, "freshsessionkey")
+        self.assertEqual(DynamoDB().get("collidingsessionkey")["owner"], "someone else")
+        self.assertEqual(DynamoDB().get("freshsessionkey")["owner"], "me")
+
+    @mock_dynamodb
+    def test_save_must_create_raises_create_error(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+        insert_session_item(data=SessionDataModel("collidingsessionkey"))
+
+        store = SessionStore("collidingsessionkey")
+        with self.assertRaises(CreateError):
+            store.save(must_create=True)
+
+    @mock_dynamodb
+    def test_create_does_not_look_up_the_new_key(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+
+        store = SessionStore(None)
+        with mock.patch.object(DynamoDB, "exists") as mock_exists:
+            store.create()
+            mock_exists.assert_not_called()
+
+        self.assertTrue(DynamoDB().exists(store.session_key))
+
+    # moto ignores Segment / TotalSegments, a single segment is scanned
+    @override_settings(
+        DYSESSION={
+            "CLEAR_EXPIRED": {"SEGMENTS": 1, "READ_CAPACITY": 1000, "WRITE_CAPACITY": 1000}
+        }
+    )
+    @mock_dynamodb
+    def test_clear_expired_deletes_expired_sessions(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+        ttl = get_config()["TTL_ATTRIBUTE_NAME"]
+        now = int(time.time())
+        expired = SessionDataModel("expiredsessionkey")
+        expired[ttl] = now - 60
+        alive = SessionDataModel("alivesessionkey")
+        alive[ttl] = now + 3600
+        for model in (expired, alive):
+            insert_session_item(data=model, client=client)
+
+        SessionStore.clear_expired()
+
+        self.assertFalse(DynamoDB(client).exists("expiredsessionkey"))
+        self.assertTrue(DynamoDB(client).exists("alivesessionkey"))
+
+
+class DynamoDBConfigInjectionTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def test_injected_settings_are_used(self):
+        config = DysessionSettings.from_config(
+            {**get_config(), "DYNAMODB_TABLENAME": "injected", "PARTITION_KEY_NAME": "id"}
+        )
+        client = boto3.client("dynamodb", region_name=config.region)
+        create_dynamodb_table(
+            options={"pk": "id", "table": "injected"},
+            client=client,
+        )
+
+        db = DynamoDB(client=client, config=config)
+        model = SessionDataModel("injectedsessionkey", partition_key_name="id")
+        model["a"] = 1
+        with mock.patch("dysession.aws.codec.get_settings") as mock_get_settings:
+            db.set(model)
+            self.assertEqual(db.get("injectedsessionkey")["a"], 1)
+            self.assertTrue(db.exists("injectedsessionkey"))
+            mock_get_settings.assert_not_called()
+
+        self.assertIn(
+            "Item",
+            client.get_item(TableName="injected", Key={"id": {"S": "injectedsessionkey"}}),
+        )
@@ -0,0 +1,218 @@
+import logging
+import threading
+from unittest import mock
+
+import boto3
+from django.test import TestCase, override_settings
+from moto import mock_dynamodb
+from parameterized import parameterized
+
+from dysession.aws import dynamodb
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table, insert_session_item
+from dysession.backends.local_cache import LocalSessionCache, get_local_cache
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_model(session_key: str, **data) -> SessionDataModel:
+    model = SessionDataModel(session_key)
+    for k, v in data.items():
+        model[k] = v
+    return model
+
+
+class LocalSessionCacheTestCase(TestCase):
+    def test_get_returns_none_on_miss(self):
+        cache = LocalSessionCache(ttl=10)
+        self.assertIsNone(cache.get("missing", "sessions"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_get_returns_a_copy_of_snapshot(self):
+        cache = LocalSessionCache(ttl=10)
+        cache.set(make_model("key", a=1, b=[1, 2]), "sessions")
+
+        model = cache.get("key", "sessions")
+        self.assertEqual(model["a"], 1)
+        self.assertEqual(model.session_key, "key")
+
+        model["b"].append(3)
+        self.assertListEqual(cache.get("key", "sessions")["b"], [1, 2])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_tables_do_not_share_entries(self):
+        cache = LocalSessionCache(ttl=10)
+        cache.set(make_model("key", a=1), "sessions")
+        self.assertIsNone(cache.get("key", "other"))
+
+    def test_entry_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = LocalSessionCache(ttl=10, clock=clock)
+        cache.set(make_model("key", a=1), "sessions")
+
+        clock.now = 9
+        self.assertIsNotNone(cache.get("key", "sessions"))
+        clock.now = 10
+        self.assertIsNone(cache.get("key", "sessions"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_invalidate(self):
+        cache = LocalSessionCache(ttl=10)
+        cache.set(make_model("key", a=1), "sessions")
+        cache.invalidate("key", "sessions")
+        self.assertIsNone(cache.get("key", "sessions"))
+
+    def test_fetch_racing_an_invalidation_is_not_cached(self):
+        cache = LocalSessionCache(ttl=10)
+        generation = cache.generation("key", "sessions")
+        # saved by another thread while the stale item was fetched
+        cache.invalidate("key", "sessions")
+        cache.set(make_model("key", a=1), "sessions", generation)
+        self.assertIsNone(cache.get("key", "sessions"))
+
+        generation = cache.generation("key", "sessions")
+        cache.set(make_model("key", a=2), "sessions", generation)
+        self.assertEqual(cache.get("key", "sessions")["a"], 2)
+
+    def test_lru_eviction_by_entries(self):
+        cache = LocalSessionCache(ttl=10, max_entries=2, shards=1, policy="LRU")
+        cache.set(make_model("a"), "sessions")
+        cache.set(make_model("b"), "sessions")
+        cache.get("a", "sessions")
+        cache.set(make_model("c"), "sessions")
+
+        self.assertIsNotNone(cache.get("a", "sessions"))
+        self.assertIsNone(cache.get("b", "sessions"))
+        self.assertIsNotNone(cache.get("c", "sessions"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_lfu_eviction_by_entries(self):
+        cache = LocalSessionCache(ttl=10, max_entries=2, shards=1, policy="LFU")
+        cache.set(make_model("a"), "sessions")
+        cache.set(make_model("b"), "sessions")
+        cache.get("a", "sessions")
+        cache.get("a", "sessions")
+        cache.get("b", "sessions")
+        cache.set(make_model("c"), "sessions")
+
+        self.assertIsNotNone(cache.get("a", "sessions"))
+        self.assertIsNotNone(cache.get("c", "sessions"))
+        self.assertIsNone(cache.get("b", "sessions"))
+
+    def test_lfu_eviction_after_removal(self):
+        cache = LocalSessionCache(ttl=10, max_entries=3, shards=1, policy="LFU")
+        for key, hits in (("a", 1), ("b", 2), ("c", 3)):
+            cache.set(make_model(key), "sessions")
+            for _ in range(hits):
+                cache.get(key, "sessions")
+        cache.invalidate("a", "sessions")
+        cache.set(make_model("d"), "sessions")
+        cache.set(make_model("e"), "sessions")
+
+        # d, never read, goes first
+        self.assertIsNone(cache.get("d", "sessions"))
+        self.assertIsNotNone(cache.get("b", "sessions"))
+        self.assertIsNotNone(cache.get("c", "sessions"))
+
+    def test_eviction_by_bytes(self):
+        cache = LocalSessionCache(ttl=10, max_bytes=1024, shards=1)
+        cache.set(make_model("small", a=1), "sessions")
+        cache.set(make_model("large", blob="x" * 2048), "sessions")
+
+        self.assertIsNone(cache.get("large", "sessions"))
+        self.assertIsNotNone(cache.get("small", "sessions"))
+        self.assertLessEqual(cache.stats()["bytes"], 1024)
+
+    @parameterized.expand([["MRU"], ["random"]])
+    def test_unknown_policy(self, policy: str):
+        with self.assertRaises(ValueError):
+            LocalSessionCache(ttl=10, policy=policy)
+
+    def test_concurrent_access(self):
+        cache = LocalSessionCache(ttl=10, max_entries=64, shards=4)
+
+        def worker(n: int):
+            for i in range(200):
+                key = f"key-{(n * 7 + i) % 100}"
+                cache.set(make_model(key, n=i), "sessions")
+                cache.get(key, "sessions")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        self.assertLessEqual(stats["entries"], 64)
+        self.assertEqual(stats["hits"] + stats["misses"], 8 * 200)
+
+    def test_disabled_by_default(self):
+        get_local_cache.cache_clear()
+        self.assertIsNone(get_local_cache())
+
+    @override_settings(DYSESSION={"LOCAL_CACHE": {"ENABLED": True, "TTL": 2}})
+    def test_enabled_by_setting(self):
+        cache = get_local_cache()
+        self.assertIsInstance(cache, LocalSessionCache)
+        # not CACHE_PERIOD, a session logged out elsewhere is served until then
+        self.assertEqual(cache.ttl, 2)
+        self.assertIs(cache, get_local_cache())
+
+
+class DynamoDBLocalCacheTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    @mock_dynamodb
+    def create_dynamodb_table(self):
+        self.client = boto3.client(
+            "dynamodb", region_name=get_config()["DYNAMODB_REGION"]
+        )
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=self.client,
+        )
+
+    @mock_dynamodb
+    def test_get_is_read_through(self):
+        self.create_dynamodb_table()
+        insert_session_item(data=make_model("cachedsession", a=1))
+
+        db = DynamoDB(self.client, cache=LocalSessionCache(ttl=10))
+        with mock.patch.object(
+            dynamodb, "get_item", wraps=dynamodb.get_item
+        ) as mock_get_item:
+            self.assertEqual(db.get("cachedsession")["a"], 1)
+            self.assertEqual(db.get("cachedsession")["a"], 1)
+            mock_get_item.assert_called_once()
+
+        self.assertEqual(db.cache.stats()["hits"], 1)
+        self.assertEqual(db.cache.stats()["misses"], 1)
+
+    @mock_dynamodb
+    def test_set_and_delete_invalidate(self):
+        self.create_dynamodb_table()
+        db = DynamoDB(self.client, cache=LocalSessionCache(ttl=10))
+
+        db.set(make_model("cachedsession", a=1))
+        self.assertEqual(db.get("cachedsession")["a"], 1)
+
+        db.set(make_model("cachedsession", a=2))
+        self.assertEqual(db.get("cachedsession")["a"], 2)
+
+        db.delete(make_model("cachedsession"))
+        self.assertIsNone(db.cache.get("cachedsession", get_config()["DYNAMODB_TABLENAME"]))
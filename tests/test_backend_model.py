@@ -1,10 +1,15 @@
 from typing import Any
+from unittest import mock
 
 import boto3
 from django.test import TestCase
 from parameterized import parameterized
 
-from dysession.backends.model import SessionDataModel
+from dysession.backends.model import (
+    PartialSessionDataModel,
+    SessionDataModel,
+    value_digest,
+)
 
 
 class SessionDataModelTestCase(TestCase):
@@ -46,9 +51,8 @@ class SessionDataModelTestCase(TestCase):
 
         self.assertEqual(model.get("good_key"), 0)
         self.assertEqual(model.get("not_exist_key", 10), 10)
-
-        with self.assertRaises(AttributeError):
-            model.get("not_exist_key")
+        self.assertIsNone(model.get("not_exist_key"))
+        self.assertIsNone(model.get("_auth_user_id"))
 
     def test_get_function_default_value(self):
         model = SessionDataModel()
@@ -89,13 +93,13 @@ class SessionDataModelTestCase(TestCase):
 
     def test_is_empty(self):
         model = SessionDataModel()
-        self.assertFalse(model.is_empty)
+        self.assertTrue(model.is_empty)
 
         model["good_key"] = 0
         self.assertFalse(model.is_empty)
 
         del model["good_key"]
-        self.assertFalse(model.is_empty)
+        self.assertTrue(model.is_empty)
 
     def test_iter(self):
         model = SessionDataModel()
@@ -142,7 +146,10 @@ class SessionDataModelTestCase(TestCase):
 
     def test_get__session_expiry(self):
         model = SessionDataModel()
-        self.assertFalse(model["_session_expiry"])
+        # set by SessionBase.set_expiry() only, missing means the default age
+        self.assertIsNone(model.get("_session_expiry", None))
+        model["_session_expiry"] = 60
+        self.assertEqual(model["_session_expiry"], 60)
 
     def test_not_found_allow_list(self):
         model = SessionDataModel()
@@ -151,11 +158,250 @@ class SessionDataModelTestCase(TestCase):
             with self.assertRaises(KeyError):
                 model[k]
 
-            with self.assertRaises(KeyError):
-                self.assertIsNone(model.get(k))
+            self.assertIsNone(model.get(k))
 
 
     def test_get_and_set_session_key(self):
         model = SessionDataModel()
         model.session_key = "key"
-        self.assertEqual(model.session_key, "key")
\ No newline at end of file
+        self.assertEqual(model.session_key, "key")
+
+    def test_new_model_is_not_persisted(self):
+        model = SessionDataModel("key")
+        model["a"] = 1
+        self.assertFalse(model.is_persisted)
+        self.assertIn("a", model.dirty_keys)
+
+    def test_dirty_tracking_after_mark_clean(self):
+        model = SessionDataModel("key")
+        model["a"] = 1
+        model["b"] = 2
+        model.mark_clean()
+
+        self.assertTrue(model.is_persisted)
+        self.assertFalse(model.is_dirty)
+
+        model["a"] = 3
+        del model["b"]
+
+        self.assertTrue(model.is_dirty)
+        self.assertEqual(model.dirty_keys, frozenset(["a"]))
+        self.assertEqual(model.removed_keys, frozenset(["b"]))
+
+    def test_set_after_delete_is_not_removed(self):
+        model = SessionDataModel("key")
+        model["a"] = 1
+        model.mark_clean()
+
+        del model["a"]
+        model["a"] = 2
+
+        self.assertEqual(model.dirty_keys, frozenset(["a"]))
+        self.assertEqual(model.removed_keys, frozenset())
+
+    def test_changing_session_key_requires_full_write(self):
+        model = SessionDataModel("key")
+        model.mark_clean()
+
+        model.session_key = "key"
+        self.assertTrue(model.is_persisted)
+
+        model.session_key = "another_key"
+        self.assertFalse(model.is_persisted)
+
+    def test_reassigning_identical_value_is_not_dirty(self):
+        model = SessionDataModel("key")
+        model["a"] = 1
+        model["b"] = {"x": [1, 2]}
+        model.mark_clean()
+
+        model["a"] = 1
+        model["b"] = {"x": [1, 2]}
+        self.assertFalse(model.is_dirty)
+
+    def test_in_place_mutation_is_dirty(self):
+        model = SessionDataModel("key")
+        model["cart"] = [1, 2]
+        model.mark_clean()
+
+        model["cart"].append(3)
+        self.assertEqual(model.dirty_keys, frozenset(["cart"]))
+
+    def test_decimal_loaded_value_equals_int(self):
+        from decimal import Decimal
+
+        model = SessionDataModel("key")
+        model["a"] = Decimal("1")
+        model["b"] = Decimal("1.5")
+        model.mark_clean()
+
+        model["a"] = 1
+        model["b"] = 1.5
+        self.assertFalse(model.is_dirty)
+
+    def test_changes_are_digested_once(self):
+        model = SessionDataModel("key")
+        model["a"] = 1
+        model["b"] = 2
+        model.mark_clean()
+        model["a"] = 3
+
+        with mock.patch(
+            "dysession.backends.model.value_digest", wraps=value_digest
+        ) as digest:
+            changes = model.changes()
+            self.assertEqual(changes.dirty_keys, frozenset(["a"]))
+            model["c"] = 4
+            changes = model.changes(since=changes, keys=["c"])
+            self.assertEqual(changes.dirty_keys, frozenset(["a", "c"]))
+            model.mark_clean(changes=changes)
+        self.assertEqual(digest.call_count, 4)
+        self.assertFalse(model.is_dirty)
+
+    def test_objects_with_the_same_str_are_not_equal(self):
+        class Cart:
+            def __init__(self, items):
+                self.items = items
+
+            def __str__(self):
+                return "cart"
+
+            def __repr__(self):
+                return f"Cart({self.items!r})"
+
+        model = SessionDataModel("key")
+        model["cart"] = Cart([1])
+        model.mark_clean()
+        model["cart"] = Cart([1, 2])
+        self.assertEqual(model.dirty_keys, frozenset(["cart"]))
+
+    def test_keys_do_not_collide_with_methods(self):
+        model = SessionDataModel("key")
+        model["get"] = 1
+        model["items"] = 2
+        model["session_key"] = 3
+
+        self.assertEqual(model.get("get"), 1)
+        self.assertEqual(model["items"], 2)
+        self.assertEqual(model["session_key"], 3)
+        self.assertEqual(model.session_key, "key")
+        self.assertEqual(len(list(model.items())), 4)
+
+    def test_mutable_mapping_api(self):
+        model = SessionDataModel("key")
+        model.update({"a": 1, "b": 2})
+
+        self.assertEqual(len(model), 3)
+        self.assertIn("a", model)
+        self.assertNotIn("c", model)
+        self.assertEqual(model.setdefault("c", 3), 3)
+        self.assertEqual(model.setdefault("c", 4), 3)
+        self.assertEqual(set(model.keys()), {"PK", "a", "b", "c"})
+        self.assertEqual(sorted(model.values(), key=str), [1, 2, 3, "key"])
+        self.assertEqual(dict(model), {"PK": "key", "a": 1, "b": 2, "c": 3})
+
+    def test_missing_key_error_is_key_and_attribute_error(self):
+        model = SessionDataModel()
+
+        with self.assertRaises(KeyError):
+            model["not_exist_key"]
+        with self.assertRaises(AttributeError):
+            model.not_exist_key
+        with self.assertRaises(KeyError):
+            del model["not_exist_key"]
+
+    def test_slotted(self):
+        model = SessionDataModel("key")
+        self.assertFalse(hasattr(model, "__dict__"))
+        with self.assertRaises(AttributeError):
+            model.a = 1
+
+    def test_pickle_and_copy(self):
+        import copy
+        import pickle
+
+        model = SessionDataModel("key")
+        model["a"] = [1]
+        model.mark_clean()
+
+        for clone in (pickle.loads(pickle.dumps(model)), copy.deepcopy(model)):
+            self.assertEqual(dict(clone), dict(model))
+            self.assertTrue(clone.is_persisted)
+            self.assertFalse(clone.is_dirty)
+
+
+class PartialSessionDataModelTestCase(TestCase):
+    def setUp(self):
+        self.loads = 0
+
+    def full(self) -> SessionDataModel:
+        self.loads += 1
+        model = SessionDataModel("key")
+        model.update({"_auth_user_id": "1", "cart": [1, 2], "theme": "dark"})
+        model.mark_clean()
+        return model
+
+    def partial(self, loader=...) -> PartialSessionDataModel:
+        model = PartialSessionDataModel(
+            "key",
+            loaded_keys={"_auth_user_id", "_auth_user_hash"},
+            loader=self.full if loader is Ellipsis else loader,
+        )
+        model["_auth_user_id"] = "1"
+        model.mark_clean()
+        return model
+
+    def test_loaded_keys_do_not_load_the_rest(self):
+        model = self.partial()
+
+        self.assertEqual(model["_auth_user_id"], "1")
+        # loaded, absent from the item
+        self.assertIsNone(model.get("_auth_user_hash", None))
+        self.assertNotIn("_auth_user_hash", model)
+        model["new"] = 1
+        self.assertEqual(model.dirty_keys, {"new"})
+
+        self.assertTrue(model.is_partial)
+        self.assertEqual(self.loads, 0)
+
+    @parameterized.expand(
+        [
+            ["getitem", lambda model: model["cart"]],
+            ["get", lambda model: model.get("cart")],
+            ["contains", lambda model: "cart" in model],
+            ["attribute", lambda model: model.cart],
+            ["len", len],
+            ["items", lambda model: list(model.items())],
+            ["str", str],
+            ["pop", lambda model: model.pop("cart")],
+        ]
+    )
+    def test_other_keys_load_the_rest_once(self, name, access):
+        model = self.partial()
+
+        access(model)
+        access(model) if name != "pop" else None
+
+        self.assertEqual(self.loads, 1)
+        self.assertFalse(model.is_partial)
+        self.assertEqual(model["theme"], "dark")
+        self.assertTrue(model.is_persisted)
+
+    def test_local_changes_win_over_the_rest(self):
+        model = self.partial()
+        model["theme"] = "light"
+        model["_auth_user_id"] = "2"
+
+        self.assertEqual(model["cart"], [1, 2])
+        self.assertEqual(model["theme"], "light")
+        self.assertEqual(model["_auth_user_id"], "2")
+        self.assertEqual(model.dirty_keys, {"theme", "_auth_user_id"})
+
+        del model["cart"]
+        self.assertEqual(model.removed_keys, {"cart"})
+
+    def test_vanished_item(self):
+        model = self.partial(loader=lambda: None)
+
+        self.assertNotIn("cart", model)
+        self.assertEqual(dict(model), {"PK": "key", "_auth_user_id": "1"})
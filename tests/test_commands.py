@@ -1,8 +1,16 @@
+import json
+from datetime import datetime
 from io import StringIO
 
 import boto3
 from django.core.management import call_command
 from django.test import TestCase
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import (create_dynamodb_table, insert_session_item,
+                                    key_exists)
+from dysession.backends.model import SessionDataModel
+from dysession.settings import get_config
 
 
 class CommandTestCase:
@@ -42,3 +50,50 @@ class CommandTestCase:
 #     def test_call_help(self):
 #         out = StringIO()
 #         call_command("dysession_destory", "-h", stdout=out)
+
+
+class DysessionClearExpiredTestCase(CommandTestCase, TestCase):
+    @mock_dynamodb
+    def test_clear_expired(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        model = SessionDataModel("expiredsessionkey")
+        model[get_config()["TTL_ATTRIBUTE_NAME"]] = int(datetime.now().timestamp()) - 60
+        insert_session_item(data=model, client=client)
+
+        out, _ = self.call_command(
+            "dysession_clearexpired", "--segments", "1", "--wcu", "10", "-v", "2"
+        )
+
+        self.assertIn("expired: 1, deleted: 1", out)
+        self.assertIn("1 expired sessions deleted.", out)
+        self.assertFalse(key_exists("expiredsessionkey", client=client))
+
+
+class DysessionStatsTestCase(CommandTestCase, TestCase):
+    @mock_dynamodb
+    def test_stats(self):
+
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        insert_session_item(data=SessionDataModel("statssessionkey"), client=client)
+
+        out, _ = self.call_command("dysession_stats", "--segments", "1")
+        self.assertIn("Items:             1", out)
+        self.assertIn("WCU per save", out)
+
+        out, _ = self.call_command("dysession_stats", "--segments", "1", "--json")
+        self.assertEqual(json.loads(out)["items"], 1)
@@ -1,12 +1,23 @@
 import logging
+import os
 import sys
+import tempfile
+from queue import Queue
 from unittest import mock
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from parameterized import parameterized
 
-from dysession.logger import LoggingType, get_logger, is_tty
+from dysession.logger import (
+    LoggingType,
+    _listeners,
+    get_logger,
+    is_tty,
+    stop_listeners,
+)
 from dysession.logger.handler.colorful_console import ColorfulConsoleLoggerHandler
+from dysession.logger.handler.dropping_queue import DroppingQueueHandler
+from dysession.logger.sampling import MissLog, get_miss_log
 
 
 class LoggerTestCase(TestCase):
@@ -59,3 +70,98 @@ class LoggerTestCase(TestCase):
         self.assertIn("This is a test content", "\n".join(cm.output))
 
         logger.handlers = []
+
+    def test_logger_is_memoized(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "session.log")
+        with override_settings(DYSESSION={"LOGGING": {"FILE_PATH": path}}):
+            logger = get_logger("test_logger_is_memoized", logger_type=LoggingType.FILE)
+            self.addCleanup(self.remove_handlers, logger)
+
+            with mock.patch.object(logger, "warning") as mock_warning:
+                self.assertIs(
+                    get_logger("test_logger_is_memoized", logger_type=LoggingType.FILE),
+                    logger,
+                )
+            mock_warning.assert_not_called()
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertEqual(logger.handlers[0].baseFilename, path)
+
+    def remove_handlers(self, logger: logging.Logger) -> None:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+    def test_queue_handler(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "session.log")
+        with override_settings(
+            DYSESSION={"LOGGING": {"TYPE": "FILE", "FILE_PATH": path, "QUEUE": True}}
+        ):
+            logger = get_logger("test_queue_handler")
+            self.addCleanup(self.remove_handlers, logger)
+            self.assertIsInstance(logger.handlers[0], DroppingQueueHandler)
+            # the FileHandler belongs to the listener, not to the logger
+            file_handlers = _listeners[-1].handlers
+
+            logger.info("This is a queued content")
+            stop_listeners()
+            for handler in file_handlers:
+                handler.close()
+
+        with open(path, encoding="utf-8") as f:
+            self.assertIn("This is a queued content", f.read())
+
+    def test_queue_handler_drops_when_full(self):
+        handler = DroppingQueueHandler(Queue(maxsize=1))
+        record = logging.makeLogRecord({"msg": "This is a test content"})
+
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.qsize(), 1)
+
+
+class MissLogTestCase(TestCase):
+    def test_sampling(self):
+        log = MissLog(sample_rate=0.5)
+        with mock.patch("dysession.logger.sampling.get_logger") as mock_get_logger:
+            with mock.patch("dysession.logger.sampling.random.random", return_value=0.7):
+                log.missing("samplingsessionkey", "sessions")
+            mock_get_logger.return_value.error.assert_not_called()
+
+            with mock.patch("dysession.logger.sampling.random.random", return_value=0.2):
+                log.expired("samplingsessionkey")
+            mock_get_logger.return_value.error.assert_called_once_with(
+                "'%s' is expired .", "samplingsessionkey"
+            )
+
+    def test_summary(self):
+        now = [0.0]
+        log = MissLog(sample_rate=0, summary_interval=60, clock=lambda: now[0])
+        with mock.patch("dysession.logger.sampling.get_logger") as mock_get_logger:
+            log.expired("a")
+            log.missing("b", "sessions")
+            log.missing("c", "sessions")
+            mock_get_logger.return_value.info.assert_not_called()
+
+            now[0] = 61.0
+            log.missing("d", "sessions")
+            mock_get_logger.return_value.info.assert_called_once_with(
+                "1 expired, 3 missing sessions in the last 61s"
+            )
+            mock_get_logger.return_value.error.assert_not_called()
+
+        # the counts were reset
+        self.assertIsNone(log.summarize())
+
+    @override_settings(
+        DYSESSION={"LOGGING": {"SAMPLE_RATE": 0.1, "SUMMARY_INTERVAL": 30}}
+    )
+    def test_get_miss_log(self):
+        log = get_miss_log()
+        self.assertIs(log, get_miss_log())
+        self.assertEqual(log.sample_rate, 0.1)
+        self.assertEqual(log.summary_interval, 30)
@@ -0,0 +1,213 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+import boto3
+from botocore.exceptions import ClientError
+from django.test import RequestFactory, TestCase
+from moto import mock_dynamodb
+from parameterized import parameterized
+
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table
+from dysession.aws.error import DynamodbItemNotFound
+from dysession.backends.error import (
+    SessionExpired,
+    SessionKeyDoesNotExist,
+    SessionKeyDuplicated,
+)
+from dysession.backends.local_cache import LocalSessionCache
+from dysession.backends.model import SessionDataModel
+from dysession.metrics import LATENCY_BUCKETS, MetricsRegistry, classify, get_registry
+from dysession.settings import get_config
+from dysession.views import metrics
+
+
+def client_error(code: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, "GetItem")
+
+
+class MetricsRegistryTestCase(TestCase):
+    def test_observe_counts_and_buckets(self):
+        registry = MetricsRegistry()
+        registry.observe("GetItem", "sessions", "hit", 0.002)
+        registry.observe("GetItem", "sessions", "hit", 10)
+        registry.observe("GetItem", "sessions", "miss", 0.002)
+
+        self.assertEqual(registry.count(), 3)
+        self.assertEqual(registry.count(outcome="hit"), 2)
+        self.assertEqual(registry.count(operation="PutItem"), 0)
+
+        hit, miss = registry.snapshot()
+        self.assertEqual(hit["outcome"], "hit")
+        self.assertEqual(hit["count"], 2)
+        self.assertAlmostEqual(hit["sum"], 10.002)
+        self.assertEqual(hit["buckets"][0.0025], 1)
+        self.assertEqual(hit["buckets"][float("inf")], 1)
+        self.assertEqual(sum(miss["buckets"].values()), 1)
+
+        registry.reset()
+        self.assertEqual(registry.snapshot(), [])
+
+    def test_track_outcome(self):
+        registry = MetricsRegistry()
+        with registry.track("load", "sessions"):
+            pass
+        with registry.track("load", "sessions") as timer:
+            timer.outcome = "cache_hit"
+        with self.assertRaises(SessionExpired):
+            with registry.track("load", "sessions"):
+                raise SessionExpired
+
+        self.assertEqual(registry.count(outcome="ok"), 1)
+        self.assertEqual(registry.count(outcome="cache_hit"), 1)
+        self.assertEqual(registry.count(outcome="expired"), 1)
+
+    @parameterized.expand(
+        [
+            [DynamodbItemNotFound(), "miss"],
+            [SessionKeyDoesNotExist(), "miss"],
+            [SessionExpired(), "expired"],
+            [SessionKeyDuplicated(), "conflict"],
+            [client_error("ConditionalCheckFailedException"), "conflict"],
+            [client_error("ProvisionedThroughputExceededException"), "throttled"],
+            [client_error("ThrottlingException"), "throttled"],
+            [client_error("InternalServerError"), "error"],
+            [ValueError(), "error"],
+        ]
+    )
+    def test_classify(self, exc, outcome):
+        self.assertEqual(classify(exc), outcome)
+
+    def test_concurrent_observe(self):
+        registry = MetricsRegistry()
+
+        def work():
+            for _ in range(1000):
+                registry.observe("GetItem", "sessions", "hit", 0.001)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(registry.count(), 8000)
+
+    def test_render_text(self):
+        registry = MetricsRegistry()
+        registry.observe("GetItem", 'se"ss', "hit", 0.002)
+        text = registry.render_text()
+
+        labels = 'operation="GetItem",table="se\\"ss",outcome="hit"'
+        self.assertIn(f"dysession_operations_total{{{labels}}} 1\n", text)
+        self.assertIn(
+            f'dysession_operation_duration_seconds_bucket{{{labels},le="0.001"}} 0\n',
+            text,
+        )
+        self.assertIn(
+            f'dysession_operation_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n',
+            text,
+        )
+        self.assertIn(f"dysession_operation_duration_seconds_count{{{labels}}} 1\n", text)
+        self.assertEqual(
+            text.count("dysession_operation_duration_seconds_bucket"),
+            len(LATENCY_BUCKETS) + 1,
+        )
+
+
+class DynamoDBMetricsTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        get_registry().reset()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        get_registry().reset()
+
+    def create_table(self):
+        client = boto3.client("dynamodb", region_name="ap-northeast-1")
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": "sessions",
+            },
+            client=client,
+        )
+        return client
+
+    @mock_dynamodb
+    def test_session_operations_outcomes(self):
+        db = DynamoDB(client=self.create_table())
+        registry = get_registry()
+
+        model = SessionDataModel("metricssessionkey")
+        model["a"] = 1
+        model[get_config()["TTL_ATTRIBUTE_NAME"]] = int(datetime.now().timestamp()) + 60
+        db.set(model)
+        self.assertEqual(registry.count("save", "sessions", "ok"), 1)
+        self.assertEqual(registry.count("PutItem", "sessions", "ok"), 1)
+
+        loaded = db.get("metricssessionkey")
+        self.assertEqual(registry.count("load", "sessions", "hit"), 1)
+        self.assertEqual(registry.count("GetItem", "sessions", "hit"), 1)
+
+        db.set(loaded)
+        self.assertEqual(registry.count("save", "sessions", "skipped"), 1)
+
+        with self.assertRaises(SessionExpired):
+            db.get(
+                "metricssessionkey",
+                expired_time_fn=lambda: datetime.now() + timedelta(days=30),
+            )
+        self.assertEqual(registry.count("load", "sessions", "expired"), 1)
+
+        with self.assertRaises(SessionKeyDoesNotExist):
+            db.get("notexistsessionkey")
+        self.assertEqual(registry.count("load", "sessions", "miss"), 1)
+        self.assertEqual(registry.count("GetItem", "sessions", "miss"), 1)
+
+        self.assertTrue(db.exists("metricssessionkey"))
+        self.assertEqual(registry.count("exists", "sessions", "hit"), 1)
+
+        db.delete(loaded)
+        self.assertEqual(registry.count("delete", "sessions", "ok"), 1)
+        self.assertEqual(registry.count("DeleteItem", "sessions", "ok"), 1)
+
+    @mock_dynamodb
+    def test_local_cache_hit(self):
+        db = DynamoDB(client=self.create_table(), cache=LocalSessionCache(ttl=60))
+        model = SessionDataModel("metricssessionkey")
+        model["a"] = 1
+        db.set(model)
+
+        db.get("metricssessionkey")
+        db.get("metricssessionkey")
+
+        self.assertEqual(get_registry().count("load", outcome="hit"), 1)
+        self.assertEqual(get_registry().count("load", outcome="cache_hit"), 1)
+
+    @mock_dynamodb
+    def test_throttled(self):
+        client = self.create_table()
+        db = DynamoDB(client=client)
+
+        with mock.patch.object(
+            client,
+            "get_item",
+            side_effect=client_error("ProvisionedThroughputExceededException"),
+        ):
+            with self.assertRaises(ClientError):
+                db.get("metricssessionkey")
+
+        self.assertEqual(get_registry().count("GetItem", outcome="throttled"), 1)
+        self.assertEqual(get_registry().count("load", outcome="throttled"), 1)
+
+    def test_metrics_view(self):
+        get_registry().observe("GetItem", "sessions", "hit", 0.002)
+
+        response = metrics(RequestFactory().get("/metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn(b"dysession_operations_total{", response.content)
@@ -0,0 +1,182 @@
+import logging
+from unittest import mock
+
+import boto3
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from moto import mock_dynamodb
+
+from dysession.aws.dynamodb import DynamoDB, create_dynamodb_table
+from dysession.decorators import full_session_load, partial_session_load
+from dysession.middleware import SessionMiddleware
+from dysession.settings import get_config
+
+
+@override_settings(SESSION_ENGINE="dysession.backends.db")
+class SessionMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_untouched_session_is_never_loaded(self):
+        request = self.factory.get("/health")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = "untouchedsessionkey"
+
+        middleware = SessionMiddleware(lambda request: HttpResponse("ok"))
+        with mock.patch.object(DynamoDB, "get") as mock_get:
+            response = middleware(request)
+            mock_get.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(request.session.accessed)
+        self.assertFalse(request.session.is_loaded)
+        self.assertFalse(response.has_header("Vary"))
+
+    @mock_dynamodb
+    def test_new_session_is_saved_and_reloaded(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+
+        def write_view(request):
+            request.session["a"] = 1
+            return HttpResponse("ok")
+
+        response = SessionMiddleware(write_view)(self.factory.get("/"))
+        session_key = response.cookies[settings.SESSION_COOKIE_NAME].value
+
+        def read_view(request):
+            return HttpResponse(str(request.session["a"]))
+
+        request = self.factory.get("/")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+        self.assertEqual(SessionMiddleware(read_view)(request).content, b"1")
+
+    def test_untouched_new_session_is_empty(self):
+        request = self.factory.get("/")
+        response = SessionMiddleware(lambda request: HttpResponse("ok"))(request)
+
+        self.assertTrue(request.session.is_empty())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+
+@override_settings(SESSION_ENGINE="dysession.backends.db")
+class PartialSessionLoadTestCase(TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def create_session(self, client) -> str:
+        create_dynamodb_table(
+            options={
+                "pk": get_config()["PARTITION_KEY_NAME"],
+                "table": get_config()["DYNAMODB_TABLENAME"],
+            },
+            client=client,
+        )
+
+        def view(request):
+            request.session["_auth_user_id"] = "42"
+            request.session["cart"] = ["x" * 100] * 10
+            return HttpResponse("ok")
+
+        response = SessionMiddleware(view)(self.factory.get("/"))
+        return response.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def request(self, client, view, session_key, path="/api/me"):
+        request = self.factory.get(path)
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+        middleware = SessionMiddleware(lambda request: view(request))
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware.get_response = get_response
+        with mock.patch.object(client, "get_item", wraps=client.get_item) as get_item:
+            response = middleware(request)
+        return response, [call.kwargs for call in get_item.call_args_list]
+
+    @mock_dynamodb
+    @override_settings(
+        DYSESSION={"PARTIAL_LOAD": {"ENABLED": True, "PATHS": [r"^/api/"]}}
+    )
+    def test_hot_keys_only(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        with mock.patch("dysession.backends.db.get_client", return_value=client):
+            session_key = self.create_session(client)
+
+            def view(request):
+                return HttpResponse(request.session["_auth_user_id"])
+
+            response, calls = self.request(client, view, session_key)
+            self.assertEqual(response.content, b"42")
+            self.assertEqual(len(calls), 1)
+            self.assertIn("ProjectionExpression", calls[0])
+
+            # a path outside PATHS loads the whole session
+            response, calls = self.request(client, view, session_key, path="/")
+            self.assertNotIn("ProjectionExpression", calls[0])
+
+    @mock_dynamodb
+    @override_settings(DYSESSION={"PARTIAL_LOAD": {"ENABLED": True}})
+    def test_other_keys_are_loaded_lazily_and_kept_on_save(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        with mock.patch("dysession.backends.db.get_client", return_value=client):
+            session_key = self.create_session(client)
+
+            def write_view(request):
+                request.session["visits"] = 1
+                return HttpResponse("ok")
+
+            _, calls = self.request(client, write_view, session_key)
+            self.assertEqual(len(calls), 1)
+
+            def cycle_view(request):
+                request.session.cycle_key()
+                return HttpResponse("ok")
+
+            response, _ = self.request(client, cycle_view, session_key)
+            session_key = response.cookies[settings.SESSION_COOKIE_NAME].value
+
+            def read_view(request):
+                return HttpResponse(str(len(request.session["cart"])))
+
+            response, calls = self.request(client, read_view, session_key)
+            self.assertEqual(response.content, b"10")
+            self.assertEqual(len(calls), 2)
+
+            db = DynamoDB(client=client)
+            self.assertEqual(db.get(session_key)["visits"], 1)
+
+    @mock_dynamodb
+    def test_view_decorators(self):
+        client = boto3.client("dynamodb", region_name=get_config()["DYNAMODB_REGION"])
+        with mock.patch("dysession.backends.db.get_client", return_value=client):
+            session_key = self.create_session(client)
+
+            @partial_session_load("cart")
+            def cart_view(request):
+                return HttpResponse(str(len(request.session["cart"])))
+
+            response, calls = self.request(client, cart_view, session_key)
+            self.assertEqual(response.content, b"10")
+            self.assertEqual(len(calls), 1)
+            self.assertIn("cart", calls[0]["ExpressionAttributeNames"].values())
+
+            with override_settings(DYSESSION={"PARTIAL_LOAD": {"ENABLED": True}}):
+
+                @full_session_load
+                def full_view(request):
+                    return HttpResponse(request.session["_auth_user_id"])
+
+                _, calls = self.request(client, full_view, session_key)
+                self.assertNotIn("ProjectionExpression", calls[0])
@@ -1,7 +1,11 @@
-from django.test import TestCase
+from dataclasses import FrozenInstanceError
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
 from parameterized import parameterized
 
-from dysession.settings import get_config
+from dysession.settings import get_config, get_settings
 
 
 class DysessionInitTestCase(TestCase):
@@ -9,7 +13,6 @@ class DysessionInitTestCase(TestCase):
         [
             ("DYNAMODB_TABLENAME",),
             ("PARTITION_KEY_NAME",),
-            ("SORT_KEY_NAME",),
             ("TTL_ATTRIBUTE_NAME",),
             ("CACHE_PERIOD",),
             ("DYNAMODB_REGION",),
@@ -17,3 +20,118 @@ class DysessionInitTestCase(TestCase):
     )
     def test_get_config_must_return_value_settings(self, config_key_name: str):
         self.assertTrue(config_key_name in get_config().keys())
+
+
+class DysessionSettingsTestCase(TestCase):
+    def test_get_settings_matches_config(self):
+        config = get_config()
+        snapshot = get_settings()
+
+        self.assertIs(snapshot, get_settings())
+        self.assertEqual(snapshot.table_name, config["DYNAMODB_TABLENAME"])
+        self.assertEqual(snapshot.partition_key_name, config["PARTITION_KEY_NAME"])
+        self.assertEqual(snapshot.ttl_attribute_name, config["TTL_ATTRIBUTE_NAME"])
+        self.assertEqual(snapshot.cache_period, config["CACHE_PERIOD"])
+        self.assertEqual(snapshot.region, config["DYNAMODB_REGION"])
+
+    def test_settings_are_immutable(self):
+        snapshot = get_settings()
+        with self.assertRaises(FrozenInstanceError):
+            snapshot.table_name = "other"
+        with self.assertRaises(TypeError):
+            snapshot.local_cache["ENABLED"] = True
+
+    @override_settings(DYSESSION={"LOCAL_CACHE": {"ENABLED": True}})
+    def test_nested_settings_are_merged_with_defaults(self):
+        snapshot = get_settings()
+        self.assertTrue(snapshot.local_cache["ENABLED"])
+        self.assertEqual(snapshot.local_cache["POLICY"], "LRU")
+
+    def test_settings_are_invalidated_on_setting_changed(self):
+        with override_settings(DYSESSION={"DYNAMODB_TABLENAME": "another_table"}):
+            self.assertEqual(get_settings().table_name, "another_table")
+        self.assertEqual(get_settings().table_name, "sessions")
+
+    def test_precomputed_expressions(self):
+        snapshot = get_settings()
+        self.assertEqual(snapshot.key("abc"), {"PK": {"S": "abc"}})
+        self.assertEqual(snapshot.pk_names(), {"#pk": "PK"})
+        self.assertEqual(snapshot.pk_names(ttl=True), {"#pk": "PK", "#ttl": "ttl"})
+        self.assertEqual(snapshot.must_create_condition, "attribute_not_exists(#pk)")
+        self.assertEqual(snapshot.must_exist_condition, "attribute_exists(#pk)")
+        # every call returns a new dict, safe to extend per request
+        self.assertIsNot(snapshot.pk_names(), snapshot.pk_names())
+
+    @parameterized.expand(
+        [
+            ({"DYNAMODB_TABLENAME": "a"},),
+            ({"DYNAMODB_TABLENAME": "bad table"},),
+            ({"PARTITION_KEY_NAME": ""},),
+            ({"TTL_ATTRIBUTE_NAME": 1},),
+            ({"PARTITION_KEY_NAME": "ttl"},),
+            ({"CACHE_PERIOD": 0},),
+            ({"CACHE_PERIOD": "3600"},),
+            ({"TTL_REFRESH_FRACTION": 1.5},),
+            ({"DYNAMODB_REGION": ""},),
+            ({"DYNAMODB_PROFILE": 1},),
+            ({"CLIENT": {"MAX_POOL_CONNECTIONS": 0}},),
+            ({"CLIENT": {"READ_TIMEOUT": "2"}},),
+            ({"CLIENT": {"RETRY_MODE": "exponential"}},),
+            ({"LOGGING": {"TYPE": "SYSLOG"}},),
+            ({"LOGGING": {"FILE_PATH": ""}},),
+            ({"LOGGING": {"QUEUE_SIZE": 0}},),
+            ({"LOGGING": {"SAMPLE_RATE": 2}},),
+            ({"LOGGING": {"SUMMARY_INTERVAL": 0}},),
+            ({"LOCAL_CACHE": {"POLICY": "FIFO"}},),
+            ({"LOCAL_CACHE": {"SHARDS": 0}},),
+            ({"LOCAL_CACHE": []},),
+            ({"ENCODING": {"FORMAT": "PICKLE"}},),
+            ({"ENCODING": {"COMPRESSION": "gzip"}},),
+            ({"ENCODING": {"COMPRESS_THRESHOLD": -1}},),
+            ({"CLEAR_EXPIRED": {"SEGMENTS": 0}},),
+            ({"CLEAR_EXPIRED": {"READ_CAPACITY": 0}},),
+            ({"PARTIAL_LOAD": {"ENABLED": 1}},),
+            ({"PARTIAL_LOAD": {"HOT_KEYS": "_auth_user_id"}},),
+            ({"PARTIAL_LOAD": {"PATHS": ["^/api/(["]}},),
+            ({"ROUTING": {"REGIONS": "us-east-1"}},),
+            ({"ROUTING": {"REGIONS": ["us-east-1", "eu-west-1"]}},),
+            (
+                {
+                    "DYNAMODB_REGION": "us-east-1",
+                    "ROUTING": {"REGIONS": ["us-east-1"], "PREFERRED_REGION": "eu-west-1"},
+                },
+            ),
+            ({"LOCAL_CACHE": {"TTL": 0}},),
+            ({"WRITE_BEHIND": {"ENABLED": "yes"}},),
+            ({"WRITE_BEHIND": {"MAX_ENTRIES": 0}},),
+            ({"WRITE_BEHIND": {"FLUSH_INTERVAL": -1}},),
+            ({"CIRCUIT_BREAKER": {"FAILURE_THRESHOLD": 0}},),
+            ({"CIRCUIT_BREAKER": {"READ_DEADLINE": 0}},),
+            ({"CIRCUIT_BREAKER": {"WRITE_POLICY": "BLOCK"}},),
+        ]
+    )
+    def test_invalid_settings(self, config):
+        with override_settings(DYSESSION=config):
+            with self.assertRaises(ImproperlyConfigured):
+                get_settings()
+
+    @override_settings(
+        DYSESSION={"PARTIAL_LOAD": {"ENABLED": True, "PATHS": [r"^/api/"]}}
+    )
+    def test_partial_load_keys(self):
+        snapshot = get_settings()
+        self.assertEqual(
+            snapshot.partial_load_keys("/api/me"),
+            ("_auth_user_id", "_auth_user_backend", "_auth_user_hash"),
+        )
+        self.assertIsNone(snapshot.partial_load_keys("/checkout"))
+
+        with override_settings(DYSESSION={"PARTIAL_LOAD": {"ENABLED": True}}):
+            self.assertIsNotNone(get_settings().partial_load_keys("/checkout"))
+        self.assertIsNone(get_settings().partial_load_keys("/checkout"))
+
+    def test_app_ready_validates_settings(self):
+        app_config = apps.get_app_config("dysession")
+        with override_settings(DYSESSION={"CACHE_PERIOD": -1}):
+            with self.assertRaises(ImproperlyConfigured):
+                app_config.ready()